@@ -72,7 +72,7 @@ def create_app(config_name='development'):
     CORS(app,
          origins=app.config.get('CORS_ORIGINS', ['*']),
          supports_credentials=True,
-         allow_headers=['Content-Type', 'Authorization'],
+         allow_headers=['Content-Type', 'Authorization', 'X-Guest-Cart-Token', 'Idempotency-Key'],
          methods=['GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'])
     
  # Register blueprints
@@ -81,7 +81,7 @@ def create_app(config_name='development'):
         orders, payments, merchant_orders, admin_orders,
         hub_staff, admin_hub_staff, reviews, merchant_reviews,
         merchant_applications, admin_merchant_applications,
-        admin_analytics, profile, merchant_analytics
+        admin_analytics, profile, merchant_analytics, checkout
     )
     app.register_blueprint(auth.bp, url_prefix='/api/v1/auth')
     app.register_blueprint(categories.bp, url_prefix='/api/v1/categories')
@@ -89,6 +89,7 @@ def create_app(config_name='development'):
     app.register_blueprint(merchant.bp, url_prefix='/api/v1/merchant')
     app.register_blueprint(admin.bp, url_prefix='/api/v1/admin')
     app.register_blueprint(cart.bp, url_prefix='/api/v1/cart')
+    app.register_blueprint(checkout.bp, url_prefix='/api/v1/checkout')
     app.register_blueprint(orders.bp, url_prefix='/api/v1/orders')
     app.register_blueprint(payments.bp, url_prefix='/api/v1/payments')
     
@@ -128,6 +129,23 @@ def create_app(config_name='development'):
     # Merchant analytics dashboard (NEW)
     app.register_blueprint(merchant_analytics.bp, url_prefix='/api/v1/merchant')
 
+    # Malformed pagination cursors (see app.utils.pagination)
+    from app.utils.pagination import InvalidCursorError
+
+    @app.errorhandler(InvalidCursorError)
+    def handle_invalid_cursor(error):
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_CURSOR',
+                'message': str(error)
+            }
+        }), 400
+
+    # CLI maintenance commands
+    from app.commands import register_commands
+    register_commands(app)
+
     # Health check endpoint for Render
     @app.route('/')
     def health_check():
@@ -0,0 +1,122 @@
+"""
+CLI Commands
+Maintenance commands registered on the Flask CLI (run with `flask <command>`)
+"""
+import click
+from flask.cli import AppGroup
+
+
+search_index_cli = AppGroup('search-index', help='Manage the in-process BM25 search index.')
+
+
+@search_index_cli.command('rebuild')
+def rebuild_search_index_command():
+    """Build a fresh snapshot from all active products."""
+    from app.services.search_index import rebuild_search_index
+
+    count = rebuild_search_index()
+    click.echo(f'Indexed {count} product(s)')
+
+
+@search_index_cli.command('merge')
+def merge_search_index_command():
+    """Fold pending delta log entries into the snapshot."""
+    from app.services.search_index import get_search_index
+
+    index = get_search_index()
+    if not index.exists():
+        raise click.ClickException('No snapshot found. Run `flask search-index rebuild` first.')
+    index.merge()
+    click.echo('Search index merged')
+
+
+ratings_cli = AppGroup('ratings', help='Manage denormalized product rating aggregates.')
+
+
+@ratings_cli.command('rebuild')
+def rebuild_ratings_command():
+    """Recompute rating averages, counts and histograms from reviews."""
+    from app.models.product import Product
+
+    count = Product.rebuild_rating_aggregates()
+    click.echo(f'Rebuilt rating aggregates for {count} product(s)')
+
+
+reservations_cli = AppGroup('reservations', help='Manage stock held by unpaid M-Pesa orders.')
+
+
+@reservations_cli.command('sweep')
+@click.option('--every', type=int, default=None,
+              help='Keep running and sweep every N seconds (default: sweep once and exit).')
+def sweep_reservations_command(every):
+    """Cancel unpaid orders whose reservation expired and restock their items."""
+    from app.services.reservation_service import release_expired_reservations, run_reservation_sweeper
+
+    if every:
+        click.echo(f'Sweeping expired reservations every {every}s')
+        run_reservation_sweeper(every)
+    else:
+        count = release_expired_reservations()
+        click.echo(f'Released {count} expired reservation(s)')
+
+
+outbox_cli = AppGroup('outbox', help='Deliver queued STK pushes and notification emails.')
+
+
+@outbox_cli.command('work')
+@click.option('--every', type=float, default=2.0, show_default=True, help='Seconds between polls.')
+def outbox_work_command(every):
+    """Run the outbox worker until stopped."""
+    from app.services.outbox_service import run_outbox_worker
+
+    click.echo(f'Processing the outbox every {every}s')
+    run_outbox_worker(every)
+
+
+@outbox_cli.command('process')
+def outbox_process_command():
+    """Deliver everything that is due once and exit."""
+    from app.services.outbox_service import process_outbox
+
+    count = process_outbox()
+    click.echo(f'Delivered {count} message(s)')
+
+
+idempotency_cli = AppGroup('idempotency', help='Manage stored Idempotency-Key responses.')
+
+
+@idempotency_cli.command('purge')
+def purge_idempotency_keys_command():
+    """Delete keys older than IDEMPOTENCY_KEY_TTL."""
+    from app.utils.idempotency import purge_expired_idempotency_keys
+
+    count = purge_expired_idempotency_keys()
+    click.echo(f'Deleted {count} expired key(s)')
+
+
+read_model_cli = AppGroup('read-model', help='Manage the denormalized order listing table.')
+
+
+@read_model_cli.command('rebuild')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Suborders per commit.')
+def rebuild_read_model_command(batch_size):
+    """Recompute every order listing row from the order tables."""
+    from app.services.order_read_model_service import rebuild_order_read_model
+
+    count = rebuild_order_read_model(batch_size)
+    click.echo(f'Rebuilt {count} order listing row(s)')
+
+
+def register_commands(app):
+    """
+    Register CLI commands with the app
+
+    Args:
+        app: Flask application
+    """
+    app.cli.add_command(search_index_cli)
+    app.cli.add_command(ratings_cli)
+    app.cli.add_command(reservations_cli)
+    app.cli.add_command(outbox_cli)
+    app.cli.add_command(idempotency_cli)
+    app.cli.add_command(read_model_cli)
@@ -15,6 +15,9 @@ from app.models.order import (
 from app.models.review import Review
 from app.models.merchant_application import MerchantApplication, ApplicationStatus
 from app.models.refund import Refund, RefundReason, RefundStatus
+from app.models.outbox import OutboxMessage, OutboxStatus
+from app.models.idempotency_key import IdempotencyKey
+from app.models.order_read_model import OrderReadModel
 
 __all__ = [
     'User', 'UserRole',
@@ -27,5 +30,8 @@ __all__ = [
     'PaymentMethod', 'PaymentStatus', 'SubOrderStatus',
     'Review',
     'MerchantApplication', 'ApplicationStatus',
-    'Refund', 'RefundReason', 'RefundStatus'
+    'Refund', 'RefundReason', 'RefundStatus',
+    'OutboxMessage', 'OutboxStatus',
+    'IdempotencyKey',
+    'OrderReadModel'
 ]
\ No newline at end of file
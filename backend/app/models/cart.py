@@ -4,7 +4,8 @@ Shopping cart for customers
 """
 from datetime import datetime
 from app import db
-from sqlalchemy import CheckConstraint, UniqueConstraint
+from app.utils.upsert import dialect_insert
+from sqlalchemy import CheckConstraint, UniqueConstraint, case, literal, literal_column, select
 
 
 class Cart(db.Model):
@@ -31,39 +32,60 @@ class Cart(db.Model):
         """String representation"""
         return f'<Cart {self.id} for User {self.user_id}>'
 
-    def get_total(self):
+    def get_items(self):
+        """
+        Load cart items with their products and merchants in one query
+
+        Returns:
+            list: CartItem objects, oldest first
+        """
+        from sqlalchemy.orm import joinedload
+        from app.models.product import Product
+
+        return CartItem.query.options(
+            joinedload(CartItem.product).joinedload(Product.merchant)
+        ).filter_by(cart_id=self.id).order_by(CartItem.id).all()
+
+    def get_total(self, items=None):
         """
         Calculate total cart value
 
+        Args:
+            items: Already loaded cart items (loaded if not given)
+
         Returns:
             float: Total amount
         """
         total = 0
-        for item in self.items:
+        for item in items if items is not None else self.get_items():
             if item.product and item.product.is_active:
                 total += float(item.product.price) * item.quantity
         return total
 
-    def get_item_count(self):
+    def get_item_count(self, items=None):
         """
         Get total number of items in cart
 
+        Args:
+            items: Already loaded cart items (loaded if not given)
+
         Returns:
             int: Total quantity of all items
         """
         count = 0
-        for item in self.items:
+        for item in items if items is not None else self.get_items():
             count += item.quantity
         return count
 
     def to_dict(self):
-        """Convert cart to dictionary"""
+        """Convert cart to dictionary (one query for items, products and merchants)"""
+        items = self.get_items()
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'items': [item.to_dict() for item in self.items if item.product],
-            'total': self.get_total(),
-            'item_count': self.get_item_count(),
+            'items': [item.to_dict() for item in items if item.product],
+            'total': self.get_total(items),
+            'item_count': self.get_item_count(items),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
@@ -82,9 +104,15 @@ class Cart(db.Model):
         cart = Cart.query.filter_by(user_id=user_id).first()
 
         if not cart:
-            cart = Cart(user_id=user_id)
-            db.session.add(cart)
+            # Parallel first requests race to create the cart; the slower
+            # insert becomes a no-op instead of a unique violation
+            now = datetime.utcnow()
+            db.session.execute(
+                dialect_insert(Cart).values(user_id=user_id, created_at=now, updated_at=now)
+                .on_conflict_do_nothing(index_elements=['user_id'])
+            )
             db.session.commit()
+            cart = Cart.query.filter_by(user_id=user_id).first()
 
         return cart
 
@@ -159,29 +187,142 @@ class CartItem(db.Model):
             return float(self.product.price) * self.quantity
         return 0
 
+    @staticmethod
+    def product_summary(product):
+        """
+        Product fields shown on a cart line (also used for guest carts)
+
+        Args:
+            product: Product with its merchant loaded
+
+        Returns:
+            dict: Product summary
+        """
+        return {
+            'id': product.id,
+            'name': product.name,
+            'price': float(product.price),
+            'image_url': product.image_url,
+            'stock_quantity': product.stock_quantity,
+            'is_active': product.is_active,
+            'merchant': {
+                'id': product.merchant.id,
+                'name': product.merchant.name
+            } if product.merchant else None
+        }
+
     def to_dict(self):
         """Convert cart item to dictionary"""
         return {
             'id': self.id,
             'cart_id': self.cart_id,
-            'product': {
-                'id': self.product.id,
-                'name': self.product.name,
-                'price': float(self.product.price),
-                'image_url': self.product.image_url,
-                'stock_quantity': self.product.stock_quantity,
-                'is_active': self.product.is_active,
-                'merchant': {
-                    'id': self.product.merchant.id,
-                    'name': self.product.merchant.name
-                } if self.product.merchant else None
-            } if self.product else None,
+            'product': CartItem.product_summary(self.product) if self.product else None,
             'quantity': self.quantity,
             'subtotal': self.get_subtotal(),
             'created_at': self.created_at.isoformat() if self.created_at else None,
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+    @staticmethod
+    def _upsert(cart_id, lines, now):
+        """INSERT ... ON CONFLICT adding to the existing quantity, capped at stock"""
+        from app.models.product import Product
+
+        statement = dialect_insert(CartItem)
+        stock = select(Product.stock_quantity).where(
+            Product.id == statement.excluded.product_id
+        ).scalar_subquery()
+        added = CartItem.quantity + statement.excluded.quantity
+
+        return statement.values(lines).on_conflict_do_update(
+            index_elements=['cart_id', 'product_id'],
+            set_={
+                'quantity': case((added > stock, stock), else_=added),
+                'updated_at': now
+            }
+        )
+
+    @staticmethod
+    def _capped_quantity(product_id, quantity):
+        """Quantity to insert for a new line: the requested amount, at most the stock"""
+        from app.models.product import Product
+
+        stock = select(Product.stock_quantity).where(Product.id == product_id).scalar_subquery()
+        requested = literal(quantity)
+        return case((requested > stock, stock), else_=requested)
+
+    @staticmethod
+    def add_quantity(cart_id, product_id, quantity):
+        """
+        Add a product to a cart, creating the line if needed
+
+        One upsert on PostgreSQL; elsewhere an INSERT ... DO NOTHING and,
+        if the line exists, the upsert.
+
+        Concurrent adds of the same product each add their quantity (no
+        lost updates or unique violations), and the result never exceeds
+        the product's stock. Caller commits.
+
+        Args:
+            cart_id (int): Cart ID
+            product_id (int): Product ID
+            quantity (int): Quantity to add
+
+        Returns:
+            tuple: (quantity now in the cart, whether the line was created)
+        """
+        now = datetime.utcnow()
+        line = {
+            'cart_id': cart_id,
+            'product_id': product_id,
+            'quantity': CartItem._capped_quantity(product_id, quantity),
+            'created_at': now,
+            'updated_at': now
+        }
+        statement = CartItem._upsert(cart_id, [line], now)
+
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # xmax is 0 on a freshly inserted row version and set on an updated one
+            new_quantity, created = db.session.execute(statement.returning(
+                CartItem.quantity, (literal_column('xmax') == 0).label('inserted')
+            )).one()
+            return new_quantity, created
+
+        # No xmax elsewhere: try a plain insert first, which returns a row
+        # only if it created the line, and add to the existing line otherwise
+        inserted = db.session.execute(
+            dialect_insert(CartItem).values(line).on_conflict_do_nothing(
+                index_elements=['cart_id', 'product_id']
+            ).returning(CartItem.quantity)
+        ).scalar()
+        if inserted is not None:
+            return inserted, True
+        return db.session.execute(statement.returning(CartItem.quantity)).scalar_one(), False
+
+    @staticmethod
+    def add_quantities(cart_id, quantities):
+        """
+        Add several products to a cart in one statement (see add_quantity)
+
+        Products must be in stock: a new line capped to zero would violate
+        check_cart_item_quantity_positive.
+
+        Args:
+            cart_id (int): Cart ID
+            quantities (dict): {product_id: quantity to add}
+        """
+        now = datetime.utcnow()
+        db.session.execute(CartItem._upsert(cart_id, [
+            {
+                'cart_id': cart_id,
+                'product_id': product_id,
+                'quantity': CartItem._capped_quantity(product_id, quantity),
+                'created_at': now,
+                'updated_at': now
+            }
+            for product_id, quantity in quantities.items()
+        ], now))
+
     @staticmethod
     def find_by_id(cart_item_id):
         """
@@ -0,0 +1,43 @@
+"""
+Idempotency Key Model
+Responses stored under client-supplied Idempotency-Key headers so retried
+requests are answered without running them again
+"""
+from datetime import datetime
+from app import db
+
+
+class IdempotencyKey(db.Model):
+    """
+    One Idempotency-Key used by a user on an endpoint
+
+    A row without status_code is a request still being processed.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # Lookup key (one index covers the replay lookup)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    endpoint = db.Column(db.String(100), nullable=False)
+    key = db.Column(db.String(255), nullable=False)
+
+    # Request fingerprint (SHA-256 of the body) to catch keys reused for other requests
+    request_hash = db.Column(db.String(64), nullable=False)
+
+    # Stored response
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'endpoint', 'key', name='uq_idempotency_keys_user_endpoint_key'),
+    )
+
+    def __repr__(self):
+        """String representation"""
+        return f'<IdempotencyKey {self.endpoint} {self.key}>'
@@ -5,6 +5,7 @@ MasterOrder (customer's complete order), SubOrder (per merchant), OrderItem
 from datetime import datetime, timedelta
 from app import db
 from sqlalchemy import Enum, CheckConstraint
+from sqlalchemy.orm import selectinload
 import enum
 
 
@@ -73,6 +74,9 @@ class MasterOrder(db.Model):
     # Hub Details (if payment_method is COD)
     selected_hub_id = db.Column(db.Integer, db.ForeignKey('hubs.id'), nullable=True)
     
+    # Stock Reservation (unpaid M-Pesa orders hold stock until this time)
+    reservation_expires_at = db.Column(db.DateTime, nullable=True, index=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -80,7 +84,9 @@ class MasterOrder(db.Model):
     # Relationships
     customer = db.relationship('User', backref='master_orders', foreign_keys=[customer_id])
     selected_hub = db.relationship('Hub', backref='master_orders', foreign_keys=[selected_hub_id])
-    suborders = db.relationship('SubOrder', backref='master_order', lazy='dynamic', cascade='all, delete-orphan')
+    suborders = db.relationship(
+        'SubOrder', backref='master_order', order_by='SubOrder.id', cascade='all, delete-orphan'
+    )
 
        # Cancellation fields
     is_cancelled = db.Column(db.Boolean, default=False, nullable=False)
@@ -94,6 +100,21 @@ class MasterOrder(db.Model):
         """String representation"""
         return f'<MasterOrder {self.id} for Customer {self.customer_id}>'
     
+    @staticmethod
+    def to_dict_options():
+        """
+        Loader options for to_dict()
+
+        Loads customer, hub, suborders and everything under them with one
+        selectin query per relationship, so a page of orders costs the same
+        number of queries whatever its size.
+        """
+        return (
+            selectinload(MasterOrder.customer),
+            selectinload(MasterOrder.selected_hub),
+            selectinload(MasterOrder.suborders).options(*SubOrder.to_dict_options())
+        )
+    
     def to_dict(self):
         """Convert to dictionary"""
         return {
@@ -113,6 +134,7 @@ class MasterOrder(db.Model):
             'payment_status': self.payment_status.value,
             'mpesa_phone_number': self.mpesa_phone_number,
             'mpesa_transaction_id': self.mpesa_transaction_id,
+            'reservation_expires_at': self.reservation_expires_at.isoformat() if self.reservation_expires_at else None,
             'delivery_address': self.delivery_address,
             'delivery_city': self.delivery_city,
             'selected_hub': self.selected_hub.to_dict() if self.selected_hub else None,
@@ -159,12 +181,27 @@ class SubOrder(db.Model):
     merchant = db.relationship('User', backref='suborders_as_merchant', foreign_keys=[merchant_id])
     hub = db.relationship('Hub', backref='suborders', foreign_keys=[hub_id])
     delivery_partner = db.relationship('DeliveryPartner', backref='suborders', foreign_keys=[delivery_partner_id])
-    items = db.relationship('OrderItem', backref='suborder', lazy='dynamic', cascade='all, delete-orphan')
+    items = db.relationship('OrderItem', backref='suborder', order_by='OrderItem.id', cascade='all, delete-orphan')
     
     def __repr__(self):
         """String representation"""
         return f'<SubOrder {self.id} - Merchant {self.merchant_id}>'
     
+    @staticmethod
+    def to_dict_options(include_merchant=True):
+        """
+        Loader options for to_dict(): hub, delivery partner, items (with
+        their product snapshots) and the merchant in one selectin query each
+        """
+        options = [
+            selectinload(SubOrder.hub),
+            selectinload(SubOrder.delivery_partner),
+            selectinload(SubOrder.items)
+        ]
+        if include_merchant:
+            options.append(selectinload(SubOrder.merchant))
+        return tuple(options)
+    
     def to_dict(self, include_merchant=True):
         """Convert to dictionary"""
         suborder_dict = {
@@ -212,6 +249,11 @@ class OrderItem(db.Model):
     quantity = db.Column(db.Integer, nullable=False)
     price_at_purchase = db.Column(db.Numeric(10, 2), nullable=False)  # Price when ordered (snapshot)
     
+    # Product as it was when ordered (snapshot), so order history survives
+    # product edits and is rendered without reading products
+    product_name = db.Column(db.String(200), nullable=False, server_default='')
+    product_image_url = db.Column(db.String(500), nullable=True)
+    
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -237,10 +279,10 @@ class OrderItem(db.Model):
         return {
             'id': self.id,
             'product': {
-                'id': self.product.id,
-                'name': self.product.name,
-                'image_url': self.product.image_url
-            } if self.product else None,
+                'id': self.product_id,
+                'name': self.product_name,
+                'image_url': self.product_image_url
+            },
             'quantity': self.quantity,
             'price_at_purchase': float(self.price_at_purchase),
             'subtotal': self.get_subtotal(),
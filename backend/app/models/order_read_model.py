@@ -0,0 +1,63 @@
+"""
+Order Read Model
+Denormalized order listing rows (one per suborder) maintained by the order
+write paths, so admin, merchant, hub and customer lists read one table
+"""
+from app import db
+from sqlalchemy import Enum
+from app.models.order import PaymentMethod, PaymentStatus, SubOrderStatus
+
+
+class OrderReadModel(db.Model):
+    """
+    One suborder as order lists show it
+
+    Rows are written by app.services.order_read_model_service in the same
+    transaction as the order change they reflect; `flask read-model
+    rebuild` recomputes them all from the order tables.
+    """
+    __tablename__ = 'order_read_model'
+
+    # Primary Key (one row per suborder)
+    suborder_id = db.Column(db.Integer, db.ForeignKey('suborders.id', ondelete='CASCADE'), primary_key=True)
+
+    # Master order
+    master_order_id = db.Column(db.Integer, nullable=False)
+    order_total = db.Column(db.Numeric(10, 2), nullable=False)
+    payment_method = db.Column(Enum(PaymentMethod), nullable=False)
+    payment_status = db.Column(Enum(PaymentStatus), nullable=False)
+    is_cancelled = db.Column(db.Boolean, nullable=False, default=False)
+    order_created_at = db.Column(db.DateTime, nullable=False)
+
+    # People and places (names as of the last order change)
+    customer_id = db.Column(db.Integer, nullable=False)
+    customer_name = db.Column(db.String(100), nullable=True)
+    customer_email = db.Column(db.String(120), nullable=True)
+    merchant_id = db.Column(db.Integer, nullable=False)
+    merchant_name = db.Column(db.String(100), nullable=True)
+    hub_id = db.Column(db.Integer, nullable=True)
+    hub_name = db.Column(db.String(100), nullable=True)
+
+    # Suborder
+    status = db.Column(Enum(SubOrderStatus), nullable=False)
+    subtotal_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    merchant_payout_amount = db.Column(db.Numeric(10, 2), nullable=False)
+    pickup_deadline = db.Column(db.DateTime, nullable=True)
+    item_count = db.Column(db.Integer, nullable=False, default=0)
+
+    # Timestamps (of the suborder)
+    created_at = db.Column(db.DateTime, nullable=False)
+    updated_at = db.Column(db.DateTime, nullable=False)
+
+    # One index per list: newest first, keyset on (created_at, suborder_id)
+    __table_args__ = (
+        db.Index('ix_order_read_model_merchant', 'merchant_id', 'created_at', 'suborder_id'),
+        db.Index('ix_order_read_model_hub', 'hub_id', 'created_at', 'suborder_id'),
+        db.Index('ix_order_read_model_customer', 'customer_id', 'order_created_at', 'master_order_id'),
+        db.Index('ix_order_read_model_order_created', 'order_created_at', 'master_order_id'),
+        db.Index('ix_order_read_model_master_order_status', 'master_order_id', 'status'),
+    )
+
+    def __repr__(self):
+        """String representation"""
+        return f'<OrderReadModel SubOrder {self.suborder_id} ({self.status.value})>'
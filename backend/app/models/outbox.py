@@ -0,0 +1,65 @@
+"""
+Outbox Model
+Side effects (STK push, notification emails) recorded in the same
+transaction as the order and performed later by the outbox worker
+"""
+from datetime import datetime
+from app import db
+from sqlalchemy import Enum
+import enum
+
+
+class OutboxStatus(enum.Enum):
+    """Outbox message status enumeration"""
+    PENDING = "pending"  # Waiting for its next attempt
+    PROCESSING = "processing"  # Claimed by a worker
+    SENT = "sent"
+    FAILED = "failed"  # Gave up after OUTBOX_MAX_ATTEMPTS
+
+
+class OutboxMessage(db.Model):
+    """
+    One side effect to perform after a commit
+    """
+    __tablename__ = 'outbox_messages'
+
+    # Primary Key
+    id = db.Column(db.Integer, primary_key=True)
+
+    # What to do
+    kind = db.Column(db.String(50), nullable=False)  # e.g. 'stk_push', 'order_confirmation_email'
+    order_id = db.Column(db.Integer, db.ForeignKey('master_orders.id'), nullable=True, index=True)
+    payload = db.Column(db.JSON, nullable=True)
+
+    # Delivery state
+    status = db.Column(Enum(OutboxStatus), nullable=False, default=OutboxStatus.PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Also the claim lease
+    last_error = db.Column(db.Text, nullable=True)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Worker scans due messages by (status, next_attempt_at)
+    __table_args__ = (
+        db.Index('ix_outbox_messages_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    def __repr__(self):
+        """String representation"""
+        return f'<OutboxMessage {self.id} {self.kind} ({self.status.value})>'
+
+    def to_dict(self):
+        """Convert to dictionary"""
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'status': self.status.value,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
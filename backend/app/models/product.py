@@ -3,8 +3,19 @@ Product Model
 Products listed by merchants
 """
 from datetime import datetime
+from flask import current_app
 from app import db
-from sqlalchemy import CheckConstraint
+from sqlalchemy import CheckConstraint, DDL, event, literal
+from sqlalchemy.orm import joinedload
+from app.utils.pagination import keyset_paginate
+from app.services.search_service import (
+    SQLITE_FTS_DDL, SQLITE_FTS_DROP, PG_FTS_INDEX_DDL, PG_TRGM_DDL,
+    apply_text_search, apply_fuzzy_search
+)
+
+
+# Listing sort modes accepted by Product.search_products (`relevance` needs a query)
+SORT_MODES = ('relevance', 'newest', 'price_asc', 'price_desc', 'rating', 'best_selling')
 
 
 class Product(db.Model):
@@ -30,6 +41,18 @@ class Product(db.Model):
     # Status
     is_active = db.Column(db.Boolean, default=True, nullable=False)
 
+    # Review aggregates (maintained by apply_rating_change, rebuilt by `flask ratings rebuild`)
+    rating_avg = db.Column(db.Numeric(3, 2), nullable=False, default=0, server_default='0')
+    rating_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_1_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_2_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_3_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_4_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    rating_5_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # Sales (maintained with stock on order create/cancel)
+    units_sold = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
     # Timestamps
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -41,6 +64,18 @@ class Product(db.Model):
     __table_args__ = (
         CheckConstraint('price >= 10', name='check_price_minimum'),
         CheckConstraint('stock_quantity >= 0', name='check_stock_non_negative'),
+
+        # Listing indexes: one per sort mode, with and without a category
+        # filter, so every sort is an index range scan (see sort_order).
+        # The trailing id matches the tie-breaker in each ORDER BY.
+        db.Index('ix_products_active_price', 'is_active', 'price', 'id'),
+        db.Index('ix_products_active_category_price', 'is_active', 'category_id', 'price', 'id'),
+        db.Index('ix_products_active_units_sold', 'is_active', 'units_sold', 'id'),
+        db.Index('ix_products_active_category_units_sold', 'is_active', 'category_id', 'units_sold', 'id'),
+        db.Index('ix_products_active_rating', 'is_active', 'rating_avg', 'rating_count', 'id'),
+        db.Index('ix_products_active_category_rating', 'is_active', 'category_id', 'rating_avg', 'rating_count', 'id'),
+        db.Index('ix_products_active_created', 'is_active', 'created_at', 'id'),
+        db.Index('ix_products_active_category_created', 'is_active', 'category_id', 'created_at', 'id'),
     )
 
     def __repr__(self):
@@ -57,6 +92,10 @@ class Product(db.Model):
             'stock_quantity': self.stock_quantity,
             'image_url': self.image_url,
             'is_active': self.is_active,
+            'rating': {
+                'average': round(float(self.rating_avg or 0), 1),
+                'count': self.rating_count or 0
+            },
             'category': {
                 'id': self.category.id,
                 'name': self.category.name
@@ -80,14 +119,7 @@ class Product(db.Model):
         Returns:
             float: Average rating (0 if no reviews)
         """
-        from sqlalchemy import func
-        from app.models.review import Review
-
-        avg = db.session.query(func.avg(Review.rating)).filter_by(
-            product_id=self.id
-        ).scalar()
-
-        return round(float(avg), 1) if avg else 0
+        return round(float(self.rating_avg), 1) if self.rating_count else 0
 
     def get_review_count(self):
         """
@@ -96,9 +128,16 @@ class Product(db.Model):
         Returns:
             int: Review count
         """
-        from app.models.review import Review
+        return self.rating_count or 0
 
-        return Review.query.filter_by(product_id=self.id).count()
+    def get_rating_distribution(self):
+        """
+        Get number of reviews per star rating
+
+        Returns:
+            dict: {'1': count, ..., '5': count}
+        """
+        return {str(stars): getattr(self, f'rating_{stars}_count') or 0 for stars in range(1, 6)}
 
     def to_dict_with_reviews(self, include_merchant=True):
         """
@@ -108,20 +147,125 @@ class Product(db.Model):
             dict: Product data with review statistics
         """
         product_dict = self.to_dict(include_merchant=include_merchant)
-        product_dict['rating'] = {
-            'average': self.get_average_rating(),
-            'count': self.get_review_count()
-        }
+        product_dict['rating']['distribution'] = self.get_rating_distribution()
         return product_dict
 
+    @staticmethod
+    def apply_rating_change(product_id, added=None, removed=None):
+        """
+        Update the stored review aggregates for one review write
+
+        Runs as atomic UPDATEs in the caller's transaction, so the
+        aggregates commit (or roll back) together with the review.
+
+        Args:
+            product_id: Product the review belongs to
+            added: Star rating added (new review, or new value on edit)
+            removed: Star rating removed (deleted review, or old value on edit)
+        """
+        from sqlalchemy import update
+
+        if added == removed:
+            return
+
+        changes = {}
+        for stars, delta in ((added, 1), (removed, -1)):
+            if stars is not None:
+                column = getattr(Product, f'rating_{stars}_count')
+                changes[column] = column + delta
+        count_delta = (added is not None) - (removed is not None)
+        if count_delta:
+            changes[Product.rating_count] = Product.rating_count + count_delta
+
+        # Rating changes are not product edits
+        changes[Product.updated_at] = Product.updated_at
+
+        db.session.execute(
+            update(Product).where(Product.id == product_id).values(changes),
+            execution_options={'synchronize_session': 'fetch'}
+        )
+        db.session.execute(
+            update(Product).where(Product.id == product_id).values({
+                Product.rating_avg: Product._rating_avg_expression(),
+                Product.updated_at: Product.updated_at
+            }),
+            execution_options={'synchronize_session': 'fetch'}
+        )
+
+    @staticmethod
+    def _rating_avg_expression():
+        """Average rating computed from the per-star counts"""
+        from sqlalchemy import case
+
+        weighted = sum(getattr(Product, f'rating_{stars}_count') * stars for stars in range(1, 6))
+        return case(
+            (Product.rating_count > 0, weighted * 1.0 / Product.rating_count),
+            else_=0
+        )
+
+    @staticmethod
+    def rebuild_rating_aggregates():
+        """
+        Recompute every product's review aggregates from the reviews table
+
+        Returns:
+            int: Number of products updated
+        """
+        from sqlalchemy import update, select, func
+        from app.models.review import Review
+
+        def count_reviews(stars=None):
+            query = select(func.count(Review.id)).where(Review.product_id == Product.id)
+            if stars is not None:
+                query = query.where(Review.rating == stars)
+            return query.scalar_subquery()
+
+        values = {Product.rating_count: count_reviews(), Product.updated_at: Product.updated_at}
+        for stars in range(1, 6):
+            values[getattr(Product, f'rating_{stars}_count')] = count_reviews(stars)
+
+        result = db.session.execute(update(Product).values(values))
+        db.session.execute(update(Product).values({
+            Product.rating_avg: Product._rating_avg_expression(),
+            Product.updated_at: Product.updated_at
+        }))
+        db.session.commit()
+        return result.rowcount
+
     @staticmethod
     def find_by_id(product_id):
         """Find product by ID"""
         return Product.query.get(product_id)
 
+    @staticmethod
+    def sort_order(sort):
+        """
+        ORDER BY clauses for a listing sort mode
+
+        Each mode is served by an ix_products_active_* index. All columns,
+        including the id tie-breaker, run in the same direction so the
+        index can be scanned forwards or backwards without a sort step.
+
+        Args:
+            sort: One of SORT_MODES except 'relevance'
+
+        Returns:
+            list: ORDER BY clauses
+        """
+        if sort == 'price_asc':
+            return [Product.price.asc(), Product.id.asc()]
+        if sort == 'price_desc':
+            return [Product.price.desc(), Product.id.desc()]
+        if sort == 'rating':
+            return [Product.rating_avg.desc(), Product.rating_count.desc(), Product.id.desc()]
+        if sort == 'best_selling':
+            return [Product.units_sold.desc(), Product.id.desc()]
+        return [Product.created_at.desc(), Product.id.desc()]
+
     @staticmethod
     def search_products(query=None, category_id=None, min_price=None, max_price=None,
-                       in_stock_only=True, page=1, per_page=20):
+                       in_stock_only=True, page=1, per_page=20, with_facets=False, sort=None,
+                       cursor=None, keyset=False, include_total=True):
         """
         Search and filter products with pagination
 
@@ -133,43 +277,194 @@ class Product(db.Model):
             in_stock_only: Only show products in stock
             page: Page number
             per_page: Items per page
+            with_facets: Also compute facet counts (see facet_counts)
+            sort: One of SORT_MODES (default: relevance when searching, else newest)
+            cursor: Keyset cursor from the previous page (with keyset)
+            keyset: Use cursor pagination instead of page/offset. Only applies
+                when browsing without a search query.
+            include_total: Count all matches (keyset pagination only)
 
         Returns:
-            Pagination object with filtered products
+            Pagination object with filtered products, or a CursorPage with
+            keyset. `.total_approximate` tells whether the total is a planner
+            estimate (see count_service). With with_facets, the counts are
+            set on `.facets`.
         """
+        from app.services.count_service import count_query
+        if sort not in SORT_MODES or (sort == 'relevance' and not query):
+            sort = 'relevance' if query else 'newest'
+
+        def apply_price_filters(products_query):
+            if min_price is not None:
+                products_query = products_query.filter(Product.price >= min_price)
+            if max_price is not None:
+                products_query = products_query.filter(Product.price <= max_price)
+            return products_query
+
+        def apply_filters(products_query):
+            # Filter by category
+            if category_id:
+                products_query = products_query.filter_by(category_id=category_id)
+
+            # Filter by price range
+            products_query = apply_price_filters(products_query)
+
+            # Filter by stock
+            if in_stock_only:
+                products_query = products_query.filter(Product.stock_quantity > 0)
+
+            # Relevance keeps the search backend's ranking, newest first on ties;
+            # any other mode replaces it
+            if sort == 'relevance':
+                return products_query.order_by(Product.created_at.desc())
+            return products_query.order_by(None).order_by(*Product.sort_order(sort))
+
         # Start with base query - only active products
-        products_query = Product.query.filter_by(is_active=True)
-
-        # Apply search query
-        if query:
-            search_term = f'%{query}%'
-            products_query = products_query.filter(
-                db.or_(
-                    Product.name.ilike(search_term),
-                    Product.description.ilike(search_term)
+        base_query = Product.query.filter_by(is_active=True)
+
+        # Apply search query (full-text index, see search_service)
+        matching_query = apply_text_search(base_query, query) if query else base_query
+        products_query = apply_filters(matching_query)
+
+        # Totals are cached per filter combination and estimated for large
+        # unfiltered listings instead of running COUNT(*) for every page
+        def count_matches(products_query, fuzzy=False):
+            unfiltered = not query and not category_id and min_price is None and max_price is None
+            return count_query(
+                products_query,
+                'products',
+                signature=(query, category_id, min_price, max_price, in_stock_only, fuzzy),
+                estimate=unfiltered
+            )
+
+        # Paginate (category and merchant are joined in for to_dict(), so
+        # a page costs the same two queries whatever its size)
+        listing_options = (joinedload(Product.category), joinedload(Product.merchant))
+
+        # Browsing: keyset pagination on the sort mode's index, so deep pages
+        # cost the same as the first
+        if keyset and not query:
+            result = keyset_paginate(
+                products_query.options(*listing_options),
+                Product.sort_order(sort),
+                cursor=cursor,
+                limit=per_page
+            )
+            if include_total:
+                result.total, result.total_approximate = count_matches(products_query)
+            if with_facets:
+                result.facets = Product.facet_counts(
+                    apply_price_filters(matching_query),
+                    category_id=category_id,
+                    in_stock_only=in_stock_only
                 )
+            return result
+
+        pagination = products_query.options(*listing_options).paginate(
+            page=page,
+            per_page=per_page,
+            error_out=False,
+            count=False
+        )
+        pagination.total, pagination.total_approximate = count_matches(products_query)
+
+        # Typo tolerance: when exact matching finds too few products, search
+        # names by trigram similarity instead, keeping the exact hits on top.
+        # Costs nothing extra when the exact search finds enough.
+        if query and pagination.total < current_app.config.get('SEARCH_FUZZY_MIN_RESULTS', 0):
+            exact_ids = [product_id for (product_id,) in products_query.with_entities(Product.id)]
+            matching_query = apply_fuzzy_search(base_query, query, include_ids=exact_ids)
+            fuzzy_query = apply_filters(matching_query)
+            pagination = fuzzy_query.options(*listing_options).paginate(
+                page=page,
+                per_page=per_page,
+                error_out=False,
+                count=False
             )
+            pagination.total, pagination.total_approximate = count_matches(fuzzy_query, fuzzy=True)
 
-        # Filter by category
-        if category_id:
-            products_query = products_query.filter_by(category_id=category_id)
+        if with_facets:
+            pagination.facets = Product.facet_counts(
+                apply_price_filters(matching_query),
+                category_id=category_id,
+                in_stock_only=in_stock_only
+            )
 
-        # Filter by price range
-        if min_price is not None:
-            products_query = products_query.filter(Product.price >= min_price)
-        if max_price is not None:
-            products_query = products_query.filter(Product.price <= max_price)
+        return pagination
 
-        # Filter by stock
-        if in_stock_only:
-            products_query = products_query.filter(Product.stock_quantity > 0)
+    @staticmethod
+    def facet_counts(products_query, category_id=None, in_stock_only=True):
+        """
+        Category, price bucket and stock counts for a search in one query
 
-        # Order by newest first
-        products_query = products_query.order_by(Product.created_at.desc())
+        The products are grouped by (category, price bucket, in stock) once
+        and each facet is folded from those rows. Every facet honours the
+        other active filters but not its own, so the category facet still
+        lists sibling categories while a category is selected.
 
-        # Paginate
-        return products_query.paginate(
-            page=page,
-            per_page=per_page,
-            error_out=False
-        )
+        Args:
+            products_query: Product query with the search and price filters
+                applied (but not the category or stock filters)
+            category_id: Selected category, if any
+            in_stock_only: Whether out-of-stock products are hidden
+
+        Returns:
+            dict: {'categories': [...], 'price_buckets': [...], 'stock': {...}}
+        """
+        from sqlalchemy import case, func
+        from app.models.category import Category
+
+        boundaries = current_app.config.get('PRICE_FACET_BOUNDARIES', [])
+        bucket = case(
+            *[(Product.price < upper, position) for position, upper in enumerate(boundaries)],
+            else_=len(boundaries)
+        ) if boundaries else literal(0)
+        in_stock = Product.stock_quantity > 0
+
+        rows = products_query.order_by(None).join(
+            Category, Category.id == Product.category_id
+        ).with_entities(
+            Category.id, Category.name, bucket, in_stock, func.count(Product.id)
+        ).group_by(
+            Category.id, Category.name, bucket, in_stock
+        ).all()
+
+        categories = {}
+        bucket_counts = [0] * (len(boundaries) + 1)
+        stock = {'in_stock': 0, 'out_of_stock': 0}
+
+        for row_category_id, category_name, row_bucket, row_in_stock, count in rows:
+            stock_matches = row_in_stock or not in_stock_only
+            category_matches = not category_id or row_category_id == category_id
+
+            if stock_matches:
+                entry = categories.setdefault(
+                    row_category_id, {'id': row_category_id, 'name': category_name, 'count': 0}
+                )
+                entry['count'] += count
+            if stock_matches and category_matches:
+                bucket_counts[row_bucket] += count
+            if category_matches:
+                stock['in_stock' if row_in_stock else 'out_of_stock'] += count
+
+        lower_bounds = [0] + list(boundaries)
+        upper_bounds = list(boundaries) + [None]
+
+        return {
+            'categories': sorted(categories.values(), key=lambda c: (-c['count'], c['name'])),
+            'price_buckets': [
+                {'min': lower, 'max': upper, 'count': count}
+                for lower, upper, count in zip(lower_bounds, upper_bounds, bucket_counts)
+            ],
+            'stock': stock
+        }
+
+
+# Full-text and trigram search index DDL for databases built with db.create_all()
+# (migrations create the same objects for existing databases)
+for _statement in SQLITE_FTS_DDL:
+    event.listen(Product.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+event.listen(Product.__table__, 'before_drop', DDL(SQLITE_FTS_DROP).execute_if(dialect='sqlite'))
+event.listen(Product.__table__, 'after_create', DDL(PG_FTS_INDEX_DDL).execute_if(dialect='postgresql'))
+for _statement in PG_TRGM_DDL:
+    event.listen(Product.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
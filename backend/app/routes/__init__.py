@@ -5,6 +5,7 @@ from app.routes import (
     merchant,
     admin,
     cart,
+    checkout,
     orders,
     payments,
     merchant_orders,
@@ -27,6 +28,7 @@ __all__ = [
     'merchant',
     'admin',
     'cart',
+    'checkout',
     'orders',
     'payments',
     'merchant_orders',
@@ -8,6 +8,7 @@ from app import db
 from app.models.category import Category
 from app.models.user import User, UserRole
 from app.utils.decorators import admin_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
 
 # Create blueprint
 bp = Blueprint('admin', __name__)
@@ -222,18 +223,21 @@ def get_users(current_user):
     Get all users with pagination and filtering
 
     GET /api/v1/admin/users?page=1&limit=20&role=customer&search=john
+    GET /api/v1/admin/users?limit=20&cursor=<next_cursor>
     Headers: Authorization: Bearer <admin_access_token>
 
     Query Parameters:
-    - page: Page number (default: 1)
-    - limit: Items per page (default: 20)
+    - page: Page number (page/offset pagination)
+    - cursor: next_cursor from the previous page (cursor pagination, used without page)
+    - limit: Items per page (default: 20, max: 100)
+    - include_total: Count all matching users in cursor mode (default: true)
     - role: Filter by role (optional)
     - search: Search by name or email (optional)
     - active: Filter by active status (true/false, optional)
     """
     # Parse query parameters
     page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
+    limit = min(int(request.args.get('limit', 20)), 100)
     role_filter = request.args.get('role')
     search = request.args.get('search')
     active_filter = request.args.get('active')
@@ -268,6 +272,20 @@ def get_users(current_user):
             )
         )
 
+    if 'page' not in request.args:
+        result = keyset_paginate(
+            query,
+            [User.created_at.desc(), User.id.desc()],
+            **get_cursor_args(include_total=True)
+        )
+        return jsonify({
+            'success': True,
+            'data': {
+                'users': [user.to_dict() for user in result.items],
+                'pagination': result.to_dict()
+            }
+        }), 200
+
     # Get total count for pagination
     total_users = query.count()
 
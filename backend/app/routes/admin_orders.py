@@ -5,6 +5,7 @@ Admin management of orders, hubs and delivery partners
 from flask import Blueprint, request, jsonify
 from marshmallow import Schema, fields, validate, ValidationError
 from sqlalchemy import func, desc, and_, or_
+from sqlalchemy.orm import aliased
 from app import db
 from app.models.hub import Hub
 from app.models.delivery_partner import DeliveryPartner
@@ -12,8 +13,14 @@ from app.models.order import (
     MasterOrder, SubOrder, OrderItem,
     PaymentMethod, PaymentStatus, SubOrderStatus
 )
+from app.models.order_read_model import OrderReadModel
 from app.models.user import User
 from app.utils.decorators import admin_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
+from app.services.order_read_model_service import refresh_order_read_model
+from app.services.order_summary_service import (
+    master_order_summaries, master_order_sort, master_order_summary, count_master_orders
+)
 
 # Create blueprint
 bp = Blueprint('admin_orders', __name__)
@@ -332,39 +339,33 @@ def get_admin_orders(current_user):
     Get all orders for admin (with pagination and filtering)
 
     GET /api/v1/admin/orders?status=PENDING_PAYMENT&page=1&limit=20
+    GET /api/v1/admin/orders?limit=20&cursor=<next_cursor>
     Headers: Authorization: Bearer <admin_access_token>
 
+    Each page is one aggregated query on the order read model: orders
+    with their customer, suborder count, item count and status rollup
+    (the suborders' common status, or 'mixed' while they differ).
+
     Query Parameters:
-    - status: Filter by order status (optional)
-    - page: Page number (default: 1)
-    - limit: Items per page (default: 20)
+    - status: Only orders with a suborder in this status (optional)
+    - page: Page number (page/offset pagination)
+    - cursor: next_cursor from the previous page (cursor pagination, used without page)
+    - limit: Items per page (default: 20, max: 100)
+    - include_total: Count all matching orders in cursor mode (default: true)
     """
     # Parse query parameters
     status_filter = request.args.get('status')
     page = int(request.args.get('page', 1))
-    limit = int(request.args.get('limit', 20))
-
-    # Base query - get master orders with customer info
-    query = db.session.query(
-        MasterOrder,
-        User.name.label('customer_name'),
-        User.email.label('customer_email')
-    ).join(
-        User, MasterOrder.customer_id == User.id
-    )
+    limit = min(int(request.args.get('limit', 20)), 100)
 
-    # Apply status filter if provided
+    # Read model rows, grouped per master order
+    conditions = []
+
+    # Apply status filter if provided: EXISTS probe on the read model's
+    # (master_order_id, status) index instead of IN (subquery)
     if status_filter:
         try:
-            # For master orders, we need to check suborder statuses
-            # This is a simplified filter - you might want to adjust based on your needs
-            query = query.filter(
-                MasterOrder.id.in_(
-                    db.session.query(SubOrder.master_order_id).filter(
-                        SubOrder.status == SubOrderStatus(status_filter)
-                    )
-                )
-            )
+            status = SubOrderStatus(status_filter)
         except ValueError:
             return jsonify({
                 'success': False,
@@ -374,52 +375,55 @@ def get_admin_orders(current_user):
                 }
             }), 400
 
-    # Get total count for pagination
-    total_orders = query.count()
+        matching = aliased(OrderReadModel)
+        conditions.append(
+            db.session.query(matching.suborder_id).filter(
+                matching.master_order_id == OrderReadModel.master_order_id,
+                matching.status == status
+            ).exists()
+        )
+
+    summaries = master_order_summaries(*conditions)
 
-    # Apply pagination and ordering
-    orders_data = query.order_by(
-        MasterOrder.created_at.desc()
-    ).offset((page - 1) * limit).limit(limit).all()
+    if 'page' in request.args:
+        # Get total count for pagination
+        total_orders = count_master_orders(*conditions)
+
+        # Apply pagination and ordering
+        orders_data = summaries.order_by(*master_order_sort()).offset((page - 1) * limit).limit(limit).all()
+
+        pagination = {
+            'page': page,
+            'limit': limit,
+            'total': total_orders,
+            'pages': (total_orders + limit - 1) // limit
+        }
+    else:
+        cursor_args = get_cursor_args(include_total=True)
+        include_total = cursor_args.pop('include_total')
+        result = keyset_paginate(summaries, master_order_sort(), **cursor_args)
+        # Count orders without grouping
+        if include_total:
+            result.total = count_master_orders(*conditions)
+        orders_data = result.items
+        pagination = result.to_dict()
 
     # Format the response
     orders = []
-    for master_order, customer_name, customer_email in orders_data:
-        # Get suborders for this master order
-        suborders = SubOrder.query.filter_by(master_order_id=master_order.id).all()
-
-        # Determine overall status (simplified - take the first suborder status)
-        overall_status = suborders[0].status.value if suborders else 'UNKNOWN'
-
-        # Get items count
-        items_count = sum(len(suborder.items) for suborder in suborders)
-
-        order_dict = {
-            'id': master_order.id,
-            'total_amount': float(master_order.total_amount),
-            'payment_method': master_order.payment_method.value,
-            'payment_status': master_order.payment_status.value,
-            'status': overall_status,
-            'created_at': master_order.created_at.isoformat(),
-            'customer': {
-                'id': master_order.customer_id,
-                'name': customer_name,
-                'email': customer_email
-            },
-            'items': items_count,
-            'is_cancelled': master_order.is_cancelled
+    for row in orders_data:
+        order_dict = master_order_summary(row)
+        order_dict['customer'] = {
+            'id': row.customer_id,
+            'name': row.customer_name,
+            'email': row.customer_email
         }
+        order_dict['items'] = order_dict['item_count']
         orders.append(order_dict)
 
     return jsonify({
         'success': True,
         'data': orders,
-        'pagination': {
-            'page': page,
-            'limit': limit,
-            'total': total_orders,
-            'pages': (total_orders + limit - 1) // limit
-        }
+        'pagination': pagination
     }), 200
 
 
@@ -433,13 +437,13 @@ def get_admin_order_stats(current_user):
     Headers: Authorization: Bearer <admin_access_token>
     """
     # Total orders
-    total_orders = MasterOrder.query.count()
+    total_orders = count_master_orders()
 
-    # Orders by status (using suborders)
+    # Orders by status (using suborders, from the read model)
     status_counts = db.session.query(
-        SubOrder.status,
-        func.count(SubOrder.id).label('count')
-    ).group_by(SubOrder.status).all()
+        OrderReadModel.status,
+        func.count(OrderReadModel.suborder_id).label('count')
+    ).group_by(OrderReadModel.status).all()
 
     # Convert to dictionary for easier access
     status_dict = {status.value: count for status, count in status_counts}
@@ -458,9 +462,9 @@ def get_admin_order_stats(current_user):
 
     # Total revenue (from completed orders)
     total_revenue = db.session.query(
-        func.sum(SubOrder.subtotal_amount)
+        func.sum(OrderReadModel.subtotal_amount)
     ).filter(
-        SubOrder.status.in_([
+        OrderReadModel.status.in_([
             SubOrderStatus.DELIVERED,
             SubOrderStatus.COMPLETED,
             SubOrderStatus.PAYMENT_RECEIVED_READY_FOR_COLLECTION
@@ -541,6 +545,7 @@ def update_order_status(current_user, order_id):
         for suborder in suborders:
             suborder.status = status_enum
 
+        refresh_order_read_model(master_order_ids=[order_id])
         db.session.commit()
 
         # TODO: Send notifications to customer/merchant
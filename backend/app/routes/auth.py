@@ -38,6 +38,28 @@ reset_password_schema = ResetPasswordSchema()
 user_response_schema = UserResponseSchema()
 
 
+def _merge_guest_cart(user, response_data):
+    """
+    Merge the guest cart sent with a login/registration into the user's cart
+
+    Adds `guest_cart_merged` (number of products) to the response data when
+    the request carried an X-Guest-Cart-Token. A failed merge never blocks
+    the login.
+    """
+    from app.services.guest_cart import get_guest_cart_token, merge_guest_cart
+
+    token = get_guest_cart_token()
+    if not token or user.role != UserRole.CUSTOMER:
+        return
+
+    try:
+        response_data['guest_cart_merged'] = merge_guest_cart(user, token)
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Failed to merge guest cart for user {user.id}: {str(e)}")
+        response_data['guest_cart_merged'] = 0
+
+
 @bp.route('/register', methods=['POST'])
 @limiter.limit("5 per hour")  # Prevent spam registrations
 def register():
@@ -112,14 +134,17 @@ def register():
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
 
+    data = {
+        'user': user_response_schema.dump(user),
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'requires_verification': True
+    }
+    _merge_guest_cart(user, data)
+
     return jsonify({
         'success': True,
-        'data': {
-            'user': user_response_schema.dump(user),
-            'access_token': access_token,
-            'refresh_token': refresh_token,
-            'requires_verification': True
-        },
+        'data': data,
         'message': 'User registered successfully. Please check your email for verification code.'
     }), 201
 
@@ -176,13 +201,16 @@ def login():
     access_token = create_access_token(identity=str(user.id))
     refresh_token = create_refresh_token(identity=str(user.id))
     
+    data = {
+        'user': user_response_schema.dump(user),
+        'access_token': access_token,
+        'refresh_token': refresh_token
+    }
+    _merge_guest_cart(user, data)
+    
     return jsonify({
         'success': True,
-        'data': {
-            'user': user_response_schema.dump(user),
-            'access_token': access_token,
-            'refresh_token': refresh_token
-        },
+        'data': data,
         'message': 'Login successful'
     }), 200
 
@@ -565,13 +593,16 @@ def google_auth():
         access_token = create_access_token(identity=str(user.id))
         refresh_token = create_refresh_token(identity=str(user.id))
 
+        data = {
+            'user': user_response_schema.dump(user),
+            'access_token': access_token,
+            'refresh_token': refresh_token
+        }
+        _merge_guest_cart(user, data)
+
         return jsonify({
             'success': True,
-            'data': {
-                'user': user_response_schema.dump(user),
-                'access_token': access_token,
-                'refresh_token': refresh_token
-            },
+            'data': data,
             'message': 'Login successful'
         }), 200
 
@@ -4,7 +4,7 @@ Shopping cart management endpoints
 """
 from flask import Blueprint, request, jsonify
 from marshmallow import Schema, fields, validate, ValidationError
-from app import db
+from app import db, limiter
 from app.models.cart import Cart, CartItem
 from app.models.product import Product
 from app.utils.decorators import customer_required, role_required
@@ -26,6 +26,10 @@ class UpdateCartItemSchema(Schema):
     quantity = fields.Int(required=True, validate=validate.Range(min=1, max=100))
 
 
+# Largest batch accepted by POST /cart/items/bulk, and most products a guest cart holds
+MAX_BULK_ITEMS = 100
+
+
 # Initialize schemas
 add_to_cart_schema = AddToCartSchema()
 update_cart_item_schema = UpdateCartItemSchema()
@@ -110,69 +114,141 @@ def add_to_cart(current_user):
     # Get or create cart
     cart = Cart.get_or_create_cart(current_user.id)
     
-    # Check if product already in cart
-    existing_item = CartItem.find_in_cart(cart.id, product.id)
-    
-    if existing_item:
-        # Update quantity
-        new_quantity = existing_item.quantity + data['quantity']
-        
-        # Check if new quantity exceeds stock
-        if new_quantity > product.stock_quantity:
-            return jsonify({
-                'success': False,
-                'error': {
-                    'code': 'INSUFFICIENT_STOCK',
-                    'message': f'Cannot add {data["quantity"]} more. Only {product.stock_quantity - existing_item.quantity} more available.'
-                }
-            }), 400
-        
-        existing_item.quantity = new_quantity
-        
-        try:
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'error': {
-                    'code': 'DATABASE_ERROR',
-                    'message': 'Failed to update cart'
-                }
-            }), 500
-        
+    # Insert or add to the existing line in one statement, capped at stock,
+    # so double-clicks and parallel tabs can't race each other
+    try:
+        quantity, created = CartItem.add_quantity(cart.id, product.id, data['quantity'])
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
         return jsonify({
-            'success': True,
-            'data': cart.to_dict(),
-            'message': 'Cart updated successfully'
-        }), 200
+            'success': False,
+            'error': {
+                'code': 'DATABASE_ERROR',
+                'message': 'Failed to add item to cart'
+            }
+        }), 500
     
+    if created:
+        message = 'Item added to cart successfully'
+    elif quantity >= product.stock_quantity:
+        message = f'Cart updated. All {quantity} unit(s) in stock are in your cart.'
     else:
-        # Add new item to cart
-        cart_item = CartItem(
-            cart_id=cart.id,
-            product_id=product.id,
-            quantity=data['quantity']
-        )
-        
+        message = 'Cart updated successfully'
+    
+    return jsonify({
+        'success': True,
+        'data': cart.to_dict(),
+        'message': message
+    }), 201 if created else 200
+
+
+@bp.route('/items/bulk', methods=['POST'])
+@role_required(UserRole.CUSTOMER)
+def bulk_add_to_cart(current_user):
+    """
+    Add several items to cart in one request (re-order, saved lists)
+    
+    POST /api/v1/cart/items/bulk
+    Headers: Authorization: Bearer <access_token>
+    Body: {
+        "items": [
+            {"product_id": 1, "quantity": 2},
+            {"product_id": 5, "quantity": 1}
+        ]
+    }
+    
+    Lines that can't be added (unknown or inactive product, not enough
+    stock, invalid quantity) are reported in `errors` by their index in
+    `items`; every other line is added in a single transaction.
+    """
+    lines = (request.json or {}).get('items')
+    
+    if not isinstance(lines, list) or not 1 <= len(lines) <= MAX_BULK_ITEMS:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': f'items must be a list of 1 to {MAX_BULK_ITEMS} products'
+            }
+        }), 400
+    
+    errors = []
+    
+    def line_error(index, product_id, code, message):
+        errors.append({'index': index, 'product_id': product_id, 'code': code, 'message': message})
+    
+    # Validate each line on its own so one bad line doesn't reject the batch
+    requested = {}  # product_id -> [(index, quantity), ...]
+    for index, line in enumerate(lines):
         try:
-            db.session.add(cart_item)
-            db.session.commit()
-        except Exception as e:
-            db.session.rollback()
-            return jsonify({
-                'success': False,
-                'error': {
-                    'code': 'DATABASE_ERROR',
-                    'message': 'Failed to add item to cart'
-                }
-            }), 500
-        
+            data = add_to_cart_schema.load(line if isinstance(line, dict) else {})
+        except ValidationError as err:
+            product_id = line.get('product_id') if isinstance(line, dict) else None
+            line_error(index, product_id, 'VALIDATION_ERROR', err.messages)
+            continue
+        requested.setdefault(data['product_id'], []).append((index, data['quantity']))
+    
+    # Products and existing cart lines in one query each
+    cart = Cart.get_or_create_cart(current_user.id)
+    products = {
+        product.id: product
+        for product in Product.query.filter(Product.id.in_(requested)).all()
+    } if requested else {}
+    existing_quantities = dict(
+        db.session.query(CartItem.product_id, CartItem.quantity).filter(
+            CartItem.cart_id == cart.id,
+            CartItem.product_id.in_(requested)
+        ).all()
+    ) if requested else {}
+    
+    added = 0
+    accepted = {}  # product_id -> quantity to add
+    for product_id, quantities in requested.items():
+        product = products.get(product_id)
+        for index, quantity in quantities:
+            if not product:
+                line_error(index, product_id, 'PRODUCT_NOT_FOUND', 'Product not found')
+                continue
+            if not product.is_active:
+                line_error(index, product_id, 'PRODUCT_INACTIVE', 'This product is not available')
+                continue
+            
+            in_cart = existing_quantities.get(product_id, 0) + accepted.get(product_id, 0)
+            if in_cart + quantity > product.stock_quantity:
+                line_error(
+                    index, product_id, 'INSUFFICIENT_STOCK',
+                    f'Only {max(product.stock_quantity - in_cart, 0)} more unit(s) available'
+                )
+                continue
+            
+            accepted[product_id] = accepted.get(product_id, 0) + quantity
+            added += 1
+    
+    try:
+        # All accepted lines in one multi-row upsert (see CartItem.add_quantity)
+        if accepted:
+            CartItem.add_quantities(cart.id, accepted)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
         return jsonify({
-            'success': True,
-            'data': cart.to_dict(),
-            'message': 'Item added to cart successfully'
-        }), 201
+            'success': False,
+            'error': {
+                'code': 'DATABASE_ERROR',
+                'message': 'Failed to update cart'
+            }
+        }), 500
+    
+    return jsonify({
+        'success': True,
+        'data': {
+            'cart': cart.to_dict(),
+            'added': added,
+            'errors': sorted(errors, key=lambda error: error['index'])
+        },
+        'message': f'{added} of {len(lines)} item(s) added to cart'
+    }), 200
 
 
 @bp.route('/items/<int:cart_item_id>', methods=['PUT'])
@@ -357,3 +433,226 @@ def clear_cart(current_user):
         'data': cart.to_dict(),
         'message': 'Cart cleared successfully'
     }), 200
+
+
+# ===== GUEST CART =====
+
+def _guest_cart_response(token, items, message=None, status=200):
+    """Guest cart snapshot response"""
+    from app.services.guest_cart import guest_cart_snapshot
+
+    response = {
+        'success': True,
+        'data': guest_cart_snapshot(token, items)
+    }
+    if message:
+        response['message'] = message
+    return jsonify(response), status
+
+
+@bp.route('/guest', methods=['GET'])
+@limiter.limit("120 per hour")
+def get_guest_cart():
+    """
+    Get a guest cart (no login required)
+    
+    GET /api/v1/cart/guest
+    Headers: X-Guest-Cart-Token: <token>
+    
+    Unknown or expired tokens return an empty cart with token null.
+    """
+    from app.services.guest_cart import get_guest_cart_store, get_guest_cart_token
+
+    token = get_guest_cart_token()
+    items = get_guest_cart_store().get(token)
+    
+    if items is None:
+        return _guest_cart_response(None, {})
+    return _guest_cart_response(token, items)
+
+
+@bp.route('/guest/items', methods=['POST'])
+@limiter.limit("60 per hour")  # Unauthenticated writes to the guest cart store
+def add_to_guest_cart():
+    """
+    Add item to a guest cart, creating the cart if needed
+    
+    POST /api/v1/cart/guest/items
+    Headers: X-Guest-Cart-Token: <token> (omit to start a new cart)
+    Body: {
+        "product_id": 1,
+        "quantity": 2
+    }
+    
+    The response carries the cart token; send it with later guest cart
+    requests and with login/registration to merge the cart into the account.
+    Quantities are capped at the product's stock, and a cart holds at most
+    MAX_BULK_ITEMS different products.
+    """
+    from app.services.guest_cart import get_guest_cart_store, get_guest_cart_token, new_guest_cart_token
+
+    try:
+        # Validate request data
+        data = add_to_cart_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'Invalid input data',
+                'details': err.messages
+            }
+        }), 400
+    
+    product = Product.find_by_id(data['product_id'])
+    
+    if not product or not product.is_active:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'PRODUCT_NOT_FOUND',
+                'message': 'Product not found'
+            }
+        }), 404
+    
+    if product.stock_quantity < data['quantity']:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INSUFFICIENT_STOCK',
+                'message': f'Only {product.stock_quantity} unit(s) available in stock'
+            }
+        }), 400
+    
+    store = get_guest_cart_store()
+    token = get_guest_cart_token()
+    created = store.get(token) is None
+    if created:
+        token = new_guest_cart_token()
+    
+    full = []
+    
+    def add(items):
+        if product.id not in items and len(items) >= MAX_BULK_ITEMS:
+            full.append(product.id)
+            return items
+        items[product.id] = min(items.get(product.id, 0) + data['quantity'], product.stock_quantity)
+        return items
+    
+    items = store.update(token, add)
+    
+    if full:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'CART_FULL',
+                'message': f'A guest cart can hold at most {MAX_BULK_ITEMS} different products'
+            }
+        }), 400
+    
+    return _guest_cart_response(
+        token, items,
+        message='Item added to cart successfully',
+        status=201 if created else 200
+    )
+
+
+@bp.route('/guest/items/<int:product_id>', methods=['PUT'])
+@limiter.limit("60 per hour")
+def update_guest_cart_item(product_id):
+    """
+    Set the quantity of a product in a guest cart
+    
+    PUT /api/v1/cart/guest/items/:product_id
+    Headers: X-Guest-Cart-Token: <token>
+    Body: {
+        "quantity": 3
+    }
+    """
+    from app.services.guest_cart import get_guest_cart_store, get_guest_cart_token
+
+    try:
+        # Validate request data
+        data = update_cart_item_schema.load(request.json)
+    except ValidationError as err:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'VALIDATION_ERROR',
+                'message': 'Invalid input data',
+                'details': err.messages
+            }
+        }), 400
+    
+    store = get_guest_cart_store()
+    token = get_guest_cart_token()
+    items = store.get(token)
+    
+    if items is None or product_id not in items:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'CART_ITEM_NOT_FOUND',
+                'message': 'Cart item not found'
+            }
+        }), 404
+    
+    product = Product.find_by_id(product_id)
+    
+    if not product or not product.is_active:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'PRODUCT_UNAVAILABLE',
+                'message': 'This product is no longer available'
+            }
+        }), 400
+    
+    if product.stock_quantity < data['quantity']:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INSUFFICIENT_STOCK',
+                'message': f'Only {product.stock_quantity} unit(s) available in stock'
+            }
+        }), 400
+    
+    def set_quantity(items):
+        items[product_id] = data['quantity']
+        return items
+    
+    items = store.update(token, set_quantity)
+    
+    return _guest_cart_response(token, items, message='Cart item updated successfully')
+
+
+@bp.route('/guest/items/<int:product_id>', methods=['DELETE'])
+@limiter.limit("60 per hour")
+def remove_guest_cart_item(product_id):
+    """
+    Remove a product from a guest cart
+    
+    DELETE /api/v1/cart/guest/items/:product_id
+    Headers: X-Guest-Cart-Token: <token>
+    """
+    from app.services.guest_cart import get_guest_cart_store, get_guest_cart_token
+
+    store = get_guest_cart_store()
+    token = get_guest_cart_token()
+    
+    if store.get(token) is None:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'CART_NOT_FOUND',
+                'message': 'Guest cart not found or expired'
+            }
+        }), 404
+    
+    def remove(items):
+        items.pop(product_id, None)
+        return items
+    
+    items = store.update(token, remove)
+    
+    return _guest_cart_response(token, items, message='Item removed from cart successfully')
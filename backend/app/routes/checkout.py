@@ -0,0 +1,47 @@
+"""
+Checkout Routes
+Cart pricing ahead of order creation
+"""
+from flask import Blueprint, current_app, jsonify
+from app.models.cart import Cart
+from app.utils.decorators import login_required
+from app.services.checkout_service import CheckoutError, price_cart, sign_quote, quote_to_dict
+
+# Create blueprint
+bp = Blueprint('checkout', __name__)
+
+
+@bp.route('/quote', methods=['POST'])
+@login_required
+def create_quote(current_user):
+    """
+    Price the cart for checkout
+
+    POST /api/v1/checkout/quote
+    Headers: Authorization: Bearer <access_token>
+
+    Returns per-merchant subtotals, commission and the order total, plus a
+    quote_token to send with POST /api/v1/orders. Quoted prices are honored
+    for CHECKOUT_QUOTE_TTL seconds as long as the cart doesn't change.
+    """
+    cart = Cart.get_or_create_cart(current_user.id)
+
+    try:
+        quote = price_cart(cart)
+    except CheckoutError as e:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': e.code,
+                'message': e.message
+            }
+        }), e.status
+
+    data = quote_to_dict(quote)
+    data['quote_token'] = sign_quote(current_user.id, quote)
+    data['expires_in'] = current_app.config.get('CHECKOUT_QUOTE_TTL', 300)
+
+    return jsonify({
+        'success': True,
+        'data': data
+    }), 200
@@ -10,6 +10,10 @@ from app import db
 from app.models.order import SubOrder, SubOrderStatus, PaymentStatus
 from app.models.user import User
 from app.utils.decorators import hub_staff_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
+from app.models.order_read_model import OrderReadModel
+from app.services.order_read_model_service import refresh_order_read_model
+from app.services.order_summary_service import get_view_arg, SUMMARY_VIEW, FULL_VIEW, suborder_sort, suborder_summary
 
 # Create blueprint
 bp = Blueprint('hub_staff', __name__)
@@ -118,6 +122,10 @@ def get_hub_orders(current_user):
     
     Query Parameters:
     - status: Filter by status (optional)
+    - view: full (default: nested items, hub and merchant) or summary (id, date, total, status, item count)
+    - cursor: next_cursor from the previous page
+    - limit: Items per page (max: 100; without limit or cursor every row is returned)
+    - include_total: Count all orders (default: false)
     """
     hub_id = current_user.hub_id
     
@@ -130,15 +138,26 @@ def get_hub_orders(current_user):
             }
         }), 400
     
-    # Base query
-    query = SubOrder.query.filter_by(hub_id=hub_id)
+    view = get_view_arg(default=FULL_VIEW)
+    if not view:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_VIEW',
+                'message': 'view must be summary or full'
+            }
+        }), 400
+    
+    # Read model rows for summaries, suborders for the full view
+    model = OrderReadModel if view == SUMMARY_VIEW else SubOrder
+    query = model.query.filter(model.hub_id == hub_id)
     
     # Filter by status if provided
     status_filter = request.args.get('status')
     if status_filter:
         try:
             status = SubOrderStatus(status_filter)
-            query = query.filter_by(status=status)
+            query = query.filter(model.status == status)
         except ValueError:
             return jsonify({
                 'success': False,
@@ -148,12 +167,20 @@ def get_hub_orders(current_user):
                 }
             }), 400
     
+    if view == SUMMARY_VIEW:
+        order_by, serialize = suborder_sort(), suborder_summary
+    else:
+        # Items, hubs and merchants loaded with the page
+        query = query.options(*SubOrder.to_dict_options())
+        order_by, serialize = [SubOrder.created_at.desc(), SubOrder.id.desc()], SubOrder.to_dict
+    
     # Order by created_at descending
-    orders = query.order_by(SubOrder.created_at.desc()).all()
+    result = keyset_paginate(query, order_by, **get_cursor_args(default_limit=None))
     
     return jsonify({
         'success': True,
-        'data': [order.to_dict() for order in orders]
+        'data': [serialize(order) for order in result.items],
+        'pagination': result.to_dict()
     }), 200
 
 
@@ -178,7 +205,7 @@ def get_hub_order(current_user, suborder_id):
         }), 400
     
     # Get order
-    suborder = SubOrder.query.get(suborder_id)
+    suborder = SubOrder.query.options(*SubOrder.to_dict_options()).get(suborder_id)
     
     if not suborder:
         return jsonify({
@@ -276,6 +303,7 @@ def verify_order(current_user, suborder_id):
     suborder.status = SubOrderStatus.AT_HUB_READY_FOR_PICKUP
     
     try:
+        refresh_order_read_model(suborder_ids=[suborder.id])
         db.session.commit()
         
         # TODO: Send notification to customer
@@ -371,6 +399,7 @@ def reject_order(current_user, suborder_id):
     suborder.rejection_reason = data['rejection_reason']
     
     try:
+        refresh_order_read_model(suborder_ids=[suborder.id])
         db.session.commit()
         
         # TODO: Send notifications
@@ -480,6 +509,8 @@ def process_pickup(current_user, suborder_id):
     master_order.payment_status = PaymentStatus.PAID
     
     try:
+        # Payment status shows on all of the order's rows
+        refresh_order_read_model(master_order_ids=[master_order.id])
         db.session.commit()
         
         # TODO: Send notifications
@@ -552,7 +583,7 @@ def get_daily_report(current_user):
         func.date(SubOrder.updated_at) == report_date
     ).all()
     
-    orders_completed = SubOrder.query.filter(
+    orders_completed = SubOrder.query.options(*SubOrder.to_dict_options()).filter(
         SubOrder.hub_id == hub_id,
         SubOrder.status == SubOrderStatus.COMPLETED,
         func.date(SubOrder.updated_at) == report_date
@@ -4,12 +4,15 @@ Endpoints for merchants to manage their products
 """
 from flask import Blueprint, request, jsonify
 from marshmallow import Schema, fields, validate, ValidationError
+from sqlalchemy.orm import joinedload
 from app import db
 from app.models.product import Product
 from app.models.category import Category
 from app.utils.decorators import merchant_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
 from app.services.cloudinary_service import upload_product_image, delete_product_image
 from app.services.email_service import send_low_stock_alert_email
+from app.services.search_service import notify_product_changed
 # from app.services.email_service import send_product_created_notification
 from app.utils.validators import validate_price, validate_stock
 
@@ -48,14 +51,26 @@ def get_merchant_products(current_user):
     """
     Get all products for the current merchant
     
-    GET /api/v1/merchant/products
+    GET /api/v1/merchant/products?limit=20&cursor=<next_cursor>
     Headers: Authorization: Bearer <access_token>
+
+    Query Parameters:
+    - cursor: next_cursor from the previous page
+    - limit: Items per page (max: 100; without limit or cursor every row is returned)
+    - include_total: Count all products (default: false)
     """
-    products = Product.query.filter_by(merchant_id=current_user.id).order_by(Product.created_at.desc()).all()
+    result = keyset_paginate(
+        Product.query.options(
+            joinedload(Product.category)
+        ).filter_by(merchant_id=current_user.id),
+        [Product.created_at.desc(), Product.id.desc()],
+        **get_cursor_args(default_limit=None)
+    )
     
     return jsonify({
         'success': True,
-        'data': [product.to_dict(include_merchant=False) for product in products]
+        'data': [product.to_dict(include_merchant=False) for product in result.items],
+        'pagination': result.to_dict()
     }), 200
 
 
@@ -197,6 +212,8 @@ def create_product(current_user):
             }
         }), 500
     
+    notify_product_changed(product)
+    
     return jsonify({
         'success': True,
         'data': product.to_dict(include_merchant=False),
@@ -368,6 +385,8 @@ def update_product(current_user, product_id):
             }
         }), 500
     
+    notify_product_changed(product)
+    
     return jsonify({
         'success': True,
         'data': product.to_dict(include_merchant=False),
@@ -421,6 +440,8 @@ def delete_product(current_user, product_id):
             }
         }), 500
     
+    notify_product_changed(product)
+    
     return jsonify({
         'success': True,
         'message': 'Product deleted successfully'
@@ -2,11 +2,16 @@
 Merchant Orders Routes
 Merchant order management endpoints
 """
+from functools import partial
 from flask import Blueprint, request, jsonify
 from marshmallow import Schema, fields, validate, ValidationError
 from app import db
 from app.models.order import SubOrder, SubOrderStatus
 from app.utils.decorators import merchant_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
+from app.models.order_read_model import OrderReadModel
+from app.services.order_read_model_service import refresh_order_read_model
+from app.services.order_summary_service import get_view_arg, SUMMARY_VIEW, FULL_VIEW, suborder_summaries, suborder_sort, suborder_summary
 
 # Create blueprint
 bp = Blueprint('merchant_orders', __name__)
@@ -27,14 +32,41 @@ def get_merchant_orders(current_user):
     """
     Get merchant's orders
     
-    GET /api/v1/merchant/orders
+    GET /api/v1/merchant/orders?limit=20&cursor=<next_cursor>
     Headers: Authorization: Bearer <access_token>
+
+    Query Parameters:
+    - view: full (default: nested items, hub and merchant) or summary (id, date, total, status, item count)
+    - cursor: next_cursor from the previous page
+    - limit: Items per page (max: 100; without limit or cursor every row is returned)
+    - include_total: Count all orders (default: false)
     """
-    suborders = SubOrder.query.filter_by(merchant_id=current_user.id).order_by(SubOrder.created_at.desc()).all()
+    view = get_view_arg(default=FULL_VIEW)
+    if not view:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_VIEW',
+                'message': 'view must be summary or full'
+            }
+        }), 400
+    
+    if view == SUMMARY_VIEW:
+        query = suborder_summaries(OrderReadModel.merchant_id == current_user.id)
+        order_by, serialize = suborder_sort(), suborder_summary
+    else:
+        query = SubOrder.query.options(
+            *SubOrder.to_dict_options(include_merchant=False)
+        ).filter_by(merchant_id=current_user.id)
+        order_by = [SubOrder.created_at.desc(), SubOrder.id.desc()]
+        serialize = partial(SubOrder.to_dict, include_merchant=False)
+    
+    result = keyset_paginate(query, order_by, **get_cursor_args(default_limit=None))
     
     return jsonify({
         'success': True,
-        'data': [suborder.to_dict(include_merchant=False) for suborder in suborders]
+        'data': [serialize(suborder) for suborder in result.items],
+        'pagination': result.to_dict()
     }), 200
 
 
@@ -47,7 +79,7 @@ def get_merchant_order(current_user, suborder_id):
     GET /api/v1/merchant/orders/:id
     Headers: Authorization: Bearer <access_token>
     """
-    suborder = SubOrder.query.get(suborder_id)
+    suborder = SubOrder.query.options(*SubOrder.to_dict_options(include_merchant=False)).get(suborder_id)
     
     if not suborder:
         return jsonify({
@@ -169,6 +201,7 @@ def update_order_status(current_user, suborder_id):
     suborder.status = new_status
     
     try:
+        refresh_order_read_model(suborder_ids=[suborder.id])
         db.session.commit()
         
         # TODO: Send notifications
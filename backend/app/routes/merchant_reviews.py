@@ -10,6 +10,7 @@ from app import db
 from app.models.review import Review
 from app.models.product import Product
 from app.utils.decorators import merchant_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
 
 # Create blueprint
 bp = Blueprint('merchant_reviews', __name__)
@@ -30,19 +31,30 @@ def get_merchant_reviews_route(current_user):
     """
     Get all reviews for merchant's products
     
-    GET /api/v1/merchant/reviews
+    GET /api/v1/merchant/reviews?limit=20&cursor=<next_cursor>
     Headers: Authorization: Bearer <merchant_token>
+
+    Query Parameters:
+    - cursor: next_cursor from the previous page
+    - limit: Items per page (max: 100; without limit or cursor every row is returned)
+    - include_total: Count all reviews (default: false)
     """
-    # Get all reviews for merchant's products
-    reviews = db.session.query(Review).join(
+    # Reviews for merchant's products, newest first
+    query = db.session.query(Review).join(
         Product, Review.product_id == Product.id
     ).filter(
         Product.merchant_id == current_user.id
-    ).order_by(desc(Review.created_at)).all()
+    )
+    result = keyset_paginate(
+        query,
+        [desc(Review.created_at), desc(Review.id)],
+        **get_cursor_args(default_limit=None)
+    )
     
     return jsonify({
         'success': True,
-        'data': [review.to_dict(include_product=True) for review in reviews]
+        'data': [review.to_dict(include_product=True) for review in result.items],
+        'pagination': result.to_dict()
     }), 200
 
 
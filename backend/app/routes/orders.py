@@ -5,17 +5,32 @@ Order creation and management
 from flask import Blueprint, request, jsonify
 from marshmallow import Schema, fields, validate, ValidationError
 from datetime import datetime
+from sqlalchemy import bindparam, func, select, update
 from app import db
 from app.models.user import User, UserRole
 from app.models.product import Product
-from app.models.cart import Cart
+from app.models.cart import Cart, CartItem
 from app.models.hub import Hub
 from app.models.order import (
     MasterOrder, SubOrder, OrderItem,
     PaymentMethod, PaymentStatus, SubOrderStatus
 )
+from app.models.order_read_model import OrderReadModel
 from app.utils.decorators import login_required, role_required
-from app.services.mpesa_service import initiate_stk_push
+from app.utils.pagination import keyset_paginate, get_cursor_args
+from app.utils.idempotency import idempotent
+from app.services.count_service import invalidate_counts
+from app.services.checkout_service import (
+    CheckoutError, price_cart, load_quote, quote_matches_cart, build_order, decrement_stock
+)
+from app.services.reservation_service import reservation_deadline
+from app.services.order_read_model_service import refresh_order_read_model
+from app.services.order_summary_service import (
+    get_view_arg, SUMMARY_VIEW, master_order_summaries, master_order_sort, master_order_summary
+)
+from app.services.outbox_service import (
+    enqueue_many, STK_PUSH, ORDER_CONFIRMATION_EMAIL, MERCHANT_NEW_ORDER_EMAIL
+)
 
 # Create blueprint
 bp = Blueprint('orders', __name__)
@@ -27,6 +42,7 @@ class CreateOrderSchema(Schema):
     payment_method = fields.Str(required=True, validate=validate.OneOf(['mpesa_delivery', 'cash_on_delivery']))
     mpesa_phone_number = fields.Str()
     hub_id = fields.Int()
+    quote_token = fields.Str()
 
 
 class CancelOrderSchema(Schema):
@@ -39,6 +55,7 @@ cancel_order_schema = CancelOrderSchema()
 
 
 @bp.route('', methods=['POST'])
+@idempotent
 @login_required
 def create_order(current_user):
     """
@@ -46,11 +63,20 @@ def create_order(current_user):
     
     POST /api/v1/orders
     Headers: Authorization: Bearer <access_token>
+             Idempotency-Key: <unique per checkout attempt> (optional)
     Body: {
         "payment_method": "mpesa_delivery" | "cash_on_delivery",
         "mpesa_phone_number": "254712345678" (required if mpesa_delivery),
-        "hub_id": 1 (required if cash_on_delivery)
+        "hub_id": 1 (required if cash_on_delivery),
+        "quote_token": "..." (optional, from POST /api/v1/checkout/quote)
     }
+    
+    With a quote_token that is still valid and a cart that hasn't changed
+    since the quote, the order is created at the quoted prices without
+    pricing the cart again.
+    
+    Responds as soon as the order is committed. The M-Pesa prompt is sent
+    in the background; poll GET /api/v1/payments/status/:order_id for it.
     """
     try:
         data = create_order_schema.load(request.json)
@@ -101,28 +127,22 @@ def create_order(current_user):
     # Get user's cart
     cart = Cart.get_or_create_cart(current_user.id)
     
-    if not cart.items:
+    # Use the checkout quote if the cart hasn't changed since it was issued,
+    # otherwise price the cart now
+    try:
+        quote = load_quote(data['quote_token'], current_user.id) if data.get('quote_token') else None
+        if quote is None or not quote_matches_cart(quote, cart):
+            quote = price_cart(cart)
+    except CheckoutError as e:
         return jsonify({
             'success': False,
             'error': {
-                'code': 'EMPTY_CART',
-                'message': 'Cart is empty'
+                'code': e.code,
+                'message': e.message
             }
-        }), 400
-    
-    # Validate stock availability
-    for item in cart.items:
-        if item.product.stock_quantity < item.quantity:
-            return jsonify({
-                'success': False,
-                'error': {
-                    'code': 'INSUFFICIENT_STOCK',
-                    'message': f'Insufficient stock for {item.product.name}'
-                }
-            }), 400
+        }), e.status
     
-    # Calculate total
-    total_amount = cart.get_total()
+    total_amount = quote['total']
     
     # Create master order
     master_order = MasterOrder(
@@ -133,89 +153,55 @@ def create_order(current_user):
         payment_status=PaymentStatus.PENDING
     )
     
+    # M-Pesa orders only hold their stock until the reservation expires
+    if payment_method == PaymentMethod.MPESA_DELIVERY:
+        master_order.reservation_expires_at = reservation_deadline()
+    
+    # Determine initial status based on payment method
+    if payment_method == PaymentMethod.MPESA_DELIVERY:
+        status = SubOrderStatus.PENDING_PAYMENT
+    else:  # COD
+        status = SubOrderStatus.PENDING_MERCHANT_DELIVERY
+    
     try:
-        db.session.add(master_order)
-        db.session.flush()  # Get master_order.id
-        
-        # Group cart items by merchant
-        items_by_merchant = {}
-        for item in cart.items:
-            merchant_id = item.product.merchant_id
-            if merchant_id not in items_by_merchant:
-                items_by_merchant[merchant_id] = []
-            items_by_merchant[merchant_id].append(item)
+        # Master order, suborders per merchant (quote is grouped by
+        # merchant) and items, in a fixed number of bulk INSERTs
+        suborder_ids = build_order(master_order, quote, status, hub_id=data.get('hub_id'))
         
-        # Create suborders for each merchant
-        for merchant_id, items in items_by_merchant.items():
-            # Calculate subtotal for this merchant
-            from decimal import Decimal
-            subtotal = sum(Decimal(str(item.product.price)) * item.quantity for item in items)
-
-            # Calculate commission (25%)
-            commission = subtotal * Decimal('0.25')
-            merchant_payout = subtotal - commission
-            
-            # Determine initial status based on payment method
-            if payment_method == PaymentMethod.MPESA_DELIVERY:
-                status = SubOrderStatus.PENDING_PAYMENT
-            else:  # COD
-                status = SubOrderStatus.PENDING_MERCHANT_DELIVERY
-            
-            # Create suborder
-            suborder = SubOrder(
-                master_order_id=master_order.id,
-                merchant_id=merchant_id,
-                hub_id=data.get('hub_id'),
-                subtotal_amount=subtotal,
-                commission_amount=commission,
-                merchant_payout_amount=merchant_payout,
-                status=status
-            )
-            
-            db.session.add(suborder)
-            db.session.flush()  # Get suborder.id
-            
-            # Create order items
-            for cart_item in items:
-                order_item = OrderItem(
-                    suborder_id=suborder.id,
-                    product_id=cart_item.product_id,
-                    quantity=cart_item.quantity,
-                    price_at_purchase=cart_item.product.price
-                )
-                
-                db.session.add(order_item)
-                
-                # Reduce stock
-                cart_item.product.stock_quantity -= cart_item.quantity
+        # Reduce stock last so product rows stay locked only until commit;
+        # fails cleanly if another checkout took the stock first
+        try:
+            decrement_stock(quote['lines'])
+        except CheckoutError as e:
+            db.session.rollback()
+            return jsonify({
+                'success': False,
+                'error': {
+                    'code': e.code,
+                    'message': e.message
+                }
+            }), e.status
         
         # Clear cart
-        for item in cart.items:
-            db.session.delete(item)
+        CartItem.query.filter_by(cart_id=cart.id).delete(synchronize_session=False)
         
-        db.session.commit()
-        
-        # If M-Pesa, initiate STK push
+        # STK push and notifications are sent by the outbox worker once
+        # this transaction commits (flask outbox work)
+        messages = []
         if payment_method == PaymentMethod.MPESA_DELIVERY:
-            mpesa_response = initiate_stk_push(
-                phone_number=data['mpesa_phone_number'],
-                amount=int(total_amount),
-                account_reference=f"ORDER-{master_order.id}",
-                transaction_desc=f"Payment for Order #{master_order.id}"
-            )
-            
-            if mpesa_response.get('success'):
-                master_order.mpesa_checkout_request_id = mpesa_response.get('checkout_request_id')
-                db.session.commit()
+            messages.append((STK_PUSH, master_order.id, None))
+        messages.append((ORDER_CONFIRMATION_EMAIL, master_order.id, None))
+        messages.extend(
+            (MERCHANT_NEW_ORDER_EMAIL, master_order.id, {'suborder_id': suborder_id})
+            for suborder_id in suborder_ids
+        )
+        enqueue_many(messages)
         
-        # Send order confirmation email
-        from app.services.email_service import send_order_confirmation_email
-        send_order_confirmation_email(master_order)
+        # List rows for the new suborders
+        refresh_order_read_model(master_order_ids=[master_order.id])
         
-        # Send notifications to merchants
-        from app.services.email_service import send_merchant_new_order_email
-        for suborder in master_order.suborders:
-            send_merchant_new_order_email(suborder.merchant, suborder)
+        db.session.commit()
+        invalidate_counts('products')  # Stock changed (in-stock listings)
         
     except Exception as e:
         db.session.rollback()
@@ -229,9 +215,11 @@ def create_order(current_user):
             }
         }), 500
     
+    order = MasterOrder.query.options(*MasterOrder.to_dict_options()).populate_existing().get(master_order.id)
+    
     return jsonify({
         'success': True,
-        'data': master_order.to_dict(),
+        'data': order.to_dict(),
         'message': 'Order created successfully'
     }), 201
 
@@ -242,16 +230,38 @@ def get_orders(current_user):
     """
     Get user's orders
     
-    GET /api/v1/orders
+    GET /api/v1/orders?limit=20&cursor=<next_cursor>
     Headers: Authorization: Bearer <access_token>
+
+    Query Parameters:
+    - view: summary (default: id, date, total, status, item count) or full
+    - cursor: next_cursor from the previous page
+    - limit: Items per page (max: 100; without limit or cursor every row is returned)
+    - include_total: Count all orders (default: false)
     """
-    orders = MasterOrder.query.filter_by(
-        customer_id=current_user.id
-    ).order_by(MasterOrder.created_at.desc()).all()
+    view = get_view_arg()
+    if not view:
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'INVALID_VIEW',
+                'message': 'view must be summary or full'
+            }
+        }), 400
+    
+    if view == SUMMARY_VIEW:
+        query = master_order_summaries(OrderReadModel.customer_id == current_user.id)
+        order_by, serialize = master_order_sort(), master_order_summary
+    else:
+        query = MasterOrder.query.options(*MasterOrder.to_dict_options()).filter_by(customer_id=current_user.id)
+        order_by, serialize = [MasterOrder.created_at.desc(), MasterOrder.id.desc()], MasterOrder.to_dict
+    
+    result = keyset_paginate(query, order_by, **get_cursor_args(default_limit=None))
     
     return jsonify({
         'success': True,
-        'data': [order.to_dict() for order in orders]
+        'data': [serialize(order) for order in result.items],
+        'pagination': result.to_dict()
     }), 200
 
 
@@ -264,7 +274,7 @@ def get_order(current_user, order_id):
     GET /api/v1/orders/:id
     Headers: Authorization: Bearer <access_token>
     """
-    order = MasterOrder.query.get(order_id)
+    order = MasterOrder.query.options(*MasterOrder.to_dict_options()).get(order_id)
     
     if not order:
         return jsonify({
@@ -371,29 +381,77 @@ def cancel_order(current_user, order_id):
             }
         }), 400
     
-    # Mark order as cancelled
-    order.is_cancelled = True
-    order.cancelled_at = datetime.utcnow()
-    order.cancellation_reason = data['reason']
+    # Claim the cancellation: a concurrent cancel or the reservation sweeper
+    # may have cancelled the order since it was loaded
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(MasterOrder).where(
+            MasterOrder.id == order.id,
+            MasterOrder.is_cancelled == False
+        ).values(
+            is_cancelled=True,
+            cancelled_at=now,
+            cancellation_reason=data['reason'],
+            reservation_expires_at=None,
+            updated_at=now
+        ),
+        execution_options={'synchronize_session': False}
+    )
+    if claimed.rowcount != 1:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'error': {
+                'code': 'ALREADY_CANCELLED',
+                'message': 'This order is already cancelled'
+            }
+        }), 400
     
-    # Cancel all suborders
-    for suborder in order.suborders:
-        suborder.status = SubOrderStatus.CANCELLED
+    try:
+        # Restore stock for the suborders being cancelled, in product id order
+        # (the order checkout and the sweeper lock products in)
+        held = db.session.execute(
+            select(OrderItem.product_id, func.sum(OrderItem.quantity))
+            .join(SubOrder, SubOrder.id == OrderItem.suborder_id)
+            .where(
+                SubOrder.master_order_id == order.id,
+                SubOrder.status.in_(cancellable_statuses)
+            )
+            .group_by(OrderItem.product_id)
+            .order_by(OrderItem.product_id)
+        ).all()
         
-        # Restore stock
-        for item in suborder.items:
-            item.product.stock_quantity += item.quantity
-    
-    # Handle refund for paid orders
-    if order.payment_status == PaymentStatus.PAID:
-        order.refund_status = 'pending'
-        order.refund_amount = order.total_amount
+        if held:
+            products = Product.__table__
+            db.session.execute(
+                update(products).where(products.c.id == bindparam('product_id')).values(
+                    stock_quantity=products.c.stock_quantity + bindparam('quantity'),
+                    units_sold=products.c.units_sold - bindparam('quantity')
+                ),
+                [{'product_id': product_id, 'quantity': int(quantity)} for product_id, quantity in held]
+            )
         
-        # TODO: Integrate with M-Pesa B2C API for automatic refund
-        # For now, mark as pending for manual processing
-    
-    try:
+        # Cancel all suborders
+        db.session.execute(
+            update(SubOrder).where(
+                SubOrder.master_order_id == order.id,
+                SubOrder.status.in_(cancellable_statuses)
+            ).values(status=SubOrderStatus.CANCELLED, updated_at=now),
+            execution_options={'synchronize_session': False}
+        )
+        db.session.expire_all()
+        
+        # Handle refund for paid orders
+        if order.payment_status == PaymentStatus.PAID:
+            order.refund_status = 'pending'
+            order.refund_amount = order.total_amount
+            
+            # TODO: Integrate with M-Pesa B2C API for automatic refund
+            # For now, mark as pending for manual processing
+        
+        refresh_order_read_model(master_order_ids=[order.id])
         db.session.commit()
+        invalidate_counts('products')  # Stock restored
         
         # Send cancellation email
         from app.services.email_service import send_order_cancelled_email
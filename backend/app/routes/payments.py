@@ -4,22 +4,28 @@ Payment webhooks, callbacks, and payment management
 """
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import update
 from app import db
 from app.models.order import MasterOrder, SubOrder, PaymentStatus, SubOrderStatus
 from app.models.user import User
 from app.services.mpesa_service import process_mpesa_callback, initiate_stk_push
+from app.services.outbox_service import latest_message, STK_PUSH
+from app.services.order_read_model_service import refresh_order_read_model
+from app.utils.idempotency import idempotent
 
 # Create blueprint
 bp = Blueprint('payments', __name__)
 
 
 @bp.route('/mpesa/stk-push', methods=['POST'])
+@idempotent
 @jwt_required()
 def initiate_mpesa_payment():
     """
     Initiate M-Pesa STK Push payment
 
     POST /api/v1/payments/mpesa/stk-push
+    Headers: Idempotency-Key: <unique per payment attempt> (optional)
     Body: { order_id: int, phone_number: string }
     """
     try:
@@ -45,6 +51,9 @@ def initiate_mpesa_payment():
         if order.payment_status == PaymentStatus.PAID:
             return jsonify({'error': {'message': 'Order already paid'}}), 400
 
+        if order.is_cancelled:
+            return jsonify({'error': {'message': 'Order has been cancelled'}}), 400
+
         # Initiate STK Push
         result = initiate_stk_push(
             phone_number=phone_number,
@@ -60,6 +69,7 @@ def initiate_mpesa_payment():
             # Store checkout request ID for callback matching
             order.mpesa_checkout_request_id = result.get('checkout_request_id')
             order.payment_status = PaymentStatus.PENDING
+            refresh_order_read_model(master_order_ids=[order.id])
             db.session.commit()
 
             return jsonify({
@@ -81,6 +91,9 @@ def check_payment_status(order_id):
     Check payment status for an order
 
     GET /api/v1/payments/status/<order_id>
+
+    Poll this after checkout: stk_push.status is pending until the M-Pesa
+    prompt has been sent (sent), or failed after all retries.
     """
     try:
         current_user_id = get_jwt_identity()
@@ -91,12 +104,21 @@ def check_payment_status(order_id):
         if not order:
             return jsonify({'error': {'message': 'Order not found'}}), 404
 
+        # State of the checkout STK push sent by the outbox worker
+        stk_push = latest_message(order.id, STK_PUSH)
+
         return jsonify({
             'order_id': order.id,
             'payment_status': order.payment_status.value,
             'payment_method': order.payment_method.value if order.payment_method else None,
             'mpesa_transaction_id': order.mpesa_transaction_id,
-            'total_amount': float(order.total_amount)
+            'total_amount': float(order.total_amount),
+            'stk_push': {
+                'status': stk_push.status.value,
+                'attempts': stk_push.attempts,
+                'last_error': stk_push.last_error,
+                'checkout_request_id': order.mpesa_checkout_request_id
+            } if stk_push else None
         }), 200
 
     except Exception as e:
@@ -195,15 +217,51 @@ def mpesa_callback():
                 mpesa_checkout_request_id=checkout_request_id
             ).first()
 
-            if order:
-                # Update order payment status
+            paid = False
+            if order and not order.is_cancelled:
+                # Take the payment only while the order is live. The
+                # reservation sweeper cancels with a conditional UPDATE on the
+                # same row, so exactly one of the two wins
+                paid = db.session.execute(
+                    update(MasterOrder).where(
+                        MasterOrder.id == order.id,
+                        MasterOrder.is_cancelled == False
+                    ).values(
+                        payment_status=PaymentStatus.PAID,
+                        mpesa_transaction_id=mpesa_receipt_number,
+                        reservation_expires_at=None
+                    ),
+                    execution_options={'synchronize_session': False}
+                ).rowcount == 1
+
+                if not paid:
+                    # Cancelled since we read it: fall through to the refund
+                    db.session.refresh(order)
+
+            if order and not paid:
+                # Paid after the reservation expired (or after cancelling):
+                # the stock is back on sale, so refund instead of shipping
                 order.payment_status = PaymentStatus.PAID
                 order.mpesa_transaction_id = mpesa_receipt_number
+                order.refund_status = 'pending'
+                order.refund_amount = order.total_amount
+                refresh_order_read_model(master_order_ids=[order.id])
+                db.session.commit()
+
+                current_app.logger.warning(f"Order {order.id} paid after cancellation; refund pending")
 
-                # Update all suborders to PAID_AWAITING_SHIPMENT
-                for suborder in order.suborders:
-                    suborder.status = SubOrderStatus.PAID_AWAITING_SHIPMENT
+            elif order:
+                # The stock reservation is now a sale: ship the suborders
+                # still waiting for payment
+                db.session.execute(
+                    update(SubOrder).where(
+                        SubOrder.master_order_id == order.id,
+                        SubOrder.status == SubOrderStatus.PENDING_PAYMENT
+                    ).values(status=SubOrderStatus.PAID_AWAITING_SHIPMENT),
+                    execution_options={'synchronize_session': False}
+                )
 
+                refresh_order_read_model(master_order_ids=[order.id])
                 db.session.commit()
 
                 current_app.logger.info(f"Order {order.id} marked as paid")
@@ -228,6 +286,7 @@ def mpesa_callback():
 
             if order:
                 order.payment_status = PaymentStatus.FAILED
+                refresh_order_read_model(master_order_ids=[order.id])
                 db.session.commit()
 
                 current_app.logger.info(f"Order {order.id} payment failed")
@@ -4,6 +4,7 @@ Public endpoints for browsing products
 """
 from flask import Blueprint, request, jsonify
 from app.models.product import Product
+from app.utils.pagination import get_cursor_args
 
 # Create blueprint
 bp = Blueprint('products', __name__)
@@ -15,6 +16,7 @@ def get_products():
     Get products with search, filtering, and pagination
     
     GET /api/v1/products?query=laptop&category=1&min_price=1000&max_price=50000&page=1
+    GET /api/v1/products?category=1&sort=price_asc&cursor=<next_cursor>
     
     Query Parameters:
     - query: Search term (searches name and description)
@@ -22,8 +24,13 @@ def get_products():
     - min_price: Minimum price
     - max_price: Maximum price
     - in_stock: Only show in-stock products (default: true)
-    - page: Page number (default: 1)
+    - page: Page number (page/offset pagination, always used for searches)
+    - cursor: next_cursor from the previous page (cursor pagination, browsing only)
     - per_page: Items per page (default: 20, max: 50)
+    - include_total: Count all matches in cursor mode (default: true)
+    - facets: Also return category, price bucket and stock counts (default: false)
+    - sort: relevance (default when searching) | newest (default otherwise) |
+            price_asc | price_desc | rating | best_selling
     """
     # Get query parameters
     query = request.args.get('query', '').strip()
@@ -34,30 +41,82 @@ def get_products():
     page = request.args.get('page', 1, type=int)
     limit = request.args.get('limit', type=int)
     per_page = min(request.args.get('per_page', limit or 20, type=int), 50)  # Max 50 per page
+    with_facets = request.args.get('facets', 'false').lower() == 'true'
+    sort = request.args.get('sort')
+
+    # Browsing uses cursor pagination; `page` keeps offset pagination for
+    # existing clients, and ranked search results are always page-based
+    use_cursor = not query and 'page' not in request.args
+    cursor_args = get_cursor_args(default_limit=20, max_limit=50, include_total=True)
     
     # Search products
-    pagination = Product.search_products(
+    result = Product.search_products(
         query=query if query else None,
         category_id=category_id,
         min_price=min_price,
         max_price=max_price,
         in_stock_only=in_stock_only,
         page=page,
-        per_page=per_page
+        per_page=per_page,
+        with_facets=with_facets,
+        sort=sort,
+        keyset=use_cursor,
+        cursor=cursor_args['cursor'],
+        include_total=cursor_args['include_total']
     )
     
+    if use_cursor:
+        pagination = result.to_dict()
+    else:
+        pagination = {
+            'page': result.page,
+            'per_page': result.per_page,
+            'total_pages': result.pages,
+            'total_items': result.total,
+            'total_approximate': result.total_approximate,
+            'has_next': result.has_next,
+            'has_prev': result.has_prev
+        }
+
+    data = {
+        'products': [product.to_dict() for product in result.items],
+        'pagination': pagination
+    }
+    if with_facets:
+        data['facets'] = result.facets
+
+    return jsonify({
+        'success': True,
+        'data': data
+    }), 200
+
+
+@bp.route('/suggest', methods=['GET'])
+def suggest_products():
+    """
+    Search-as-you-type completions for product and category names
+
+    GET /api/v1/products/suggest?prefix=sams&limit=8
+
+    Served from an in-memory prefix index (see suggest_index), so it is
+    cheap enough to call on every keystroke.
+
+    Query Parameters:
+    - prefix: What the user has typed so far
+    - limit: Number of completions (default: 8, max: 10)
+    """
+    from app.services.suggest_index import get_suggest_index, MAX_SUGGESTIONS
+
+    prefix = request.args.get('prefix', '').strip()
+    limit = max(min(request.args.get('limit', 8, type=int), MAX_SUGGESTIONS), 1)
+
+    suggestions = get_suggest_index().suggest(prefix, limit=limit) if prefix else []
+
     return jsonify({
         'success': True,
         'data': {
-            'products': [product.to_dict() for product in pagination.items],
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total_pages': pagination.pages,
-                'total_items': pagination.total,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'prefix': prefix,
+            'suggestions': suggestions
         }
     }), 200
 
@@ -10,6 +10,7 @@ from app.models.review import Review
 from app.models.product import Product
 from app.models.user import User, UserRole
 from app.utils.decorators import role_required
+from app.utils.pagination import keyset_paginate, get_cursor_args
 from app.services.cloudinary_service import upload_product_image
 
 # Create blueprint
@@ -133,6 +134,7 @@ def create_review(current_user):
     
     try:
         db.session.add(review)
+        Product.apply_rating_change(review.product_id, added=review.rating)
         db.session.commit()
         
         # TODO: Send notification to merchant
@@ -203,10 +205,12 @@ def update_review(current_user, review_id):
     
 
      # Update fields
+    old_rating = review.rating
     for key, value in data.items():
         setattr(review, key, value)
     
     try:
+        Product.apply_rating_change(review.product_id, added=review.rating, removed=old_rating)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -256,6 +260,7 @@ def delete_review(current_user, review_id):
         }), 403
     
     try:
+        Product.apply_rating_change(review.product_id, removed=review.rating)
         db.session.delete(review)
         db.session.commit()
     except Exception as e:
@@ -322,11 +327,13 @@ def get_product_reviews(product_id):
     Get all reviews for a product (PUBLIC)
     
     GET /api/v1/products/:id/reviews?sort=recent&rating=5
+    GET /api/v1/products/:id/reviews?sort=helpful&cursor=<next_cursor>
     
     Query Parameters:
     - sort: recent (default) | helpful | rating_high | rating_low
     - rating: Filter by rating (1-5)
-    - page: Page number (default: 1)
+    - page: Page number (page/offset pagination)
+    - cursor: next_cursor from the previous page (cursor pagination, used without page)
     - per_page: Items per page (default: 10, max: 50)
     """
     # Check if product exists
@@ -347,54 +354,59 @@ def get_product_reviews(product_id):
     rating_filter = request.args.get('rating', type=int)
     if rating_filter and 1 <= rating_filter <= 5:
         query = query.filter_by(rating=rating_filter)
+    else:
+        rating_filter = None
     
-    # Sort
+    # Sort (review id last so every sort is a unique keyset key)
     sort_by = request.args.get('sort', 'recent')
     if sort_by == 'helpful':
-        query = query.order_by(desc(Review.helpful_count), desc(Review.created_at))
+        order_by = [desc(Review.helpful_count), desc(Review.created_at), desc(Review.id)]
     elif sort_by == 'rating_high':
-        query = query.order_by(desc(Review.rating), desc(Review.created_at))
+        order_by = [desc(Review.rating), desc(Review.created_at), desc(Review.id)]
     elif sort_by == 'rating_low':
-        query = query.order_by(Review.rating, desc(Review.created_at))
+        order_by = [Review.rating, desc(Review.created_at), desc(Review.id)]
     else:  # recent (default)
-        query = query.order_by(desc(Review.created_at))
+        order_by = [desc(Review.created_at), desc(Review.id)]
     
-    # Pagination
-    page = request.args.get('page', 1, type=int)
-    per_page = min(request.args.get('per_page', 10, type=int), 50)
-    
-    pagination = query.paginate(page=page, per_page=per_page, error_out=False)
-    
-    # Calculate rating distribution
-    rating_stats = db.session.query(
-        Review.rating,
-        func.count(Review.id).label('count')
-    ).filter_by(product_id=product_id).group_by(Review.rating).all()
-    
-    rating_distribution = {str(i): 0 for i in range(1, 6)}
-    for rating, count in rating_stats:
-        rating_distribution[str(rating)] = count
-    
-    # Calculate average rating
-    avg_rating = db.session.query(func.avg(Review.rating)).filter_by(product_id=product_id).scalar()
+    statistics = {
+        # Stored aggregates, see Product.apply_rating_change
+        'average_rating': product.get_average_rating(),
+        'rating_distribution': product.get_rating_distribution()
+    }
+
+    if 'page' not in request.args:
+        result = keyset_paginate(query, order_by, **get_cursor_args(default_limit=10, max_limit=50))
+        # Totals come from the stored aggregates rather than a COUNT
+        if rating_filter:
+            statistics['total_reviews'] = statistics['rating_distribution'][str(rating_filter)]
+        else:
+            statistics['total_reviews'] = product.get_review_count()
+        pagination = result.to_dict()
+        pagination['total_items'] = statistics['total_reviews']
+        reviews = result.items
+    else:
+        # Pagination
+        page = request.args.get('page', 1, type=int)
+        per_page = min(request.args.get('per_page', 10, type=int), 50)
+        
+        result = query.order_by(*order_by).paginate(page=page, per_page=per_page, error_out=False)
+        statistics['total_reviews'] = result.total
+        pagination = {
+            'page': result.page,
+            'per_page': result.per_page,
+            'total_pages': result.pages,
+            'total_items': result.total,
+            'has_next': result.has_next,
+            'has_prev': result.has_prev
+        }
+        reviews = result.items
     
     return jsonify({
         'success': True,
         'data': {
-            'reviews': [review.to_dict() for review in pagination.items],
-            'statistics': {
-                'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-                'total_reviews': pagination.total,
-                'rating_distribution': rating_distribution
-            },
-            'pagination': {
-                'page': pagination.page,
-                'per_page': pagination.per_page,
-                'total_pages': pagination.pages,
-                'total_items': pagination.total,
-                'has_next': pagination.has_next,
-                'has_prev': pagination.has_prev
-            }
+            'reviews': [review.to_dict() for review in reviews],
+            'statistics': statistics,
+            'pagination': pagination
         }
     }), 200
 
@@ -404,7 +416,11 @@ def get_merchant_reviews(merchant_id):
     """
     Get all reviews for a merchant's products (PUBLIC)
     
-    GET /api/v1/merchants/:id/reviews
+    GET /api/v1/merchants/:id/reviews?limit=20&cursor=<next_cursor>
+
+    Query Parameters:
+    - cursor: next_cursor from the previous page
+    - limit: Items per page (max: 100; without limit or cursor every row is returned)
     """
     # Check if merchant exists
     merchant = User.query.get(merchant_id)
@@ -417,17 +433,24 @@ def get_merchant_reviews(merchant_id):
             }
         }), 404
     
-    # Get all reviews for merchant's products
-    reviews = db.session.query(Review).join(
+    # Reviews for merchant's products, newest first
+    query = db.session.query(Review).join(
         Product, Review.product_id == Product.id
     ).filter(
         Product.merchant_id == merchant_id
-    ).order_by(desc(Review.created_at)).all()
+    )
+    result = keyset_paginate(
+        query,
+        [desc(Review.created_at), desc(Review.id)],
+        **get_cursor_args(default_limit=None)
+    )
     
-    # Calculate average rating
-    avg_rating = db.session.query(func.avg(Review.rating)).join(
+    # Average rating and review count in one aggregate
+    avg_rating, total_reviews = db.session.query(
+        func.avg(Review.rating), func.count(Review.id)
+    ).join(
         Product, Review.product_id == Product.id
-    ).filter(Product.merchant_id == merchant_id).scalar()
+    ).filter(Product.merchant_id == merchant_id).one()
     
     return jsonify({
         'success': True,
@@ -436,11 +459,11 @@ def get_merchant_reviews(merchant_id):
                 'id': merchant.id,
                 'name': merchant.name
             },
-            'reviews': [review.to_dict(include_product=True) for review in reviews],
+            'reviews': [review.to_dict(include_product=True) for review in result.items],
             'statistics': {
                 'average_rating': round(float(avg_rating), 1) if avg_rating else 0,
-                'total_reviews': len(reviews)
-            }
+                'total_reviews': total_reviews
+            },
+            'pagination': result.to_dict()
         }
     }), 200
-
@@ -0,0 +1,357 @@
+"""
+Checkout Service
+Cart pricing, signed checkout quotes and stock decrement for order creation
+
+A quote prices the whole cart from one joined query (Cart.get_items): line
+prices, subtotals per merchant, platform commission and the grand total.
+The quoted lines are returned to the client inside a short-lived signed
+token. When the token comes back with POST /orders and the cart still
+holds the same products and quantities, the order is built from the quote
+without reading products again; only the stock decrement touches them.
+"""
+from decimal import Decimal
+
+from flask import current_app
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+
+# Platform commission on each merchant's subtotal
+COMMISSION_RATE = Decimal('0.25')
+
+# Namespaces quote tokens so no other signed value can pass as one
+QUOTE_SALT = 'checkout-quote'
+
+CENT = Decimal('0.01')
+
+
+class CheckoutError(Exception):
+    """
+    Cart can't be checked out as it is
+
+    Attributes:
+        code: API error code
+        message: Human readable message
+        status: HTTP status for the response
+    """
+
+    def __init__(self, code, message, status=400):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+        self.status = status
+
+
+def _build_quote(lines):
+    """
+    Group priced lines by merchant and total them
+
+    Args:
+        lines: [{'product_id', 'merchant_id', 'quantity', 'unit_price'}, ...]
+
+    Returns:
+        dict: {'lines', 'merchants', 'total', 'item_count'}
+    """
+    merchants = {}
+    for line in lines:
+        merchant = merchants.setdefault(line['merchant_id'], {
+            'merchant_id': line['merchant_id'],
+            'merchant_name': line.get('merchant_name'),
+            'lines': [],
+            'subtotal': Decimal('0')
+        })
+        merchant['lines'].append(line)
+        merchant['subtotal'] += line['unit_price'] * line['quantity']
+
+    for merchant in merchants.values():
+        merchant['commission'] = (merchant['subtotal'] * COMMISSION_RATE).quantize(CENT)
+        merchant['payout'] = merchant['subtotal'] - merchant['commission']
+
+    return {
+        'lines': lines,
+        'merchants': [merchants[merchant_id] for merchant_id in sorted(merchants)],
+        'total': sum((merchant['subtotal'] for merchant in merchants.values()), Decimal('0')),
+        'item_count': sum(line['quantity'] for line in lines)
+    }
+
+
+def price_cart(cart):
+    """
+    Price a cart for checkout
+
+    Args:
+        cart: Customer's Cart
+
+    Returns:
+        dict: Quote (see _build_quote); lines also carry product name and
+            image (snapshotted on the order items) and merchant name
+
+    Raises:
+        CheckoutError: If the cart is empty, or a product is unavailable
+            or short of stock
+    """
+    items = cart.get_items()
+    if not items:
+        raise CheckoutError('EMPTY_CART', 'Cart is empty')
+
+    lines = []
+    for item in items:
+        product = item.product
+        if not product or not product.is_active:
+            raise CheckoutError('PRODUCT_UNAVAILABLE', 'A product in your cart is no longer available')
+        if product.stock_quantity < item.quantity:
+            raise CheckoutError('INSUFFICIENT_STOCK', f'Insufficient stock for {product.name}')
+        lines.append({
+            'product_id': product.id,
+            'merchant_id': product.merchant_id,
+            'quantity': item.quantity,
+            'unit_price': Decimal(str(product.price)),
+            'name': product.name,
+            'image_url': product.image_url,
+            'merchant_name': product.merchant.name if product.merchant else None
+        })
+
+    return _build_quote(lines)
+
+
+def _serializer():
+    return URLSafeTimedSerializer(current_app.config['SECRET_KEY'], salt=QUOTE_SALT)
+
+
+def sign_quote(user_id, quote):
+    """
+    Signed token carrying a quote's lines
+
+    Lines include product name and image so an order built from the token
+    can snapshot them without reading products.
+
+    Args:
+        user_id: Customer the quote belongs to
+        quote: Quote from price_cart
+
+    Returns:
+        str: Quote token
+    """
+    return _serializer().dumps({
+        'u': user_id,
+        'l': [
+            [
+                line['product_id'], line['merchant_id'], line['quantity'], str(line['unit_price']),
+                line['name'], line['image_url']
+            ]
+            for line in quote['lines']
+        ]
+    })
+
+
+def load_quote(token, user_id):
+    """
+    Quote from a token issued by sign_quote
+
+    Args:
+        token: Quote token from the client
+        user_id: Customer placing the order
+
+    Returns:
+        dict: Quote, or None if the token has expired (price the cart again)
+
+    Raises:
+        CheckoutError: If the token is forged or belongs to another user
+    """
+    try:
+        payload = _serializer().loads(token, max_age=current_app.config.get('CHECKOUT_QUOTE_TTL', 300))
+    except SignatureExpired:
+        return None
+    except BadSignature:
+        raise CheckoutError('INVALID_QUOTE', 'Quote token is invalid')
+
+    if payload.get('u') != user_id:
+        raise CheckoutError('INVALID_QUOTE', 'Quote token is invalid')
+
+    # Tokens issued before product snapshots were added: price the cart again
+    if any(len(line) != 6 for line in payload['l']):
+        return None
+
+    return _build_quote([
+        {
+            'product_id': product_id,
+            'merchant_id': merchant_id,
+            'quantity': quantity,
+            'unit_price': Decimal(price),
+            'name': name,
+            'image_url': image_url
+        }
+        for product_id, merchant_id, quantity, price, name, image_url in payload['l']
+    ])
+
+
+def quote_matches_cart(quote, cart):
+    """
+    Whether the cart still holds exactly the quoted products and quantities
+
+    Reads only (product_id, quantity) pairs, not products.
+
+    Args:
+        quote: Quote from load_quote
+        cart: Customer's Cart
+
+    Returns:
+        bool: True if the quote can be used as is
+    """
+    from app import db
+    from app.models.cart import CartItem
+
+    in_cart = dict(
+        db.session.query(CartItem.product_id, CartItem.quantity).filter_by(cart_id=cart.id).all()
+    )
+    return in_cart == {line['product_id']: line['quantity'] for line in quote['lines']}
+
+
+def build_order(master_order, quote, status, hub_id=None):
+    """
+    Insert a new master order with its suborders and order items
+
+    Three statements whatever the number of merchants and lines: the
+    master order, one multi-row INSERT of suborders returning their ids
+    (keyed by merchant, one suborder per merchant) and one executemany
+    INSERT of items.
+
+    Args:
+        master_order: New MasterOrder (not yet added to the session)
+        quote: Quote
+        status: Initial SubOrderStatus
+        hub_id: Pickup hub for COD orders
+
+    Returns:
+        list: SubOrder ids in quote order
+    """
+    from sqlalchemy import insert
+    from app import db
+    from app.models.order import SubOrder, OrderItem
+
+    db.session.add(master_order)
+    db.session.flush()  # Get master_order.id
+
+    suborder_ids = dict(db.session.execute(
+        insert(SubOrder).returning(SubOrder.merchant_id, SubOrder.id),
+        [
+            {
+                'master_order_id': master_order.id,
+                'merchant_id': merchant['merchant_id'],
+                'hub_id': hub_id,
+                'subtotal_amount': merchant['subtotal'],
+                'commission_amount': merchant['commission'],
+                'merchant_payout_amount': merchant['payout'],
+                'status': status
+            }
+            for merchant in quote['merchants']
+        ]
+    ).all())
+
+    db.session.execute(insert(OrderItem), [
+        {
+            'suborder_id': suborder_ids[merchant['merchant_id']],
+            'product_id': line['product_id'],
+            'quantity': line['quantity'],
+            'price_at_purchase': line['unit_price'],
+            'product_name': line['name'],
+            'product_image_url': line['image_url']
+        }
+        for merchant in quote['merchants']
+        for line in merchant['lines']
+    ])
+
+    return [suborder_ids[merchant['merchant_id']] for merchant in quote['merchants']]
+
+
+def decrement_stock(lines):
+    """
+    Take quoted quantities out of stock, failing if any product is short
+
+    One conditional UPDATE covers every line:
+    stock_quantity = stock_quantity - CASE id WHEN ... END, only where
+    stock_quantity >= that quantity. Products missing from its RETURNING
+    were short, because another checkout took the stock first. Stock can never go
+    negative even when checkouts race. On PostgreSQL the rows are first
+    locked in product id order (SELECT ... FOR UPDATE), so two checkouts
+    over the same products always lock them in the same order and can't
+    deadlock. Caller commits, or rolls back on error.
+
+    Args:
+        lines: Quote lines
+
+    Raises:
+        CheckoutError: If a product no longer has enough stock
+    """
+    from sqlalchemy import case, select, update
+    from app import db
+    from app.models.product import Product
+
+    quantities = {}
+    names = {}
+    for line in lines:
+        quantities[line['product_id']] = quantities.get(line['product_id'], 0) + line['quantity']
+        names[line['product_id']] = line.get('name')
+    product_ids = sorted(quantities)
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        db.session.execute(
+            select(Product.id).where(Product.id.in_(product_ids)).order_by(Product.id).with_for_update()
+        )
+
+    quantity = case(quantities, value=Product.id)
+    updated = db.session.execute(
+        update(Product).where(
+            Product.id.in_(product_ids),
+            Product.is_active == True,
+            Product.stock_quantity >= quantity
+        ).values(
+            stock_quantity=Product.stock_quantity - quantity,
+            units_sold=Product.units_sold + quantity
+        ).returning(Product.id),
+        execution_options={'synchronize_session': False}
+    ).scalars().all()
+
+    if len(updated) != len(product_ids):
+        short = min(set(product_ids) - set(updated))
+        name = names[short] or db.session.execute(select(Product.name).where(Product.id == short)).scalar()
+        raise CheckoutError(
+            'INSUFFICIENT_STOCK',
+            f"Insufficient stock for {name or 'a product in your cart'}",
+            status=409
+        )
+
+
+def quote_to_dict(quote):
+    """
+    Quote for API responses
+
+    Args:
+        quote: Quote
+
+    Returns:
+        dict: Quote data
+    """
+    return {
+        'total': float(quote['total']),
+        'item_count': quote['item_count'],
+        'merchants': [
+            {
+                'merchant_id': merchant['merchant_id'],
+                'merchant_name': merchant['merchant_name'],
+                'subtotal': float(merchant['subtotal']),
+                'commission': float(merchant['commission']),
+                'items': [
+                    {
+                        'product_id': line['product_id'],
+                        'name': line.get('name'),
+                        'image_url': line.get('image_url'),
+                        'quantity': line['quantity'],
+                        'unit_price': float(line['unit_price']),
+                        'subtotal': float(line['unit_price'] * line['quantity'])
+                    }
+                    for line in merchant['lines']
+                ]
+            }
+            for merchant in quote['merchants']
+        ]
+    }
@@ -0,0 +1,173 @@
+"""
+Count Service
+Total counts for paginated listings without a full COUNT(*) on every page
+
+Counting is the most expensive part of a listing page once the page itself
+is served from an index. Totals are resolved in this order:
+
+1. Cached: counts are kept per filter signature for COUNT_CACHE_TTL
+   seconds (at most COUNT_CACHE_MAX_ENTRIES of them, least recently used
+   evicted first) and dropped when this worker writes to the counted table
+   (see invalidate_counts). Other workers' writes show up within the TTL.
+2. Unfiltered scans on PostgreSQL: a count capped at
+   COUNT_EXACT_THRESHOLD + 1 rows stops early and is exact for small
+   tables; beyond the threshold the planner's row estimate from EXPLAIN,
+   which reads table statistics instead of rows, is used.
+3. Exact otherwise (filtered listings, SQLite).
+
+Estimated counts are flagged as approximate so clients can show
+"about 120,000 products" instead of an exact figure.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import func, select, text
+
+
+class CountCache:
+    """
+    Per-worker cache of (count, approximate) by scope and filter signature
+
+    Signatures include free-text search terms, so the cache holds at most
+    `max_entries` counts: expired entries are dropped on every write and
+    the least recently used ones make room beyond that.
+    """
+
+    def __init__(self, ttl=30, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (scope, signature) -> (count, approximate, expires_at), oldest use first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, scope, signature):
+        """
+        Cached count if still fresh
+
+        Returns:
+            tuple: (count, approximate) or None
+        """
+        key = (scope, signature)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    def set(self, scope, signature, count, approximate):
+        """Store a count for TTL seconds"""
+        now = time.monotonic()
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if entry[2] < now]:
+                del self._entries[key]
+            self._entries[(scope, signature)] = (count, approximate, now + self.ttl)
+            self._entries.move_to_end((scope, signature))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, scope):
+        """Drop every cached count for a scope"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == scope]:
+                del self._entries[key]
+
+
+def get_count_cache():
+    """
+    Get this worker's count cache for the current app
+
+    Returns:
+        CountCache: Count cache
+    """
+    cache = current_app.extensions.get('count_cache')
+    if cache is None:
+        cache = current_app.extensions.setdefault(
+            'count_cache',
+            CountCache(
+                ttl=current_app.config.get('COUNT_CACHE_TTL', 30),
+                max_entries=current_app.config.get('COUNT_CACHE_MAX_ENTRIES', 1024)
+            )
+        )
+    return cache
+
+
+def invalidate_counts(scope):
+    """
+    Forget cached counts after a write that may change them
+
+    Args:
+        scope: Counted table, e.g. 'products'
+    """
+    cache = current_app.extensions.get('count_cache')
+    if cache is not None:
+        cache.invalidate(scope)
+
+
+def _capped_count(query, cap):
+    """Count matching rows, stopping after `cap`"""
+    from app import db
+
+    capped = query.order_by(None).limit(cap).subquery()
+    return db.session.execute(select(func.count()).select_from(capped)).scalar()
+
+
+def _planner_estimate(query):
+    """Row estimate from the PostgreSQL planner (no rows are read)"""
+    from app import db
+
+    statement = query.order_by(None).statement.compile(
+        dialect=db.engine.dialect,
+        compile_kwargs={'literal_binds': True}
+    )
+    plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {statement}')).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_query(query, scope, signature=None, estimate=False):
+    """
+    Total rows for a listing query using the cheapest adequate strategy
+
+    Args:
+        query: Filtered listing query
+        scope: Counted table, used for invalidation (e.g. 'products')
+        signature: Hashable description of the filters; None disables caching
+        estimate: Allow a planner estimate (only pass for unfiltered scans,
+            where table statistics are accurate)
+
+    Returns:
+        tuple: (count, approximate)
+    """
+    cache = get_count_cache() if signature is not None else None
+    if cache is not None:
+        cached = cache.get(scope, signature)
+        if cached is not None:
+            return cached
+
+    from app import db
+
+    approximate = False
+    if estimate and db.engine.dialect.name == 'postgresql':
+        threshold = current_app.config.get('COUNT_EXACT_THRESHOLD', 1000)
+        count = _capped_count(query, threshold + 1)
+        if count > threshold:
+            # Statistics lag behind recent writes; never report fewer rows
+            # than we just saw
+            count = max(_planner_estimate(query), count)
+            approximate = True
+    else:
+        count = query.order_by(None).count()
+
+    if cache is not None:
+        cache.set(scope, signature, count, approximate)
+    return count, approximate
@@ -27,7 +27,7 @@ def send_async_email(app, msg):
             print(f"Email sending error: {str(e)}")
 
 
-def send_email(subject, recipients, html_body, text_body=None):
+def send_email(subject, recipients, html_body, text_body=None, asynchronous=True):
     """
     Send email
     
@@ -36,7 +36,21 @@ def send_email(subject, recipients, html_body, text_body=None):
         recipients: List of recipient emails
         html_body: HTML email body
         text_body: Plain text fallback (optional)
+        asynchronous: Send from a background thread; when False, send now
+            and let errors propagate (the outbox worker retries them)
     """
+    if not asynchronous:
+        msg = Message(
+            subject=subject,
+            sender=current_app.config.get('MAIL_DEFAULT_SENDER'),
+            recipients=recipients if isinstance(recipients, list) else [recipients]
+        )
+        msg.html = html_body
+        if text_body:
+            msg.body = text_body
+        mail.send(msg)
+        return True
+    
     try:
         msg = Message(
             subject=subject,
@@ -68,7 +82,7 @@ def send_welcome_email(user):
     )
 
 
-def send_order_confirmation_email(order):
+def send_order_confirmation_email(order, asynchronous=True):
     """Send order confirmation email"""
     customer = order.customer
     html = get_order_confirmation_template(customer.name, order)
@@ -76,7 +90,8 @@ def send_order_confirmation_email(order):
     return send_email(
         subject=f"Order Confirmation - Order #{order.id}",
         recipients=customer.email,
-        html_body=html
+        html_body=html,
+        asynchronous=asynchronous
     )
 
 
@@ -104,7 +119,7 @@ def send_payment_confirmation_email(order):
     )
 
 
-def send_merchant_new_order_email(merchant, suborder):
+def send_merchant_new_order_email(merchant, suborder, asynchronous=True):
     """Send new order notification to merchant"""
     html = f"""
     <html>
@@ -131,7 +146,8 @@ def send_merchant_new_order_email(merchant, suborder):
     return send_email(
         subject=f"New Order #{suborder.id} - Action Required",
         recipients=merchant.email,
-        html_body=html
+        html_body=html,
+        asynchronous=asynchronous
     )
 
 
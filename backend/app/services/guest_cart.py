@@ -0,0 +1,353 @@
+"""
+Guest Cart Service
+Server-side carts for shoppers who have not logged in yet
+
+A guest cart is a small {product_id: quantity} map stored under an opaque
+random token that the client keeps (X-Guest-Cart-Token header). Guest carts
+never touch the main database: they live in a fast key-value store that
+expires them after GUEST_CART_TTL seconds without changes.
+
+GUEST_CART_STORE selects the store:
+- memory: an LRU dict in each worker process (single-worker deployments
+  and development; carts are lost on restart)
+- sqlite: a shared SQLite file in WAL mode that every worker on the host
+  can read, standing in for Redis without another service to run
+
+At login or registration the guest cart is merged into the user's Cart
+with one bulk upsert (see merge_guest_cart).
+"""
+import json
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request
+
+
+# Request header carrying the guest cart token
+GUEST_CART_HEADER = 'X-Guest-Cart-Token'
+
+
+def new_guest_cart_token():
+    """
+    Generate an unguessable guest cart token
+
+    Returns:
+        str: URL-safe random token
+    """
+    return secrets.token_urlsafe(24)
+
+
+class GuestCartStore:
+    """
+    Key-value store of guest carts with expiry
+
+    Stores implement `_read(token)`, `_write(token, items)` and
+    `_delete(token)` and are safe to call from several threads.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        """
+        Items in a guest cart
+
+        Args:
+            token: Guest cart token
+
+        Returns:
+            dict: {product_id: quantity}, or None if unknown or expired
+        """
+        if not token:
+            return None
+        with self._lock:
+            return self._read(token)
+
+    def update(self, token, change):
+        """
+        Change a guest cart atomically and restart its TTL
+
+        Args:
+            token: Guest cart token
+            change: Function from the current items (empty if new) to the new items
+
+        Returns:
+            dict: New items
+        """
+        with self._lock:
+            items = change(dict(self._read(token) or {}))
+            self._write(token, items)
+        return items
+
+    def pop(self, token):
+        """
+        Remove a guest cart and return its items (for merging)
+
+        Args:
+            token: Guest cart token
+
+        Returns:
+            dict: {product_id: quantity}, or None if unknown or expired
+        """
+        if not token:
+            return None
+        with self._lock:
+            items = self._read(token)
+            self._delete(token)
+        return items
+
+    def delete(self, token):
+        """Remove a guest cart if present"""
+        with self._lock:
+            self._delete(token)
+
+
+class MemoryGuestCartStore(GuestCartStore):
+    """
+    In-process LRU of guest carts (least recently used evicted first)
+    """
+
+    def __init__(self, ttl, max_entries=100000):
+        super().__init__(ttl)
+        self.max_entries = max_entries
+        self._carts = OrderedDict()  # token -> (items, expires_at)
+
+    def _read(self, token):
+        entry = self._carts.get(token)
+        if entry is None:
+            return None
+        if entry[1] < time.monotonic():
+            self._carts.pop(token, None)
+            return None
+        self._carts.move_to_end(token)
+        return dict(entry[0])
+
+    def _write(self, token, items):
+        self._carts[token] = (dict(items), time.monotonic() + self.ttl)
+        self._carts.move_to_end(token)
+        while len(self._carts) > self.max_entries:
+            self._carts.popitem(last=False)
+
+    def _delete(self, token):
+        self._carts.pop(token, None)
+
+
+class SQLiteGuestCartStore(GuestCartStore):
+    """
+    Guest carts in a SQLite file shared by every worker on the host
+
+    Each thread keeps its own connection. Writes run in IMMEDIATE
+    transactions so read-modify-write updates from different workers
+    don't interleave. Expired rows are purged every PURGE_EVERY writes.
+    """
+
+    PURGE_EVERY = 1000
+
+    def __init__(self, path, ttl):
+        super().__init__(ttl)
+        self.path = path
+        self._local = threading.local()
+        self._writes = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as connection:
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS guest_carts ('
+                'token TEXT PRIMARY KEY, items TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+
+    def _connection(self):
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def _read(self, token):
+        row = self._connection().execute(
+            'SELECT items FROM guest_carts WHERE token = ? AND expires_at >= ?',
+            (token, time.time())
+        ).fetchone()
+        if row is None:
+            return None
+        return {int(product_id): quantity for product_id, quantity in json.loads(row[0]).items()}
+
+    def _write(self, token, items):
+        self._connection().execute(
+            'INSERT INTO guest_carts (token, items, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT (token) DO UPDATE SET items = excluded.items, expires_at = excluded.expires_at',
+            (token, json.dumps(items), time.time() + self.ttl)
+        )
+        self._writes += 1
+        if self._writes % self.PURGE_EVERY == 0:
+            self._connection().execute('DELETE FROM guest_carts WHERE expires_at < ?', (time.time(),))
+
+    def _delete(self, token):
+        self._connection().execute('DELETE FROM guest_carts WHERE token = ?', (token,))
+
+    def update(self, token, change):
+        """Change a guest cart atomically across workers (see GuestCartStore.update)"""
+        connection = self._connection()
+        with self._lock:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                items = change(dict(self._read(token) or {}))
+                self._write(token, items)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        return items
+
+    def pop(self, token):
+        """Remove a guest cart and return its items (see GuestCartStore.pop)"""
+        if not token:
+            return None
+        connection = self._connection()
+        with self._lock:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                items = self._read(token)
+                self._delete(token)
+                connection.execute('COMMIT')
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+        return items
+
+
+def get_guest_cart_store():
+    """
+    Get the guest cart store configured for the current app
+
+    Returns:
+        GuestCartStore: Memory or SQLite store
+    """
+    store = current_app.extensions.get('guest_cart_store')
+    if store is None:
+        ttl = current_app.config.get('GUEST_CART_TTL', 7 * 24 * 3600)
+        if current_app.config.get('GUEST_CART_STORE') == 'sqlite':
+            store = SQLiteGuestCartStore(current_app.config['GUEST_CART_STORE_PATH'], ttl)
+        else:
+            store = MemoryGuestCartStore(ttl, current_app.config.get('GUEST_CART_MAX_ENTRIES', 100000))
+        store = current_app.extensions.setdefault('guest_cart_store', store)
+    return store
+
+
+def get_guest_cart_token():
+    """
+    Guest cart token sent with the current request
+
+    Returns:
+        str: Token or None
+    """
+    return request.headers.get(GUEST_CART_HEADER) or None
+
+
+def guest_cart_snapshot(token, items):
+    """
+    Serialize a guest cart like Cart.to_dict()
+
+    Products and merchants are loaded in one joined query.
+
+    Args:
+        token: Guest cart token (None for an empty cart)
+        items: {product_id: quantity}
+
+    Returns:
+        dict: Guest cart data
+    """
+    from sqlalchemy.orm import joinedload
+    from app.models.cart import CartItem
+    from app.models.product import Product
+
+    products = {
+        product.id: product
+        for product in Product.query.options(joinedload(Product.merchant)).filter(
+            Product.id.in_(items)
+        ).all()
+    } if items else {}
+
+    lines = []
+    total = 0
+    for product_id, quantity in items.items():
+        product = products.get(product_id)
+        if not product:
+            continue
+        subtotal = float(product.price) * quantity
+        if product.is_active:
+            total += subtotal
+        lines.append({
+            'product': CartItem.product_summary(product),
+            'quantity': quantity,
+            'subtotal': subtotal
+        })
+
+    return {
+        'token': token,
+        'items': lines,
+        'total': total,
+        'item_count': sum(items.values())
+    }
+
+
+def merge_guest_cart(user, token):
+    """
+    Move a guest cart into a user's cart
+
+    All lines go into the user's cart in one upsert that adds to existing
+    quantities and caps them at stock (CartItem.add_quantities); inactive
+    and out-of-stock products are dropped. The guest cart is popped before
+    merging and put back if the merge fails.
+
+    Args:
+        user: Customer who just logged in or registered
+        token: Guest cart token
+
+    Returns:
+        int: Number of products merged
+    """
+    from app import db
+    from app.models.cart import Cart, CartItem
+    from app.models.product import Product
+
+    store = get_guest_cart_store()
+    # Taken atomically: of two logins racing with the same token, only one
+    # gets the items
+    items = store.pop(token)
+    if not items:
+        return 0
+
+    try:
+        available = {
+            product_id for (product_id,) in db.session.query(Product.id).filter(
+                Product.id.in_(items),
+                Product.is_active == True,
+                Product.stock_quantity > 0
+            )
+        }
+        quantities = {product_id: quantity for product_id, quantity in items.items() if product_id in available}
+
+        if quantities:
+            cart = Cart.get_or_create_cart(user.id)
+            CartItem.add_quantities(cart.id, quantities)
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        # Put the lines back (alongside anything added since) so the merge can be retried
+        store.update(token, lambda current: {
+            product_id: current.get(product_id, 0) + items.get(product_id, 0)
+            for product_id in {**items, **current}
+        })
+        raise
+
+    return len(quantities)
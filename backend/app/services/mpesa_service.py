@@ -33,7 +33,7 @@ def get_mpesa_access_token():
     }
     
     try:
-        response = requests.get(url, headers=headers)
+        response = requests.get(url, headers=headers, timeout=current_app.config.get('MPESA_TIMEOUT', 10))
         response.raise_for_status()
         
         data = response.json()
@@ -108,7 +108,7 @@ def initiate_stk_push(phone_number, amount, account_reference, transaction_desc)
     }
     
     try:
-        response = requests.post(url, json=payload, headers=headers)
+        response = requests.post(url, json=payload, headers=headers, timeout=current_app.config.get('MPESA_TIMEOUT', 10))
         response.raise_for_status()
         
         data = response.json()
@@ -0,0 +1,144 @@
+"""
+Order Read Model Service
+Keeps order_read_model in step with the order tables
+
+Admin, merchant, hub and customer order lists used to join master_orders,
+suborders, order_items, users and hubs on every request. The read model
+holds one precomputed row per suborder with everything the lists show,
+and each list reads it through one index.
+
+Every write path that changes what a list shows (checkout, merchant and
+admin status updates, cancellation, hub verify/reject/pickup, payment
+callbacks, the reservation sweeper) calls refresh_order_read_model()
+before committing, so the rows change in the same transaction as the
+orders. The refresh is one INSERT ... SELECT ... ON CONFLICT DO UPDATE
+whatever the number of suborders. `flask read-model rebuild` recomputes
+every row (e.g. after renaming users or hubs, or after editing orders by
+hand).
+"""
+from sqlalchemy import func, select
+from sqlalchemy.orm import aliased
+
+
+# Read model columns in the order _source() selects them
+COLUMNS = [
+    'suborder_id', 'master_order_id', 'order_total', 'payment_method', 'payment_status',
+    'is_cancelled', 'order_created_at', 'customer_id', 'customer_name', 'customer_email',
+    'merchant_id', 'merchant_name', 'hub_id', 'hub_name', 'status', 'subtotal_amount',
+    'merchant_payout_amount', 'pickup_deadline', 'item_count', 'created_at', 'updated_at'
+]
+
+
+def _source(condition):
+    """SELECT computing read model rows for the suborders matching `condition`"""
+    from app.models.hub import Hub
+    from app.models.order import MasterOrder, SubOrder, OrderItem
+    from app.models.user import User
+
+    customer = aliased(User)
+    merchant = aliased(User)
+    item_count = select(func.count(OrderItem.id)).where(
+        OrderItem.suborder_id == SubOrder.id
+    ).scalar_subquery()
+
+    return select(
+        SubOrder.id,
+        MasterOrder.id,
+        MasterOrder.total_amount,
+        MasterOrder.payment_method,
+        MasterOrder.payment_status,
+        MasterOrder.is_cancelled,
+        MasterOrder.created_at,
+        MasterOrder.customer_id,
+        customer.name,
+        customer.email,
+        SubOrder.merchant_id,
+        merchant.name,
+        SubOrder.hub_id,
+        Hub.name,
+        SubOrder.status,
+        SubOrder.subtotal_amount,
+        SubOrder.merchant_payout_amount,
+        SubOrder.pickup_deadline,
+        item_count,
+        SubOrder.created_at,
+        SubOrder.updated_at
+    ).select_from(SubOrder).join(
+        MasterOrder, MasterOrder.id == SubOrder.master_order_id
+    ).join(
+        customer, customer.id == MasterOrder.customer_id
+    ).join(
+        merchant, merchant.id == SubOrder.merchant_id
+    ).outerjoin(
+        Hub, Hub.id == SubOrder.hub_id
+    ).where(condition)
+
+
+def refresh_order_read_model(master_order_ids=None, suborder_ids=None):
+    """
+    Recompute the read model rows of some orders in the current transaction
+
+    Pending ORM changes are flushed first so the rows see them. Nothing is
+    committed; the caller commits with its own changes.
+
+    Args:
+        master_order_ids: Refresh every suborder of these orders
+        suborder_ids: Refresh these suborders
+    """
+    from sqlalchemy import or_
+    from app import db
+    from app.models.order import SubOrder
+    from app.models.order_read_model import OrderReadModel
+    from app.utils.upsert import dialect_insert
+
+    conditions = []
+    if master_order_ids:
+        conditions.append(SubOrder.master_order_id.in_(list(master_order_ids)))
+    if suborder_ids:
+        conditions.append(SubOrder.id.in_(list(suborder_ids)))
+    if not conditions:
+        return
+
+    db.session.flush()
+
+    statement = dialect_insert(OrderReadModel.__table__).from_select(COLUMNS, _source(or_(*conditions)))
+    db.session.execute(statement.on_conflict_do_update(
+        index_elements=['suborder_id'],
+        set_={name: statement.excluded[name] for name in COLUMNS[1:]}
+    ))
+
+
+def rebuild_order_read_model(batch_size=1000):
+    """
+    Recompute every read model row from the order tables
+
+    Suborders are refreshed in id batches, one commit per batch, and rows
+    of suborders that no longer exist are deleted.
+
+    Args:
+        batch_size: Suborders per batch
+
+    Returns:
+        int: Number of rows written
+    """
+    from app import db
+    from app.models.order import SubOrder
+    from app.models.order_read_model import OrderReadModel
+
+    OrderReadModel.query.filter(
+        ~OrderReadModel.suborder_id.in_(select(SubOrder.id))
+    ).delete(synchronize_session=False)
+    db.session.commit()
+
+    written, last_id = 0, 0
+    while True:
+        suborder_ids = db.session.execute(
+            select(SubOrder.id).where(SubOrder.id > last_id).order_by(SubOrder.id).limit(batch_size)
+        ).scalars().all()
+        if not suborder_ids:
+            return written
+
+        refresh_order_read_model(suborder_ids=suborder_ids)
+        db.session.commit()
+        written += len(suborder_ids)
+        last_id = suborder_ids[-1]
@@ -0,0 +1,166 @@
+"""
+Order Summary Service
+Compact rows for order history lists
+
+List screens show an order's id, date, total, status and item count.
+Serializing every order with its suborders, items, products, hubs and
+merchants reads and sends far more than that, so the customer order list
+defaults to view=summary: rows come from the order read model (one
+precomputed row per suborder, see order_read_model_service) through one
+index, and master orders are its rows grouped per order. The merchant and
+hub lists default to view=full, which their screens read, and return
+summaries with view=summary. The detail endpoints (GET /orders/:id,
+/merchant/orders/:id, /hub/orders/:id) serve the full order when it is
+opened.
+"""
+from sqlalchemy import distinct, func
+
+
+# List views
+SUMMARY_VIEW = 'summary'
+FULL_VIEW = 'full'
+VIEWS = (SUMMARY_VIEW, FULL_VIEW)
+
+# Status of an order whose suborders are in different states
+MIXED_STATUS = 'mixed'
+
+
+def get_view_arg(default=SUMMARY_VIEW):
+    """
+    Read the view query parameter
+
+    Args:
+        default: View when none is given
+
+    Returns:
+        str: 'summary' or 'full', or None if the value is invalid
+    """
+    from flask import request
+
+    view = (request.args.get('view') or default).lower()
+    return view if view in VIEWS else None
+
+
+def master_order_sort():
+    """Keyset ORDER BY for master_order_summaries(): newest first"""
+    from app.models.order_read_model import OrderReadModel
+
+    return [OrderReadModel.order_created_at.desc(), OrderReadModel.master_order_id.desc()]
+
+
+def suborder_sort():
+    """Keyset ORDER BY for suborder_summaries(): newest first"""
+    from app.models.order_read_model import OrderReadModel
+
+    return [OrderReadModel.created_at.desc(), OrderReadModel.suborder_id.desc()]
+
+
+def master_order_summaries(*conditions):
+    """
+    One summary row per master order
+
+    The order's read model rows are grouped in the database, so a page is
+    a single query.
+
+    Args:
+        conditions: Filters on OrderReadModel columns
+
+    Returns:
+        Query: Rows for master_order_summary()
+    """
+    from app import db
+    from app.models.order_read_model import OrderReadModel as Row
+
+    return db.session.query(
+        Row.master_order_id,
+        Row.order_created_at,
+        Row.order_total,
+        Row.payment_method,
+        Row.payment_status,
+        Row.is_cancelled,
+        Row.customer_id,
+        Row.customer_name,
+        Row.customer_email,
+        func.count(Row.suborder_id).label('suborder_count'),
+        func.sum(Row.item_count).label('item_count'),
+        func.count(distinct(Row.status)).label('status_count'),
+        func.min(Row.status).label('status')
+    ).filter(*conditions).group_by(
+        # Master order columns are the same on all of an order's rows
+        Row.master_order_id, Row.order_created_at, Row.order_total, Row.payment_method,
+        Row.payment_status, Row.is_cancelled, Row.customer_id, Row.customer_name, Row.customer_email
+    )
+
+
+def count_master_orders(*conditions):
+    """
+    Number of master orders with read model rows matching the conditions
+
+    Args:
+        conditions: Filters on OrderReadModel columns
+
+    Returns:
+        int: Count
+    """
+    from app import db
+    from app.models.order_read_model import OrderReadModel
+
+    return db.session.query(
+        func.count(distinct(OrderReadModel.master_order_id))
+    ).filter(*conditions).scalar()
+
+
+def master_order_summary(row):
+    """
+    Convert a master_order_summaries() row to a dictionary
+
+    status is the suborders' common status, or 'mixed' while they differ.
+    """
+    if row.status_count > 1:
+        status = MIXED_STATUS
+    else:
+        status = row.status.value if row.status else None
+
+    return {
+        'id': row.master_order_id,
+        'created_at': row.order_created_at.isoformat() if row.order_created_at else None,
+        'total_amount': float(row.order_total),
+        'payment_method': row.payment_method.value,
+        'payment_status': row.payment_status.value,
+        'is_cancelled': row.is_cancelled,
+        'status': status,
+        'suborder_count': row.suborder_count,
+        'item_count': int(row.item_count or 0)
+    }
+
+
+def suborder_summaries(*conditions):
+    """
+    One summary row per suborder
+
+    Args:
+        conditions: Filters on OrderReadModel columns
+
+    Returns:
+        Query: OrderReadModel rows for suborder_summary()
+    """
+    from app.models.order_read_model import OrderReadModel
+
+    return OrderReadModel.query.filter(*conditions)
+
+
+def suborder_summary(row):
+    """Convert an OrderReadModel row to a dictionary"""
+    return {
+        'id': row.suborder_id,
+        'master_order_id': row.master_order_id,
+        'created_at': row.created_at.isoformat() if row.created_at else None,
+        'status': row.status.value,
+        'subtotal_amount': float(row.subtotal_amount),
+        'merchant_payout_amount': float(row.merchant_payout_amount),
+        'pickup_deadline': row.pickup_deadline.isoformat() if row.pickup_deadline else None,
+        'item_count': row.item_count,
+        'customer_name': row.customer_name,
+        'merchant_name': row.merchant_name,
+        'hub_name': row.hub_name
+    }
@@ -0,0 +1,338 @@
+"""
+Outbox Service
+Durable queue of side effects that run after a transaction commits
+
+Checkout used to call Safaricom and start email threads inside the
+request, so its latency was Safaricom's latency. Now the order write path
+only records what has to happen (enqueue) in the same transaction as the
+order: the messages exist if and only if the order does. The outbox worker
+(`flask outbox work`) performs them afterwards:
+
+- Due messages are claimed with one UPDATE ... RETURNING (SKIP LOCKED on
+  PostgreSQL), which also sets a lease: a message whose worker died is
+  claimed again once OUTBOX_LEASE_SECONDS have passed. Leases are
+  renewed before each delivery, and a delivery is only recorded while
+  its claim still holds.
+- Failures are retried with exponential backoff starting at
+  OUTBOX_RETRY_SECONDS, up to OUTBOX_MAX_ATTEMPTS attempts in total.
+- Clients poll the message state, e.g. the STK push status on
+  GET /payments/status/<order_id>.
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import select, update
+
+
+# Message kinds
+STK_PUSH = 'stk_push'
+ORDER_CONFIRMATION_EMAIL = 'order_confirmation_email'
+MERCHANT_NEW_ORDER_EMAIL = 'merchant_new_order_email'
+
+# Longest wait between retries
+MAX_RETRY_DELAY = timedelta(hours=1)
+
+_handlers = {}
+
+
+class OutboxError(Exception):
+    """A message could not be delivered this time (it will be retried)"""
+
+
+def handler(kind):
+    """
+    Register the function that performs messages of a kind
+
+    Args:
+        kind: Message kind
+    """
+    def register(function):
+        _handlers[kind] = function
+        return function
+    return register
+
+
+def enqueue(kind, order_id=None, payload=None):
+    """
+    Record a side effect in the current transaction
+
+    Args:
+        kind: Message kind (must have a handler)
+        order_id: Order the message belongs to
+        payload: JSON-serializable arguments for the handler
+
+    Returns:
+        OutboxMessage: Pending message (added to the session, not committed)
+    """
+    from app import db
+    from app.models.outbox import OutboxMessage
+
+    if kind not in _handlers:
+        raise ValueError(f'Unknown outbox message kind: {kind}')
+
+    message = OutboxMessage(kind=kind, order_id=order_id, payload=payload or {})
+    db.session.add(message)
+    return message
+
+
+def enqueue_many(messages):
+    """
+    Record several side effects in the current transaction with one INSERT
+
+    Args:
+        messages: [(kind, order_id, payload), ...]
+    """
+    from sqlalchemy import insert
+    from app import db
+    from app.models.outbox import OutboxMessage
+
+    for kind, _, _ in messages:
+        if kind not in _handlers:
+            raise ValueError(f'Unknown outbox message kind: {kind}')
+
+    db.session.execute(insert(OutboxMessage), [
+        {'kind': kind, 'order_id': order_id, 'payload': payload or {}}
+        for kind, order_id, payload in messages
+    ])
+
+
+def retry_delay(attempts):
+    """
+    Backoff before the next attempt
+
+    Args:
+        attempts: Attempts made so far (1 after the first failure)
+
+    Returns:
+        timedelta: Delay
+    """
+    base = current_app.config.get('OUTBOX_RETRY_SECONDS', 30)
+    return min(timedelta(seconds=base * 2 ** (attempts - 1)), MAX_RETRY_DELAY)
+
+
+def _lease():
+    """Claim lease length"""
+    return timedelta(seconds=current_app.config.get('OUTBOX_LEASE_SECONDS', 60))
+
+
+def _held(message_id, attempts):
+    """WHERE clause matching a message only while this worker's claim holds"""
+    from app.models.outbox import OutboxMessage, OutboxStatus
+
+    # attempts goes up on every claim, so it identifies the claim
+    return (
+        OutboxMessage.id == message_id,
+        OutboxMessage.status == OutboxStatus.PROCESSING,
+        OutboxMessage.attempts == attempts
+    )
+
+
+def _claim(now, batch_size):
+    """
+    Claim due messages for this worker and commit the claim
+
+    Returns:
+        list: [(message_id, attempts), ...] in id order
+    """
+    from app import db
+    from app.models.outbox import OutboxMessage, OutboxStatus
+
+    due = select(OutboxMessage.id).where(
+        OutboxMessage.status.in_((OutboxStatus.PENDING, OutboxStatus.PROCESSING)),
+        OutboxMessage.next_attempt_at <= now
+    ).order_by(OutboxMessage.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True)
+
+    try:
+        claims = db.session.execute(
+            update(OutboxMessage).where(
+                OutboxMessage.id.in_(due.scalar_subquery()),
+                OutboxMessage.next_attempt_at <= now,
+                OutboxMessage.status.in_((OutboxStatus.PENDING, OutboxStatus.PROCESSING))
+            ).values(
+                status=OutboxStatus.PROCESSING,
+                attempts=OutboxMessage.attempts + 1,
+                next_attempt_at=now + _lease(),
+                updated_at=now
+            ).returning(OutboxMessage.id, OutboxMessage.attempts),
+            execution_options={'synchronize_session': False}
+        ).all()
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return sorted((message_id, attempts) for message_id, attempts in claims)
+
+
+def _renew(message_id, attempts, now):
+    """
+    Extend the lease of a claimed message just before delivering it
+
+    Returns:
+        bool: False if the claim was lost (the lease ran out and another
+        worker claimed the message, or it was already finished)
+    """
+    from app import db
+    from app.models.outbox import OutboxMessage
+
+    try:
+        renewed = db.session.execute(
+            update(OutboxMessage).where(*_held(message_id, attempts)).values(
+                next_attempt_at=now + _lease(),
+                updated_at=now
+            ),
+            execution_options={'synchronize_session': False}
+        ).rowcount
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    return renewed == 1
+
+
+def _finish(message_id, attempts, **values):
+    """Record a delivery outcome if the claim still holds; returns whether it did"""
+    from app import db
+    from app.models.outbox import OutboxMessage
+
+    return db.session.execute(
+        update(OutboxMessage).where(*_held(message_id, attempts)).values(**values),
+        execution_options={'synchronize_session': False}
+    ).rowcount == 1
+
+
+def _deliver(message_id, attempts, now):
+    """Run one claimed message and record the outcome"""
+    from app import db
+    from app.models.outbox import OutboxMessage, OutboxStatus
+
+    message = db.session.get(OutboxMessage, message_id)
+    try:
+        _handlers[message.kind](message)
+        # The handler's own changes commit only with the outcome
+        if not _finish(message_id, attempts, status=OutboxStatus.SENT, sent_at=now, last_error=None, updated_at=now):
+            db.session.rollback()
+            current_app.logger.warning(f"Outbox message {message_id} ({message.kind}) lost its claim while running")
+            return False
+        db.session.commit()
+        return True
+    except Exception as e:
+        db.session.rollback()
+        error = str(e) or e.__class__.__name__
+        if attempts >= current_app.config.get('OUTBOX_MAX_ATTEMPTS', 5):
+            outcome = {'status': OutboxStatus.FAILED}
+        else:
+            outcome = {'status': OutboxStatus.PENDING, 'next_attempt_at': now + retry_delay(attempts)}
+        _finish(message_id, attempts, last_error=error, updated_at=now, **outcome)
+        db.session.commit()
+        current_app.logger.warning(f"Outbox message {message_id} ({message.kind}) failed: {error}")
+        return False
+
+
+def process_outbox(now=None, batch_size=None):
+    """
+    Perform all messages that are due
+
+    The clock is read again for every claim and every delivery, and each
+    message's lease is renewed just before it runs, so a slow batch never
+    outlives the leases of the messages still waiting in it.
+
+    Args:
+        now: Fixed current time (default: utcnow, read each time)
+        batch_size: Messages claimed at a time (default: OUTBOX_BATCH_SIZE)
+
+    Returns:
+        int: Number of messages delivered
+    """
+    clock = (lambda: now) if now else datetime.utcnow
+    batch_size = batch_size or current_app.config.get('OUTBOX_BATCH_SIZE', 50)
+    delivered = 0
+
+    while True:
+        claims = _claim(clock(), batch_size)
+        for message_id, attempts in claims:
+            if _renew(message_id, attempts, clock()):
+                delivered += _deliver(message_id, attempts, clock())
+        if len(claims) < batch_size:
+            return delivered
+
+
+def run_outbox_worker(interval):
+    """
+    Process the outbox every `interval` seconds (runs forever)
+
+    Args:
+        interval: Seconds between polls
+    """
+    while True:
+        try:
+            process_outbox()
+        except Exception as e:
+            current_app.logger.error(f"Outbox processing failed: {str(e)}")
+        time.sleep(interval)
+
+
+def latest_message(order_id, kind):
+    """
+    Most recent message of a kind for an order
+
+    Args:
+        order_id: Master order ID
+        kind: Message kind
+
+    Returns:
+        OutboxMessage: Message or None
+    """
+    from app.models.outbox import OutboxMessage
+
+    return OutboxMessage.query.filter_by(order_id=order_id, kind=kind).order_by(OutboxMessage.id.desc()).first()
+
+
+# ----- handlers -----
+
+@handler(STK_PUSH)
+def _send_stk_push(message):
+    from app import db
+    from app.models.order import MasterOrder, PaymentStatus
+    from app.services.mpesa_service import initiate_stk_push
+
+    order = db.session.get(MasterOrder, message.order_id)
+    if not order or order.is_cancelled or order.payment_status == PaymentStatus.PAID:
+        return  # Nothing to collect any more
+
+    result = initiate_stk_push(
+        phone_number=order.mpesa_phone_number,
+        amount=int(order.total_amount),
+        account_reference=f"ORDER-{order.id}",
+        transaction_desc=f"Payment for Order #{order.id}"
+    )
+    if not result:
+        raise OutboxError('M-Pesa is not configured')
+    if not result.get('success'):
+        raise OutboxError(result.get('error') or 'STK Push failed')
+
+    order.mpesa_checkout_request_id = result.get('checkout_request_id')
+
+
+@handler(ORDER_CONFIRMATION_EMAIL)
+def _send_order_confirmation(message):
+    from app import db
+    from app.models.order import MasterOrder
+    from app.services.email_service import send_order_confirmation_email
+
+    order = db.session.get(MasterOrder, message.order_id)
+    if order:
+        send_order_confirmation_email(order, asynchronous=False)
+
+
+@handler(MERCHANT_NEW_ORDER_EMAIL)
+def _send_merchant_new_order(message):
+    from app import db
+    from app.models.order import SubOrder
+    from app.services.email_service import send_merchant_new_order_email
+
+    suborder = db.session.get(SubOrder, message.payload['suborder_id'])
+    if suborder:
+        send_merchant_new_order_email(suborder.merchant, suborder, asynchronous=False)
@@ -0,0 +1,154 @@
+"""
+Reservation Service
+Timed stock holds for unpaid M-Pesa orders
+
+Checkout takes stock out of inventory as soon as an order is created. For
+M-Pesa orders that stock is only reserved: the order records
+reservation_expires_at (STOCK_RESERVATION_MINUTES after checkout) and the
+hold ends when the payment callback marks it paid. Orders still unpaid
+(pending or failed payment) past that time are released by the sweeper:
+the master order and its pending suborders are cancelled and the stock
+goes back on sale.
+
+Releases are set-based: each batch is one UPDATE that claims expired
+orders, one grouped SELECT of their quantities per product, one executemany
+that restores stock in product id order (the same order checkout locks
+products in) and one UPDATE that cancels the suborders.
+"""
+import time
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import bindparam, func, select, update
+
+
+# Shown on orders cancelled by the sweeper
+EXPIRED_REASON = 'Payment was not received before the stock reservation expired'
+
+
+def reservation_deadline(now=None):
+    """
+    When a hold taken now expires
+
+    Args:
+        now: Checkout time (default: utcnow)
+
+    Returns:
+        datetime: Expiry time
+    """
+    minutes = current_app.config.get('STOCK_RESERVATION_MINUTES', 15)
+    return (now or datetime.utcnow()) + timedelta(minutes=minutes)
+
+
+def release_expired_reservations(now=None, batch_size=None):
+    """
+    Cancel unpaid M-Pesa orders whose reservation expired and restock them
+
+    Safe to run from several processes: orders are claimed by a
+    conditional UPDATE (rows locked by another sweeper are skipped on
+    PostgreSQL), so each order is released once.
+
+    Args:
+        now: Release holds that expired before this time (default: utcnow)
+        batch_size: Orders per transaction (default: RESERVATION_SWEEP_BATCH)
+
+    Returns:
+        int: Number of orders released
+    """
+    from app import db
+    from app.models.order import MasterOrder, SubOrder, OrderItem, PaymentStatus, SubOrderStatus
+    from app.models.product import Product
+    from app.services.count_service import invalidate_counts
+    from app.services.order_read_model_service import refresh_order_read_model
+
+    now = now or datetime.utcnow()
+    batch_size = batch_size or current_app.config.get('RESERVATION_SWEEP_BATCH', 500)
+    unpaid = (PaymentStatus.PENDING, PaymentStatus.FAILED)
+    released = 0
+
+    while True:
+        expired = select(MasterOrder.id).where(
+            MasterOrder.reservation_expires_at < now,
+            MasterOrder.payment_status.in_(unpaid),
+            MasterOrder.is_cancelled == False
+        ).order_by(MasterOrder.reservation_expires_at).limit(batch_size).with_for_update(skip_locked=True)
+
+        try:
+            order_ids = db.session.execute(
+                update(MasterOrder).where(
+                    MasterOrder.id.in_(expired.scalar_subquery()),
+                    MasterOrder.payment_status.in_(unpaid),
+                    MasterOrder.is_cancelled == False
+                ).values(
+                    is_cancelled=True,
+                    cancelled_at=now,
+                    cancellation_reason=EXPIRED_REASON,
+                    reservation_expires_at=None,
+                    updated_at=now
+                ).returning(MasterOrder.id),
+                execution_options={'synchronize_session': False}
+            ).scalars().all()
+
+            if not order_ids:
+                db.session.rollback()
+                break
+
+            held = db.session.execute(
+                select(OrderItem.product_id, func.sum(OrderItem.quantity))
+                .join(SubOrder, SubOrder.id == OrderItem.suborder_id)
+                .where(
+                    SubOrder.master_order_id.in_(order_ids),
+                    SubOrder.status == SubOrderStatus.PENDING_PAYMENT
+                )
+                .group_by(OrderItem.product_id)
+                .order_by(OrderItem.product_id)
+            ).all()
+
+            if held:
+                products = Product.__table__
+                db.session.execute(
+                    update(products).where(products.c.id == bindparam('product_id')).values(
+                        stock_quantity=products.c.stock_quantity + bindparam('quantity'),
+                        units_sold=products.c.units_sold - bindparam('quantity')
+                    ),
+                    [{'product_id': product_id, 'quantity': int(quantity)} for product_id, quantity in held]
+                )
+
+            db.session.execute(
+                update(SubOrder).where(
+                    SubOrder.master_order_id.in_(order_ids),
+                    SubOrder.status == SubOrderStatus.PENDING_PAYMENT
+                ).values(status=SubOrderStatus.CANCELLED, updated_at=now),
+                execution_options={'synchronize_session': False}
+            )
+
+            refresh_order_read_model(master_order_ids=order_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        released += len(order_ids)
+        if held:
+            invalidate_counts('products')  # Stock restored
+        current_app.logger.info(f"Released stock reservations for {len(order_ids)} expired order(s)")
+
+        if len(order_ids) < batch_size:
+            break
+
+    return released
+
+
+def run_reservation_sweeper(interval):
+    """
+    Release expired reservations every `interval` seconds (runs forever)
+
+    Args:
+        interval: Seconds between sweeps
+    """
+    while True:
+        try:
+            release_expired_reservations()
+        except Exception as e:
+            current_app.logger.error(f"Reservation sweep failed: {str(e)}")
+        time.sleep(interval)
@@ -0,0 +1,554 @@
+"""
+Search Index
+In-process BM25 catalog search for deployments without database full-text search
+
+Layout on disk (SEARCH_INDEX_PATH):
+- <path>        Immutable snapshot segment. Every gunicorn worker memory-maps the
+                same file, so the postings live once in the OS page cache.
+- <path>.delta  Append-only JSON-lines log of product upserts/deletes written by
+                the merchant product routes. Each worker tails it into an
+                in-memory delta segment before searching.
+- <path>.lock   flock() guarding delta appends and snapshot replacement
+                (exclusive), and snapshot + log reads (shared).
+
+When the delta grows past SEARCH_INDEX_MERGE_THRESHOLD documents, a background
+thread merges snapshot + delta into a new snapshot, atomically renames it into
+place and truncates the log. Other workers notice the new inode and re-map.
+"""
+import json
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process development only
+    fcntl = None
+
+from flask import current_app
+from app.services.search_service import tokenize_query
+
+
+MAGIC = b'MHBM'
+VERSION = 1
+# magic, version, n_docs, n_terms, n_postings, total_length, delta_offset
+HEADER = struct.Struct('<4sIIIQQQ')
+
+# BM25 parameters
+K1 = 1.2
+B = 0.75
+
+# Name tokens count this many times towards term frequency (BM25F-style field boost)
+NAME_BOOST = 3
+
+# Max expansions for the trailing (possibly incomplete) query token
+PREFIX_EXPANSIONS = 50
+
+assert array('I').itemsize == 4
+
+
+def analyze(name, description):
+    """
+    Turn a product's text into weighted term frequencies
+
+    Args:
+        name: Product name
+        description: Product description
+
+    Returns:
+        tuple: (Counter of term -> tf, document length)
+    """
+    terms = Counter()
+    for token in tokenize_query(name or ''):
+        terms[token] += NAME_BOOST
+    for token in tokenize_query(description or ''):
+        terms[token] += 1
+    return terms, sum(terms.values())
+
+
+def write_snapshot(path, documents, delta_offset=0):
+    """
+    Write an immutable snapshot segment and atomically move it into place
+
+    Args:
+        path: Snapshot path
+        documents: Iterable of (product_id, Counter terms, length)
+        delta_offset: Byte offset in the delta log already covered by this snapshot
+    """
+    docs = sorted(documents, key=lambda doc: doc[0])
+
+    doc_ids = array('I', (doc[0] for doc in docs))
+    doc_lens = array('I', (doc[2] for doc in docs))
+
+    inverted = {}
+    for doc_index, (_, terms, _) in enumerate(docs):
+        for term, tf in terms.items():
+            inverted.setdefault(term, []).append((doc_index, tf))
+
+    terms_sorted = sorted(inverted, key=lambda term: term.encode('utf-8'))
+    term_offsets = array('I', [0])
+    postings_offsets = array('I', [0])
+    post_docs = array('I')
+    post_tfs = array('I')
+    blob = bytearray()
+
+    for term in terms_sorted:
+        blob += term.encode('utf-8')
+        term_offsets.append(len(blob))
+        for doc_index, tf in inverted[term]:
+            post_docs.append(doc_index)
+            post_tfs.append(tf)
+        postings_offsets.append(len(post_docs))
+
+    header = HEADER.pack(
+        MAGIC, VERSION, len(doc_ids), len(terms_sorted), len(post_docs),
+        sum(doc_lens), delta_offset
+    )
+
+    tmp_path = f'{path}.tmp.{os.getpid()}'
+    with open(tmp_path, 'wb') as f:
+        f.write(header)
+        for section in (doc_ids, doc_lens, term_offsets, postings_offsets, post_docs, post_tfs):
+            section.tofile(f)
+        f.write(blob)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+class SnapshotSegment:
+    """Read-only, memory-mapped snapshot segment"""
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, version, n_docs, n_terms, n_postings, total_length, delta_offset = \
+            HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f'Unsupported search index file: {path}')
+
+        self.n_docs = n_docs
+        self.n_terms = n_terms
+        self.total_length = total_length
+        self.delta_offset = delta_offset
+
+        view = memoryview(self._mm)
+        offset = HEADER.size
+
+        def take(count):
+            nonlocal offset
+            section = view[offset:offset + count * 4].cast('I')
+            offset += count * 4
+            return section
+
+        self.doc_ids = take(n_docs)
+        self.doc_lens = take(n_docs)
+        self.term_offsets = take(n_terms + 1)
+        self.postings_offsets = take(n_terms + 1)
+        self.post_docs = take(n_postings)
+        self.post_tfs = take(n_postings)
+        self.blob = view[offset:]
+
+    def doc_length(self, product_id):
+        """Indexed length of a product, or None if it is not in this snapshot"""
+        index = bisect_left(self.doc_ids, product_id)
+        if index < self.n_docs and self.doc_ids[index] == product_id:
+            return self.doc_lens[index]
+        return None
+
+    def term_at(self, index):
+        """Term bytes at dictionary position"""
+        return bytes(self.blob[self.term_offsets[index]:self.term_offsets[index + 1]])
+
+    def _bisect(self, key):
+        low, high = 0, self.n_terms
+        while low < high:
+            mid = (low + high) // 2
+            if self.term_at(mid) < key:
+                low = mid + 1
+            else:
+                high = mid
+        return low
+
+    def find_term(self, term):
+        """Dictionary position of an exact term, or None"""
+        key = term.encode('utf-8')
+        index = self._bisect(key)
+        if index < self.n_terms and self.term_at(index) == key:
+            return index
+        return None
+
+    def prefix_terms(self, prefix, limit):
+        """Up to `limit` terms starting with prefix"""
+        key = prefix.encode('utf-8')
+        index = self._bisect(key)
+        terms = []
+        while index < self.n_terms and len(terms) < limit:
+            term = self.term_at(index)
+            if not term.startswith(key):
+                break
+            terms.append(term.decode('utf-8'))
+            index += 1
+        return terms
+
+    def postings(self, term):
+        """Yield (product_id, tf, doc_length) for an exact term"""
+        index = self.find_term(term)
+        if index is None:
+            return
+        for position in range(self.postings_offsets[index], self.postings_offsets[index + 1]):
+            doc_index = self.post_docs[position]
+            yield self.doc_ids[doc_index], self.post_tfs[position], self.doc_lens[doc_index]
+
+    def documents(self):
+        """Rebuild (product_id, Counter terms, length) for every document (used by merges)"""
+        forward = [Counter() for _ in range(self.n_docs)]
+        for index in range(self.n_terms):
+            term = self.term_at(index).decode('utf-8')
+            for position in range(self.postings_offsets[index], self.postings_offsets[index + 1]):
+                forward[self.post_docs[position]][term] = self.post_tfs[position]
+        for doc_index in range(self.n_docs):
+            yield self.doc_ids[doc_index], forward[doc_index], self.doc_lens[doc_index]
+
+
+class DeltaSegment:
+    """In-memory segment of recent changes replayed from the delta log"""
+
+    def __init__(self):
+        self.docs = {}          # product_id -> (Counter terms, length)
+        self.tombstones = set() # product ids deleted or superseded in the snapshot
+        self.postings = {}      # term -> {product_id: tf}
+        self.total_length = 0
+
+    def _remove(self, product_id):
+        old = self.docs.pop(product_id, None)
+        if old:
+            terms, length = old
+            self.total_length -= length
+            for term in terms:
+                self.postings[term].pop(product_id, None)
+
+    def apply(self, entry):
+        product_id = entry['id']
+        self._remove(product_id)
+        self.tombstones.add(product_id)
+        if entry['op'] == 'upsert':
+            terms, length = analyze(entry.get('name'), entry.get('description'))
+            self.docs[product_id] = (terms, length)
+            self.total_length += length
+            for term, tf in terms.items():
+                self.postings.setdefault(term, {})[product_id] = tf
+
+
+class SearchIndex:
+    """
+    BM25 search over a shared snapshot plus a per-process delta segment
+    """
+
+    def __init__(self, path, merge_threshold=500):
+        self.path = path
+        self.delta_path = f'{path}.delta'
+        self.lock_path = f'{path}.lock'
+        self.merge_threshold = merge_threshold
+
+        self._lock = threading.RLock()
+        self._snapshot = None
+        self._delta = DeltaSegment()
+        self._delta_read_offset = 0
+        self._merging = False
+
+    # ----- file locking -----
+
+    def _flock(self, exclusive=True, blocking=True):
+        handle = open(self.lock_path, 'a')
+        if fcntl:
+            flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+            if not blocking:
+                flags |= fcntl.LOCK_NB
+            try:
+                fcntl.flock(handle, flags)
+            except BlockingIOError:
+                handle.close()
+                return None
+        return handle
+
+    @staticmethod
+    def _unlock(handle):
+        if fcntl:
+            fcntl.flock(handle, fcntl.LOCK_UN)
+        handle.close()
+
+    # ----- loading -----
+
+    def exists(self):
+        """True if a snapshot has been built"""
+        return os.path.exists(self.path)
+
+    def _refresh(self):
+        """Re-map a replaced snapshot and replay new delta log entries"""
+        # Shared flock: merge() and rebuild() replace the snapshot and
+        # truncate the log under the exclusive lock, so both are read as
+        # one consistent pair
+        handle = self._flock(exclusive=False)
+        try:
+            return self._refresh_locked()
+        finally:
+            self._unlock(handle)
+
+    def _refresh_locked(self):
+        """_refresh() for callers already holding the flock"""
+        with self._lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                return False
+
+            identity = (stat.st_ino, stat.st_mtime_ns)
+            if self._snapshot is None or self._snapshot.identity != identity:
+                self._snapshot = SnapshotSegment(self.path)
+                self._delta = DeltaSegment()
+                self._delta_read_offset = self._snapshot.delta_offset
+
+            try:
+                size = os.path.getsize(self.delta_path)
+            except FileNotFoundError:
+                size = 0
+
+            if size < self._delta_read_offset:
+                # Log truncated by a merge whose snapshot we have not seen yet
+                return True
+
+            if size > self._delta_read_offset:
+                with open(self.delta_path, 'rb') as f:
+                    f.seek(self._delta_read_offset)
+                    chunk = f.read(size - self._delta_read_offset)
+                # Only consume complete lines
+                complete = chunk[:chunk.rfind(b'\n') + 1]
+                for line in complete.splitlines():
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A damaged entry costs one product's freshness, not the search
+                        continue
+                    self._delta.apply(entry)
+                self._delta_read_offset += len(complete)
+
+            return True
+
+    # ----- writes -----
+
+    def apply_update(self, product):
+        """
+        Record a product change in the shared delta log
+
+        Args:
+            product: Product instance (inactive products are removed from the index)
+        """
+        if product.is_active:
+            entry = {'op': 'upsert', 'id': product.id, 'name': product.name,
+                     'description': product.description}
+        else:
+            entry = {'op': 'delete', 'id': product.id}
+
+        line = (json.dumps(entry) + '\n').encode('utf-8')
+        handle = self._flock()
+        try:
+            with open(self.delta_path, 'ab') as f:
+                f.write(line)
+        finally:
+            self._unlock(handle)
+
+        if self._refresh() and len(self._delta.tombstones) >= self.merge_threshold:
+            self.merge_in_background()
+
+    def rebuild(self, documents):
+        """
+        Replace the snapshot with a full build and clear the delta log
+
+        Args:
+            documents: Iterable of (product_id, name, description)
+        """
+        handle = self._flock()
+        try:
+            analyzed = []
+            for product_id, name, description in documents:
+                terms, length = analyze(name, description)
+                analyzed.append((product_id, terms, length))
+            write_snapshot(self.path, analyzed, delta_offset=0)
+            open(self.delta_path, 'wb').close()
+        finally:
+            self._unlock(handle)
+        self._refresh()
+
+    def merge(self):
+        """Fold the delta log into a new snapshot (blocks delta appends while running)"""
+        handle = self._flock()
+        try:
+            self._refresh_locked()
+            with self._lock:
+                snapshot, delta = self._snapshot, self._delta
+            if snapshot is None:
+                return
+
+            def merged_documents():
+                for product_id, terms, length in snapshot.documents():
+                    if product_id not in delta.tombstones:
+                        yield product_id, terms, length
+                for product_id, (terms, length) in delta.docs.items():
+                    yield product_id, terms, length
+
+            write_snapshot(self.path, merged_documents(), delta_offset=0)
+            open(self.delta_path, 'wb').close()
+        finally:
+            self._unlock(handle)
+        self._refresh()
+
+    def merge_in_background(self):
+        """Start a merge thread unless one is already running in this process"""
+        with self._lock:
+            if self._merging:
+                return
+            self._merging = True
+
+        def run():
+            try:
+                # Only one process merges at a time; others skip
+                probe = self._flock(blocking=False)
+                if probe is None:
+                    return
+                self._unlock(probe)
+                self.merge()
+            finally:
+                with self._lock:
+                    self._merging = False
+
+        threading.Thread(target=run, name='search-index-merge', daemon=True).start()
+
+    # ----- reads -----
+
+    def search(self, query, limit=1000):
+        """
+        Rank products matching every query token with BM25
+
+        The last token is also expanded as a prefix so partially typed
+        words still match.
+
+        Args:
+            query: Search string
+            limit: Maximum number of results
+
+        Returns:
+            list: [(product_id, score)] best first
+        """
+        tokens = tokenize_query(query)
+        if not tokens or not self._refresh():
+            return []
+
+        with self._lock:
+            snapshot, delta = self._snapshot, self._delta
+
+            # Collection statistics over live documents only
+            replaced_lengths = [
+                length for length in map(snapshot.doc_length, delta.tombstones)
+                if length is not None
+            ]
+            n_docs = snapshot.n_docs - len(replaced_lengths) + len(delta.docs)
+            total_length = snapshot.total_length - sum(replaced_lengths) + delta.total_length
+            if n_docs <= 0:
+                return []
+            avg_length = total_length / n_docs
+
+            scores = None
+            for position, token in enumerate(tokens):
+                variants = [token]
+                if position == len(tokens) - 1:
+                    variants += [t for t in snapshot.prefix_terms(token, PREFIX_EXPANSIONS) if t != token]
+                    variants += [t for t in delta.postings if t.startswith(token) and t not in variants]
+
+                token_scores = {}
+                for term in variants:
+                    entries = [
+                        (product_id, tf, length)
+                        for product_id, tf, length in snapshot.postings(term)
+                        if product_id not in delta.tombstones
+                    ]
+                    for product_id, tf in delta.postings.get(term, {}).items():
+                        entries.append((product_id, tf, delta.docs[product_id][1]))
+                    if not entries:
+                        continue
+
+                    df = len(entries)
+                    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                    for product_id, tf, length in entries:
+                        score = idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / avg_length))
+                        token_scores[product_id] = max(token_scores.get(product_id, 0), score)
+
+                if scores is None:
+                    scores = token_scores
+                else:
+                    scores = {
+                        product_id: score + token_scores[product_id]
+                        for product_id, score in scores.items()
+                        if product_id in token_scores
+                    }
+                if not scores:
+                    return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_search_index():
+    """
+    Get the process-wide search index for the current app config
+
+    Returns:
+        SearchIndex: Index bound to SEARCH_INDEX_PATH
+    """
+    path = current_app.config['SEARCH_INDEX_PATH']
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = SearchIndex(
+                path,
+                merge_threshold=current_app.config.get('SEARCH_INDEX_MERGE_THRESHOLD', 500)
+            )
+            _indexes[path] = index
+        return index
+
+
+def rebuild_search_index():
+    """
+    Build a fresh snapshot from all active products
+
+    Returns:
+        int: Number of indexed products
+    """
+    from app import db
+    from app.models.product import Product
+
+    rows = db.session.query(
+        Product.id, Product.name, Product.description
+    ).filter(Product.is_active == True).yield_per(5000)
+
+    index = get_search_index()
+    directory = os.path.dirname(os.path.abspath(index.path))
+    os.makedirs(directory, exist_ok=True)
+
+    documents = list(rows)
+    index.rebuild(documents)
+    return len(documents)
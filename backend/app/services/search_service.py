@@ -0,0 +1,302 @@
+"""
+Search Service
+Full-text product search (Postgres tsvector + GIN, SQLite FTS5)
+"""
+import re
+from flask import current_app
+from sqlalchemy import func, literal_column, table, column, case, false
+from app import db
+
+
+# Text search configuration used by the Postgres expression index.
+# The query must use the exact same expression for the planner to pick the index.
+PG_TS_CONFIG = "'english'::regconfig"
+
+# SQLite FTS5 shadow table kept in sync with `products` by triggers
+SQLITE_FTS_TABLE = 'products_fts'
+
+SQLITE_FTS_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {SQLITE_FTS_TABLE} USING fts5(
+        name, description,
+        content='products', content_rowid='id',
+        tokenize='porter unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+        INSERT INTO {SQLITE_FTS_TABLE}({SQLITE_FTS_TABLE}, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO {SQLITE_FTS_TABLE}(rowid, name, description)
+        VALUES (new.id, new.name, new.description);
+    END
+    """,
+]
+
+SQLITE_FTS_DROP = f'DROP TABLE IF EXISTS {SQLITE_FTS_TABLE}'
+
+PG_FTS_INDEX_DDL = f"""
+    CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (
+        (setweight(to_tsvector({PG_TS_CONFIG}, coalesce(name, '')), 'A') ||
+         setweight(to_tsvector({PG_TS_CONFIG}, coalesce(description, '')), 'B'))
+    )
+"""
+
+# pg_trgm GIN index for typo-tolerant name matching (fuzzy fallback)
+PG_TRGM_DDL = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS ix_products_name_trgm ON products USING GIN (name gin_trgm_ops)',
+]
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# BM25 column weights for SQLite (name, description), mirroring the A/B weights on Postgres
+SQLITE_FTS_WEIGHTS = (10.0, 1.0)
+
+_fts_table = table(SQLITE_FTS_TABLE, column('rowid'))
+
+
+def tokenize_query(query):
+    """
+    Split a user search string into lowercase word tokens
+
+    Args:
+        query: Raw search string
+
+    Returns:
+        list: Word tokens (punctuation and operators stripped)
+    """
+    return _TOKEN_RE.findall(query.lower())
+
+
+def _pg_search_vector(product_model):
+    """Weighted tsvector expression (must match ix_products_search_vector)"""
+    config = literal_column(PG_TS_CONFIG)
+    name_vector = func.setweight(
+        func.to_tsvector(config, func.coalesce(product_model.name, '')),
+        literal_column("'A'")
+    )
+    description_vector = func.setweight(
+        func.to_tsvector(config, func.coalesce(product_model.description, '')),
+        literal_column("'B'")
+    )
+    return name_vector.op('||')(description_vector)
+
+
+def apply_ilike_search(products_query, query):
+    """
+    Legacy substring search (full scan of products)
+
+    Args:
+        products_query: Product query to filter
+        query: Search term
+
+    Returns:
+        Query: Filtered query
+    """
+    from app.models.product import Product
+
+    search_term = f'%{query}%'
+    return products_query.filter(
+        db.or_(
+            Product.name.ilike(search_term),
+            Product.description.ilike(search_term)
+        )
+    )
+
+
+def apply_fts_search(products_query, query):
+    """
+    Full-text search on name and description, ranked by relevance
+
+    Every token is matched as a prefix, so "lap" still finds "laptop"
+    while typing. Name matches rank above description matches.
+
+    Args:
+        products_query: Product query to filter
+        query: Search term
+
+    Returns:
+        Query: Filtered query ordered by relevance
+    """
+    from app.models.product import Product
+
+    tokens = tokenize_query(query)
+    if not tokens:
+        return apply_ilike_search(products_query, query)
+
+    dialect = db.engine.dialect.name
+
+    if dialect == 'postgresql':
+        vector = _pg_search_vector(Product)
+        ts_query = func.to_tsquery(
+            literal_column(PG_TS_CONFIG),
+            ' & '.join(f'{token}:*' for token in tokens)
+        )
+        return products_query.filter(
+            vector.op('@@')(ts_query)
+        ).order_by(
+            func.ts_rank_cd(vector, ts_query).desc()
+        )
+
+    if dialect == 'sqlite':
+        match_expression = ' '.join(f'"{token}"*' for token in tokens)
+        return products_query.join(
+            _fts_table, _fts_table.c.rowid == Product.id
+        ).filter(
+            literal_column(SQLITE_FTS_TABLE).match(match_expression)
+        ).order_by(
+            # bm25() is lower-is-better
+            func.bm25(literal_column(SQLITE_FTS_TABLE), *SQLITE_FTS_WEIGHTS)
+        )
+
+    return apply_ilike_search(products_query, query)
+
+
+def apply_bm25_search(products_query, query):
+    """
+    Search with the in-process BM25 index (see search_index)
+
+    Falls back to the database full-text index until a snapshot
+    has been built with `flask search-index rebuild`.
+
+    Args:
+        products_query: Product query to filter
+        query: Search term
+
+    Returns:
+        Query: Query restricted to matching ids, ordered by BM25 score
+    """
+    from app.services.search_index import get_search_index
+
+    index = get_search_index()
+    if not index.exists():
+        current_app.logger.warning('Search index snapshot missing, using database full-text search')
+        return apply_fts_search(products_query, query)
+
+    ranked = index.search(query, limit=current_app.config.get('SEARCH_INDEX_MAX_CANDIDATES', 1000))
+    return _restrict_to_ranked_ids(products_query, [product_id for product_id, _ in ranked])
+
+
+def _restrict_to_ranked_ids(products_query, ids):
+    """Filter to the given product ids, keeping their order"""
+    from app.models.product import Product
+
+    if not ids:
+        return products_query.filter(false())
+
+    positions = {product_id: position for position, product_id in enumerate(ids)}
+    return products_query.filter(
+        Product.id.in_(ids)
+    ).order_by(
+        case(positions, value=Product.id)
+    )
+
+
+def apply_fuzzy_search(products_query, query, include_ids=()):
+    """
+    Typo-tolerant search on product names using trigram similarity
+
+    Used by Product.search_products when exact matching finds too few
+    products. Postgres uses pg_trgm's word similarity operator backed by
+    ix_products_name_trgm (threshold: pg_trgm.word_similarity_threshold);
+    other databases use the in-process trigram index.
+
+    Args:
+        products_query: Product query to filter
+        query: Search term
+        include_ids: Exact-match product ids to keep, ranked first
+
+    Returns:
+        Query: Filtered query ordered by similarity
+    """
+    from app.models.product import Product
+
+    include_ids = list(include_ids)
+
+    if db.engine.dialect.name == 'postgresql':
+        similar = Product.name.op('%>')(query)
+        condition = db.or_(Product.id.in_(include_ids), similar) if include_ids else similar
+        ordering = [func.word_similarity(query, Product.name).desc()]
+        if include_ids:
+            ordering.insert(0, case((Product.id.in_(include_ids), 0), else_=1))
+        return products_query.filter(condition).order_by(*ordering)
+
+    from app.services.trigram_index import get_trigram_index
+
+    ranked = get_trigram_index().search(
+        query,
+        threshold=current_app.config.get('SEARCH_FUZZY_THRESHOLD', 0.5),
+        limit=current_app.config.get('SEARCH_INDEX_MAX_CANDIDATES', 1000)
+    )
+    seen = set(include_ids)
+    ids = include_ids + [product_id for product_id, _ in ranked if product_id not in seen]
+    return _restrict_to_ranked_ids(products_query, ids)
+
+
+def notify_product_changed(product):
+    """
+    Propagate a committed product write to in-process search structures
+
+    Database full-text indexes maintain themselves; this feeds the BM25
+    delta log when that backend is enabled and this worker's
+    autocomplete and trigram indexes if they have been loaded, and drops
+    its cached listing counts.
+
+    Args:
+        product: Product that was created, updated or deactivated
+    """
+    for name in ('suggest_index', 'trigram_index'):
+        index = current_app.extensions.get(name)
+        if index is not None:
+            index.apply_product(product)
+
+    from app.services.count_service import invalidate_counts
+    invalidate_counts('products')
+
+    if current_app.config.get('SEARCH_BACKEND') == 'bm25':
+        from app.services.search_index import get_search_index
+
+        try:
+            get_search_index().apply_update(product)
+        except OSError as e:
+            current_app.logger.error(f"Search index update failed for product {product.id}: {str(e)}")
+
+
+def apply_text_search(products_query, query):
+    """
+    Apply the configured search backend to a product query
+
+    SEARCH_BACKEND:
+    - fts (default): Postgres tsvector / SQLite FTS5, ranked by relevance
+    - bm25: In-process BM25 index with a shared memory-mapped snapshot
+    - ilike: Legacy substring match
+
+    Args:
+        products_query: Product query to filter
+        query: Search term
+
+    Returns:
+        Query: Filtered (and possibly relevance-ordered) query
+    """
+    backend = current_app.config.get('SEARCH_BACKEND', 'fts')
+
+    if backend == 'fts':
+        return apply_fts_search(products_query, query)
+
+    if backend == 'bm25':
+        return apply_bm25_search(products_query, query)
+
+    return apply_ilike_search(products_query, query)
@@ -0,0 +1,332 @@
+"""
+Suggest Index
+In-memory prefix index for search-as-you-type completions
+
+Every active product name and category name is indexed under each of its
+word suffixes ("samsung galaxy s23", "galaxy s23", "s23") so typing any
+word of a name finds it. Keys live in one sorted list and a prefix lookup
+is a bisect into that list. The top completions for short prefixes (the
+ones that match the most keys) are precomputed and kept up to date on
+every change, so a lookup never scans more than a handful of entries.
+
+Each worker process holds its own index. Writes from this process are
+applied immediately (see search_service.notify_product_changed); writes
+from other workers are picked up by an incremental sync on `updated_at`
+at most every SUGGEST_INDEX_REFRESH_SECONDS.
+"""
+import heapq
+import threading
+import time
+from bisect import bisect_left, insort
+
+from flask import current_app
+from app.services.search_service import tokenize_query
+
+
+# Prefixes up to this many characters get a precomputed top-k list
+CACHED_PREFIX_LENGTH = 3
+
+# Size of each precomputed list (upper bound for `limit`)
+MAX_SUGGESTIONS = 10
+
+# Upper bound on any key so very long names don't bloat the index
+MAX_KEY_LENGTH = 64
+
+
+def normalize(text):
+    """
+    Normalize text for prefix matching
+
+    Args:
+        text: Raw product/category name or user input
+
+    Returns:
+        str: Lowercased words joined by single spaces
+    """
+    return ' '.join(tokenize_query(text or ''))
+
+
+def _suffix_keys(text):
+    """Keys for every word suffix of a normalized name"""
+    words = text.split(' ')
+    keys = set()
+    for position in range(len(words)):
+        key = ' '.join(words[position:])[:MAX_KEY_LENGTH]
+        if key:
+            keys.add(key)
+    return keys
+
+
+class PrefixIndex:
+    """
+    Sorted-key prefix index with popularity-ranked completions
+
+    Entries are identified by (kind, id) where kind is 'product' or
+    'category'. Writes are serialized; cached short-prefix reads are
+    lock-free because top lists are replaced, never mutated in place.
+    """
+
+    def __init__(self):
+        self._keys = []     # sorted (key, kind, id)
+        self._entries = {}  # (kind, id) -> (text, popularity, keys)
+        self._top = {}      # short prefix -> [(kind, id), ...] best first
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _rank(self, ref):
+        """Sort key: most popular first, then shorter, then alphabetical"""
+        text, popularity, _ = self._entries[ref]
+        return (-popularity, len(text), text.lower(), ref)
+
+    def _scan(self, prefix):
+        """Yield distinct entry refs whose keys start with prefix"""
+        seen = set()
+        position = bisect_left(self._keys, (prefix,))
+        while position < len(self._keys):
+            key, kind, entry_id = self._keys[position]
+            if not key.startswith(prefix):
+                break
+            ref = (kind, entry_id)
+            if ref not in seen:
+                seen.add(ref)
+                yield ref
+            position += 1
+
+    def _recompute_top(self, prefix):
+        top = heapq.nsmallest(MAX_SUGGESTIONS, self._scan(prefix), key=self._rank)
+        if top:
+            self._top[prefix] = top
+        else:
+            self._top.pop(prefix, None)
+
+    @staticmethod
+    def _cached_prefixes(keys):
+        prefixes = set()
+        for key in keys:
+            for length in range(1, min(len(key), CACHED_PREFIX_LENGTH) + 1):
+                prefixes.add(key[:length])
+        return prefixes
+
+    def _remove(self, ref):
+        """Drop an entry's keys; returns the cached prefixes it touched"""
+        entry = self._entries.pop(ref, None)
+        if entry is None:
+            return set()
+
+        kind, entry_id = ref
+        for key in entry[2]:
+            position = bisect_left(self._keys, (key, kind, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, kind, entry_id):
+                del self._keys[position]
+        return self._cached_prefixes(entry[2])
+
+    def upsert(self, kind, entry_id, text, popularity=0):
+        """
+        Add or replace an entry
+
+        Args:
+            kind: 'product' or 'category'
+            entry_id: Row ID
+            text: Display text (product or category name)
+            popularity: Ranking weight (higher first)
+        """
+        ref = (kind, entry_id)
+        keys = _suffix_keys(normalize(text))
+
+        with self._lock:
+            stale_prefixes = self._remove(ref)
+            if not keys:
+                for prefix in stale_prefixes:
+                    self._recompute_top(prefix)
+                return
+
+            self._entries[ref] = (text, popularity, keys)
+            for key in keys:
+                insort(self._keys, (key, kind, entry_id))
+
+            new_prefixes = self._cached_prefixes(keys)
+
+            # Prefixes the entry left (renamed) or where it may have dropped in rank
+            for prefix in stale_prefixes:
+                self._recompute_top(prefix)
+
+            # Prefixes it joined: merge into the existing top list
+            for prefix in new_prefixes - stale_prefixes:
+                top = [r for r in self._top.get(prefix, []) if r != ref]
+                top.append(ref)
+                top.sort(key=self._rank)
+                self._top[prefix] = top[:MAX_SUGGESTIONS]
+
+    def remove(self, kind, entry_id):
+        """
+        Remove an entry if present
+
+        Args:
+            kind: 'product' or 'category'
+            entry_id: Row ID
+        """
+        with self._lock:
+            for prefix in self._remove((kind, entry_id)):
+                self._recompute_top(prefix)
+
+    def suggest(self, prefix, limit=MAX_SUGGESTIONS):
+        """
+        Top completions for a prefix
+
+        Args:
+            prefix: User input (normalized before matching)
+            limit: Maximum completions (capped at MAX_SUGGESTIONS)
+
+        Returns:
+            list: [{'type', 'id', 'text'}, ...] most popular first
+        """
+        prefix = normalize(prefix)[:MAX_KEY_LENGTH]
+        if not prefix:
+            return []
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        if len(prefix) <= CACHED_PREFIX_LENGTH:
+            refs = self._top.get(prefix, [])[:limit]
+        else:
+            with self._lock:
+                refs = heapq.nsmallest(limit, self._scan(prefix), key=self._rank)
+
+        suggestions = []
+        for kind, entry_id in refs:
+            entry = self._entries.get((kind, entry_id))
+            if entry is not None:
+                suggestions.append({'type': kind, 'id': entry_id, 'text': entry[0]})
+        return suggestions
+
+
+class IncrementalSync:
+    """
+    Mixin for per-worker catalog indexes kept in sync with the database
+
+    Subclasses implement `_load(since)`, which applies rows changed since
+    the `updated_at` high-water mark (everything when None) and returns
+    the new high-water mark.
+    """
+
+    def _init_sync(self, refresh_seconds):
+        self.refresh_seconds = refresh_seconds
+        self._synced_at = None       # updated_at high-water mark
+        self._checked_at = 0.0       # monotonic time of last sync
+        self._sync_lock = threading.Lock()
+
+    @property
+    def loaded(self):
+        """Whether the initial full load has happened"""
+        return self._synced_at is not None
+
+    def sync(self, force=False):
+        """
+        Bring the index up to date with the database
+
+        The first call loads the whole catalog; later calls only read rows
+        whose updated_at moved, and only once per refresh interval.
+
+        Args:
+            force: Sync even if the refresh interval has not elapsed
+        """
+        now = time.monotonic()
+        if not force and self.loaded and now - self._checked_at < self.refresh_seconds:
+            return
+
+        if not self._sync_lock.acquire(blocking=not self.loaded):
+            return  # Another thread is already syncing; serve what we have
+        try:
+            self._synced_at = self._load(since=self._synced_at) or self._synced_at
+            self._checked_at = now
+        finally:
+            self._sync_lock.release()
+
+
+class SuggestIndex(PrefixIndex, IncrementalSync):
+    """
+    Prefix index over the catalog with incremental database sync
+    """
+
+    def __init__(self, refresh_seconds=30):
+        super().__init__()
+        self._init_sync(refresh_seconds)
+
+    def _load(self, since=None):
+        """
+        Apply products and categories changed since `since` (all if None)
+
+        Product popularity is units sold. Category popularity is the sum
+        over its products and is only recomputed on a full load.
+
+        Returns:
+            datetime: Highest updated_at seen (new sync high-water mark)
+        """
+        from sqlalchemy import func
+        from app import db
+        from app.models.product import Product
+        from app.models.category import Category
+
+        products = db.session.query(
+            Product.id, Product.name, Product.is_active, Product.updated_at, Product.units_sold
+        )
+        categories = db.session.query(Category.id, Category.name, Category.updated_at)
+
+        if since is None:
+            products = products.filter(Product.is_active == True)
+            category_popularity = dict(db.session.query(
+                Product.category_id, func.sum(Product.units_sold)
+            ).filter(Product.is_active == True).group_by(Product.category_id).all())
+        else:
+            products = products.filter(Product.updated_at >= since)
+            categories = categories.filter(Category.updated_at >= since)
+            category_popularity = {
+                entry_id: entry[1] for (kind, entry_id), entry in self._entries.items()
+                if kind == 'category'
+            }
+
+        high_water = since
+        for product_id, name, is_active, updated_at, units in products:
+            if is_active:
+                self.upsert('product', product_id, name, int(units))
+            else:
+                self.remove('product', product_id)
+            high_water = max(high_water or updated_at, updated_at)
+
+        for category_id, name, updated_at in categories:
+            self.upsert('category', category_id, name, int(category_popularity.get(category_id) or 0))
+            high_water = max(high_water or updated_at, updated_at)
+
+        return high_water
+
+    def apply_product(self, product):
+        """
+        Reflect a committed product write in this worker immediately
+
+        Args:
+            product: Product that was created, updated or deactivated
+        """
+        if not self.loaded:
+            return  # Not loaded yet; the first sync will include it
+        if product.is_active:
+            self.upsert('product', product.id, product.name, product.units_sold or 0)
+        else:
+            self.remove('product', product.id)
+
+
+def get_suggest_index():
+    """
+    Get this worker's suggest index for the current app, synced if due
+
+    Returns:
+        SuggestIndex: Prefix index over active products and categories
+    """
+    index = current_app.extensions.get('suggest_index')
+    if index is None:
+        index = current_app.extensions.setdefault(
+            'suggest_index',
+            SuggestIndex(refresh_seconds=current_app.config.get('SUGGEST_INDEX_REFRESH_SECONDS', 30))
+        )
+    index.sync()
+    return index
@@ -0,0 +1,199 @@
+"""
+Trigram Index
+In-process typo-tolerant product name matching
+
+Postgres answers fuzzy searches with pg_trgm and a GIN index on
+products.name (see search_service.apply_fuzzy_search). SQLite has no
+trigram support, so each worker keeps this inverted index from trigram to
+product ids instead, synced with the database the same way as the
+autocomplete index.
+
+Trigrams follow pg_trgm: each word is lowercased and padded with two
+spaces in front and one behind, so "dell" -> "  d", " de", "del", "ell", "ll ".
+"""
+import threading
+from collections import Counter
+
+from flask import current_app
+from app.services.search_service import tokenize_query
+from app.services.suggest_index import IncrementalSync
+
+
+def word_trigrams(word):
+    """
+    Trigrams of a single word, padded like pg_trgm
+
+    Args:
+        word: Lowercase word
+
+    Returns:
+        set: Trigram strings
+    """
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def text_trigrams(text):
+    """
+    Trigrams of every word in a string
+
+    Args:
+        text: Product name or search query
+
+    Returns:
+        set: Trigram strings
+    """
+    trigrams = set()
+    for token in tokenize_query(text or ''):
+        trigrams |= word_trigrams(token)
+    return trigrams
+
+
+class TrigramIndex:
+    """
+    Inverted index from trigram to product ids
+
+    The score of a product is the fraction of the query's trigrams found in
+    its name, which like pg_trgm's word_similarity does not penalize long
+    names for words the user did not type.
+    """
+
+    def __init__(self):
+        self._postings = {}  # trigram -> set of product ids
+        self._docs = {}      # product id -> frozenset of trigrams
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def _remove(self, product_id):
+        for trigram in self._docs.pop(product_id, ()):
+            ids = self._postings.get(trigram)
+            if ids is not None:
+                ids.discard(product_id)
+                if not ids:
+                    del self._postings[trigram]
+
+    def upsert(self, product_id, name):
+        """
+        Add or replace a product name
+
+        Args:
+            product_id: Product ID
+            name: Product name
+        """
+        trigrams = frozenset(text_trigrams(name))
+        with self._lock:
+            self._remove(product_id)
+            if trigrams:
+                self._docs[product_id] = trigrams
+                for trigram in trigrams:
+                    self._postings.setdefault(trigram, set()).add(product_id)
+
+    def remove(self, product_id):
+        """
+        Remove a product if present
+
+        Args:
+            product_id: Product ID
+        """
+        with self._lock:
+            self._remove(product_id)
+
+    def search(self, query, threshold=0.5, limit=1000):
+        """
+        Products whose names are similar to the query
+
+        Args:
+            query: Search term (possibly misspelled)
+            threshold: Minimum share of query trigrams a name must contain
+            limit: Maximum results
+
+        Returns:
+            list: [(product_id, score), ...] best first
+        """
+        query_trigrams = text_trigrams(query)
+        if not query_trigrams:
+            return []
+
+        hits = Counter()
+        with self._lock:
+            for trigram in query_trigrams:
+                hits.update(self._postings.get(trigram, ()))
+            sizes = {product_id: len(self._docs[product_id]) for product_id in hits}
+
+        needed = threshold * len(query_trigrams)
+        ranked = [
+            (product_id, count / len(query_trigrams))
+            for product_id, count in hits.items()
+            if count >= needed
+        ]
+        # Equal scores: the name closest in length to the query wins
+        ranked.sort(key=lambda item: (-item[1], sizes[item[0]], item[0]))
+        return ranked[:limit]
+
+
+class CatalogTrigramIndex(TrigramIndex, IncrementalSync):
+    """
+    Trigram index over active product names with incremental database sync
+    """
+
+    def __init__(self, refresh_seconds=30):
+        super().__init__()
+        self._init_sync(refresh_seconds)
+
+    def _load(self, since=None):
+        """
+        Apply products changed since `since` (all active products if None)
+
+        Returns:
+            datetime: Highest updated_at seen (new sync high-water mark)
+        """
+        from app import db
+        from app.models.product import Product
+
+        products = db.session.query(Product.id, Product.name, Product.is_active, Product.updated_at)
+        if since is None:
+            products = products.filter(Product.is_active == True)
+        else:
+            products = products.filter(Product.updated_at >= since)
+
+        high_water = since
+        for product_id, name, is_active, updated_at in products.yield_per(5000):
+            if is_active:
+                self.upsert(product_id, name)
+            else:
+                self.remove(product_id)
+            high_water = max(high_water or updated_at, updated_at)
+        return high_water
+
+    def apply_product(self, product):
+        """
+        Reflect a committed product write in this worker immediately
+
+        Args:
+            product: Product that was created, updated or deactivated
+        """
+        if not self.loaded:
+            return  # Not loaded yet; the first sync will include it
+        if product.is_active:
+            self.upsert(product.id, product.name)
+        else:
+            self.remove(product.id)
+
+
+def get_trigram_index():
+    """
+    Get this worker's trigram index for the current app, synced if due
+
+    Returns:
+        CatalogTrigramIndex: Trigram index over active product names
+    """
+    index = current_app.extensions.get('trigram_index')
+    if index is None:
+        index = current_app.extensions.setdefault(
+            'trigram_index',
+            CatalogTrigramIndex(refresh_seconds=current_app.config.get('SUGGEST_INDEX_REFRESH_SECONDS', 30))
+        )
+    index.sync()
+    return index
@@ -55,7 +55,7 @@ def get_order_confirmation_template(customer_name, order):
         for item in suborder.items:
             items_html += f"""
             <tr>
-                <td style="padding: 10px; border-bottom: 1px solid #e5e7eb;">{item.product.name}</td>
+                <td style="padding: 10px; border-bottom: 1px solid #e5e7eb;">{item.product_name}</td>
                 <td style="padding: 10px; border-bottom: 1px solid #e5e7eb; text-align: center;">{item.quantity}</td>
                 <td style="padding: 10px; border-bottom: 1px solid #e5e7eb; text-align: right;">KES {float(item.price_at_purchase):,.2f}</td>
                 <td style="padding: 10px; border-bottom: 1px solid #e5e7eb; text-align: right;">KES {item.get_subtotal():,.2f}</td>
@@ -0,0 +1,168 @@
+"""
+Idempotency Keys
+Safe retries for endpoints that create orders or charge customers
+
+Clients send a unique Idempotency-Key header (e.g. a UUID per checkout
+attempt) and reuse it when retrying after a timeout or dropped connection.
+The first request with a key claims it inside its own transaction, so the
+claim commits together with the work it guards; the response is then
+stored under the key for IDEMPOTENCY_KEY_TTL seconds. Retries are answered
+from that row with one indexed lookup and never run the endpoint again:
+
+- same key, response stored: the stored response, with Idempotent-Replayed: true
+- same key, still processing: 409 IDEMPOTENCY_KEY_IN_PROGRESS
+- same key, different body: 422 IDEMPOTENCY_KEY_REUSED
+
+Server errors (5xx) are not stored, so the request can be retried.
+"""
+import hashlib
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity, verify_jwt_in_request
+
+
+# Request header carrying the key
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+
+MAX_KEY_LENGTH = 255
+
+
+def _error(code, message, status):
+    return jsonify({
+        'success': False,
+        'error': {
+            'code': code,
+            'message': message
+        }
+    }), status
+
+
+def _replay(record, request_hash):
+    """Answer a request whose key is already taken"""
+    if record.request_hash != request_hash:
+        return _error(
+            'IDEMPOTENCY_KEY_REUSED',
+            'This Idempotency-Key was already used for a different request',
+            422
+        )
+    if record.status_code is None:
+        return _error(
+            'IDEMPOTENCY_KEY_IN_PROGRESS',
+            'A request with this Idempotency-Key is still being processed',
+            409
+        )
+
+    response = current_app.response_class(record.response_body, status=record.status_code, mimetype='application/json')
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(fn):
+    """
+    Decorator making a JWT-authenticated POST endpoint idempotent per user
+
+    Put it above the authentication decorator so replays skip the user
+    lookup as well. Requests without an Idempotency-Key run normally.
+
+    Usage:
+        @bp.route('', methods=['POST'])
+        @idempotent
+        @login_required
+        def create_order(current_user):
+            ...
+    """
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return fn(*args, **kwargs)
+
+        if len(key) > MAX_KEY_LENGTH:
+            return _error('INVALID_IDEMPOTENCY_KEY', f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters', 400)
+
+        from app import db
+        from app.models.idempotency_key import IdempotencyKey
+        from app.utils.upsert import dialect_insert
+
+        verify_jwt_in_request()
+        user_id = int(get_jwt_identity())
+        endpoint = request.endpoint
+        request_hash = hashlib.sha256(request.get_data()).hexdigest()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=current_app.config.get('IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+        # Replays: one lookup on the unique index
+        record = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).first()
+        if record and record.expires_at > now:
+            return _replay(record, request_hash)
+
+        # Claim the key in the transaction the endpoint commits. A concurrent
+        # request with the same key waits on the unique index and then
+        # finds the key taken; an expired key is taken over.
+        table = IdempotencyKey.__table__
+        statement = dialect_insert(table).values(
+            user_id=user_id, endpoint=endpoint, key=key, request_hash=request_hash,
+            status_code=None, response_body=None, created_at=now, expires_at=expires_at
+        )
+        claimed = db.session.execute(
+            statement.on_conflict_do_update(
+                index_elements=['user_id', 'endpoint', 'key'],
+                set_={
+                    'request_hash': statement.excluded.request_hash,
+                    'status_code': None,
+                    'response_body': None,
+                    'created_at': statement.excluded.created_at,
+                    'expires_at': statement.excluded.expires_at
+                },
+                where=table.c.expires_at <= now
+            ).returning(table.c.id)
+        ).first()
+
+        if claimed is None:
+            db.session.rollback()
+            record = IdempotencyKey.query.filter_by(user_id=user_id, endpoint=endpoint, key=key).first()
+            return _replay(record, request_hash)
+
+        response = make_response(fn(*args, **kwargs))
+
+        # Store the outcome (re-inserting the claim if the endpoint rolled it back)
+        if response.status_code >= 500:
+            db.session.rollback()
+            IdempotencyKey.query.filter_by(
+                user_id=user_id, endpoint=endpoint, key=key, status_code=None
+            ).delete(synchronize_session=False)
+        else:
+            body = response.get_data(as_text=True)
+            db.session.execute(
+                statement.values(status_code=response.status_code, response_body=body).on_conflict_do_update(
+                    index_elements=['user_id', 'endpoint', 'key'],
+                    set_={'status_code': response.status_code, 'response_body': body}
+                )
+            )
+        db.session.commit()
+
+        return response
+
+    return wrapper
+
+
+def purge_expired_idempotency_keys(now=None):
+    """
+    Delete keys past their TTL
+
+    Args:
+        now: Current time (default: utcnow)
+
+    Returns:
+        int: Number of keys deleted
+    """
+    from app import db
+    from app.models.idempotency_key import IdempotencyKey
+
+    deleted = IdempotencyKey.query.filter(
+        IdempotencyKey.expires_at <= (now or datetime.utcnow())
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
@@ -0,0 +1,256 @@
+"""
+Pagination Utilities
+Keyset (cursor) pagination shared by list endpoints
+
+A cursor is the sort key of the last row on a page, e.g. (created_at, id),
+encoded as an opaque URL-safe string. The next page is fetched with
+
+    WHERE (created_at, id) < (:created_at, :id)
+    ORDER BY created_at DESC, id DESC
+    LIMIT :limit + 1
+
+so page N is the same index range scan as page 1 instead of an OFFSET that
+reads and discards every earlier row. Totals are only counted on request.
+"""
+import base64
+import json
+from datetime import datetime, date
+from decimal import Decimal
+
+from flask import request
+from sqlalchemy import and_, or_, tuple_
+from sqlalchemy.sql import operators
+from sqlalchemy.sql.elements import UnaryExpression
+
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a cursor cannot be decoded or does not fit the listing"""
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {'dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'d': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'dec': str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if set(value) == {'dt'}:
+            return datetime.fromisoformat(value['dt'])
+        if set(value) == {'d'}:
+            return date.fromisoformat(value['d'])
+        if set(value) == {'dec'}:
+            return Decimal(value['dec'])
+        raise ValueError('Unknown cursor value')
+    if value is None or isinstance(value, list):
+        raise ValueError('Unsupported cursor value')
+    return value
+
+
+def _check_type(value, column):
+    """Raise ValueError unless a decoded value fits the sort column's type"""
+    try:
+        expected = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return  # Untyped expression: any scalar will do
+
+    if expected is datetime:
+        valid = isinstance(value, datetime)
+    elif expected is date:
+        valid = isinstance(value, date) and not isinstance(value, datetime)
+    elif expected in (Decimal, float):
+        valid = isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+    elif expected is int:
+        valid = isinstance(value, int) and not isinstance(value, bool)
+    elif expected in (bool, str):
+        valid = isinstance(value, expected)
+    else:
+        valid = isinstance(value, (str, int, float))
+    if not valid:
+        raise ValueError(f'Cursor value does not match {column}')
+
+
+def encode_cursor(values):
+    """
+    Encode a sort key as an opaque cursor string
+
+    Args:
+        values: Sort key values of the last row on a page
+
+    Returns:
+        str: URL-safe cursor
+    """
+    payload = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size, columns=None):
+    """
+    Decode a cursor produced by encode_cursor
+
+    Args:
+        cursor: Cursor string from the client
+        size: Number of sort key values the listing expects
+        columns: Sort columns, to check each value's type (optional)
+
+    Returns:
+        list: Sort key values
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or does not fit the columns
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError('Wrong number of cursor values')
+        values = [_decode_value(value) for value in values]
+        for value, column in zip(values, columns or ()):
+            _check_type(value, column)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError('Invalid cursor') from e
+
+    return values
+
+
+def _sort_key(clause):
+    """Split an ORDER BY clause into (column, descending)"""
+    if isinstance(clause, UnaryExpression) and clause.modifier in (operators.desc_op, operators.asc_op):
+        return clause.element, clause.modifier is operators.desc_op
+    return clause, False
+
+
+def _after(keys, values):
+    """Condition selecting rows that sort after the given key values"""
+    directions = {descending for _, descending in keys}
+
+    if len(directions) == 1:
+        # Row-value comparison: a single index range on Postgres and SQLite
+        columns = tuple_(*[column for column, _ in keys])
+        bound = tuple_(*values)
+        return columns < bound if directions.pop() else columns > bound
+
+    # Mixed directions: (a > :a) OR (a = :a AND b < :b) OR ...
+    conditions = []
+    for position, (column, descending) in enumerate(keys):
+        equal_prefix = [keys[i][0] == values[i] for i in range(position)]
+        beyond = column < values[position] if descending else column > values[position]
+        conditions.append(and_(*equal_prefix, beyond))
+    return or_(*conditions)
+
+
+class CursorPage:
+    """
+    One page of a keyset-paginated listing
+    """
+
+    def __init__(self, items, limit, next_cursor=None, total=None, total_approximate=False):
+        self.items = items
+        self.limit = limit
+        self.next_cursor = next_cursor
+        self.total = total
+        self.total_approximate = total_approximate
+
+    @property
+    def has_next(self):
+        """Whether another page follows"""
+        return self.next_cursor is not None
+
+    def to_dict(self):
+        """Pagination block for API responses"""
+        pagination = {
+            'limit': self.limit,
+            'has_next': self.has_next,
+            'next_cursor': self.next_cursor
+        }
+        if self.total is not None:
+            pagination['total_items'] = self.total
+            pagination['total_approximate'] = self.total_approximate
+        return pagination
+
+
+def keyset_paginate(query, order_by, cursor=None, limit=DEFAULT_LIMIT, include_total=False, key=None):
+    """
+    Fetch one page of a query ordered by a unique sort key
+
+    The last ORDER BY clause must make the key unique (normally the
+    primary key) and none of the columns may be NULL.
+
+    Args:
+        query: Filtered query (any existing ORDER BY is replaced)
+        order_by: ORDER BY clauses, e.g. [Model.created_at.desc(), Model.id.desc()]
+        cursor: Cursor from the previous page's next_cursor (None for page 1)
+        limit: Page size (None: every row, no next cursor)
+        include_total: Also count all rows matching the query
+        key: Function returning the sort key values for a result row
+            (defaults to reading the ORDER BY columns off the entity)
+
+    Returns:
+        CursorPage: Items, next cursor and optional total
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed
+    """
+    keys = [_sort_key(clause) for clause in order_by]
+    page_query = query.order_by(None).order_by(*order_by)
+
+    if cursor:
+        values = decode_cursor(cursor, len(keys), [column for column, _ in keys])
+        page_query = page_query.filter(_after(keys, values))
+
+    if limit is None:
+        rows = page_query.all()
+    else:
+        rows = page_query.limit(limit + 1).all()
+
+    next_cursor = None
+    if limit is not None and len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        values = key(last) if key else [getattr(last, column.key) for column, _ in keys]
+        next_cursor = encode_cursor(values)
+
+    total = query.order_by(None).count() if include_total else None
+    return CursorPage(rows, limit, next_cursor=next_cursor, total=total)
+
+
+def get_cursor_args(default_limit=DEFAULT_LIMIT, max_limit=MAX_LIMIT, include_total=False):
+    """
+    Read cursor pagination parameters from the current request
+
+    Query Parameters:
+    - cursor: next_cursor from the previous page
+    - limit (or per_page): Page size (capped at max_limit)
+    - include_total: true/false, count all matching rows
+
+    Args:
+        default_limit: Page size when none is given (None: return every row
+            unless the client asks for a page with limit or cursor)
+        max_limit: Largest page size allowed
+        include_total: Default for include_total
+
+    Returns:
+        dict: cursor, limit and include_total keyword arguments for keyset_paginate
+    """
+    cursor = request.args.get('cursor') or None
+    limit = request.args.get('limit', type=int) or request.args.get('per_page', type=int)
+    total_arg = request.args.get('include_total')
+
+    if limit is None and not cursor:
+        limit = default_limit
+    elif limit is None:
+        limit = default_limit or DEFAULT_LIMIT
+
+    return {
+        'cursor': cursor,
+        'limit': None if limit is None else max(1, min(limit, max_limit)),
+        'include_total': include_total if total_arg is None else total_arg.lower() == 'true'
+    }
@@ -0,0 +1,25 @@
+"""
+Upsert Helpers
+INSERT ... ON CONFLICT for the configured database
+"""
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def dialect_insert(table):
+    """
+    INSERT construct with on_conflict_do_update/on_conflict_do_nothing
+
+    PostgreSQL and SQLite (3.24+) share the ON CONFLICT syntax but
+    SQLAlchemy exposes it per dialect.
+
+    Args:
+        table: Table or model to insert into
+
+    Returns:
+        Insert: Dialect-specific insert statement
+    """
+    from app import db
+
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return postgresql.insert(table)
+    return sqlite.insert(table)
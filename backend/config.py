@@ -35,6 +35,7 @@ class Config:
     MPESA_SHORTCODE = os.getenv('MPESA_SHORTCODE')
     MPESA_PASSKEY = os.getenv('MPESA_PASSKEY')
     MPESA_CALLBACK_URL = os.getenv('MPESA_CALLBACK_URL')
+    MPESA_TIMEOUT = int(os.getenv('MPESA_TIMEOUT', 10))  # Seconds per Daraja API request
     
     # Email
     MAIL_SERVER = os.getenv('MAIL_SERVER', 'smtp.gmail.com')
@@ -56,6 +57,39 @@ class Config:
     COMMISSION_RATE = float(os.getenv('COMMISSION_RATE', 0.25))
     PICKUP_WINDOW_DAYS = int(os.getenv('PICKUP_WINDOW_DAYS', 5))
     
+    # Product Search
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'fts')  # 'fts' (full-text index), 'bm25' (in-process) or 'ilike'
+    SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', 'search_index/products.idx')
+    SEARCH_INDEX_MERGE_THRESHOLD = int(os.getenv('SEARCH_INDEX_MERGE_THRESHOLD', 500))  # Delta docs before background merge
+    SEARCH_INDEX_MAX_CANDIDATES = 1000
+    SUGGEST_INDEX_REFRESH_SECONDS = int(os.getenv('SUGGEST_INDEX_REFRESH_SECONDS', 30))  # Autocomplete/trigram index sync interval
+    SEARCH_FUZZY_MIN_RESULTS = int(os.getenv('SEARCH_FUZZY_MIN_RESULTS', 3))  # Fewer exact hits -> fuzzy fallback (0 disables)
+    SEARCH_FUZZY_THRESHOLD = float(os.getenv('SEARCH_FUZZY_THRESHOLD', 0.5))  # In-process trigram index only
+    COUNT_EXACT_THRESHOLD = int(os.getenv('COUNT_EXACT_THRESHOLD', 1000))  # Larger unfiltered listings get a planner estimate (Postgres)
+    COUNT_CACHE_TTL = int(os.getenv('COUNT_CACHE_TTL', 30))  # Seconds a listing total is reused per filter combination
+    COUNT_CACHE_MAX_ENTRIES = int(os.getenv('COUNT_CACHE_MAX_ENTRIES', 1024))  # Cached totals kept per worker
+    PRICE_FACET_BOUNDARIES = [int(x) for x in os.getenv('PRICE_FACET_BOUNDARIES', '500,1000,5000,10000,50000').split(',') if x]  # KES
+    
+    # Guest Carts
+    GUEST_CART_STORE = os.getenv('GUEST_CART_STORE', 'memory')  # memory (per worker) or sqlite (shared file)
+    GUEST_CART_STORE_PATH = os.getenv('GUEST_CART_STORE_PATH', 'guest_carts/carts.db')
+    GUEST_CART_TTL = int(os.getenv('GUEST_CART_TTL', 7 * 24 * 3600))  # Seconds since last change
+    GUEST_CART_MAX_ENTRIES = int(os.getenv('GUEST_CART_MAX_ENTRIES', 100000))  # Memory store LRU size
+    
+    # Checkout
+    CHECKOUT_QUOTE_TTL = int(os.getenv('CHECKOUT_QUOTE_TTL', 300))  # Seconds quoted prices are honored
+    STOCK_RESERVATION_MINUTES = int(os.getenv('STOCK_RESERVATION_MINUTES', 15))  # Unpaid M-Pesa orders hold stock this long
+    RESERVATION_SWEEP_BATCH = int(os.getenv('RESERVATION_SWEEP_BATCH', 500))  # Expired orders released per transaction
+    
+    # Outbox (STK push and emails sent after checkout commits)
+    OUTBOX_BATCH_SIZE = int(os.getenv('OUTBOX_BATCH_SIZE', 50))  # Messages claimed per poll
+    OUTBOX_LEASE_SECONDS = int(os.getenv('OUTBOX_LEASE_SECONDS', 60))  # Claimed messages are retried after this if a worker dies
+    OUTBOX_RETRY_SECONDS = int(os.getenv('OUTBOX_RETRY_SECONDS', 30))  # First retry delay, doubled per attempt (max 1 hour)
+    OUTBOX_MAX_ATTEMPTS = int(os.getenv('OUTBOX_MAX_ATTEMPTS', 5))
+    
+    # Idempotency Keys
+    IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 24 * 3600))  # Seconds a stored response is replayed
+    
     # File Upload
     MAX_CONTENT_LENGTH = 5 * 1024 * 1024  # 5MB max file size
     ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
@@ -0,0 +1,75 @@
+"""Add full-text search index for products
+
+Revision ID: a3c1f7e2d9b4
+Revises: 6d47d5bbf895
+Create Date: 2026-10-17 09:12:44.318201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3c1f7e2d9b4'
+down_revision = '6d47d5bbf895'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # Expression index over the weighted tsvector (name = A, description = B).
+        # Kept current by Postgres itself on every insert/update.
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS ix_products_search_vector ON products USING GIN (
+                (setweight(to_tsvector('english'::regconfig, coalesce(name, '')), 'A') ||
+                 setweight(to_tsvector('english'::regconfig, coalesce(description, '')), 'B'))
+            )
+        """)
+
+    elif dialect == 'sqlite':
+        # External-content FTS5 table synced from `products` by triggers
+        op.execute("""
+            CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+                name, description,
+                content='products', content_rowid='id',
+                tokenize='porter unicode61 remove_diacritics 2'
+            )
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_ai AFTER INSERT ON products BEGIN
+                INSERT INTO products_fts(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_ad AFTER DELETE ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+            END
+        """)
+        op.execute("""
+            CREATE TRIGGER IF NOT EXISTS products_fts_au AFTER UPDATE OF name, description ON products BEGIN
+                INSERT INTO products_fts(products_fts, rowid, name, description)
+                VALUES ('delete', old.id, old.name, old.description);
+                INSERT INTO products_fts(rowid, name, description)
+                VALUES (new.id, new.name, new.description);
+            END
+        """)
+        # Backfill existing products
+        op.execute("INSERT INTO products_fts(products_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_search_vector')
+
+    elif dialect == 'sqlite':
+        op.execute('DROP TRIGGER IF EXISTS products_fts_au')
+        op.execute('DROP TRIGGER IF EXISTS products_fts_ad')
+        op.execute('DROP TRIGGER IF EXISTS products_fts_ai')
+        op.execute('DROP TABLE IF EXISTS products_fts')
@@ -0,0 +1,33 @@
+"""Snapshot product name and image on order items
+
+Revision ID: c1e7a3f9d5b2
+Revises: b9d2f6a8c4e1
+Create Date: 2026-10-17 19:42:16.583019
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e7a3f9d5b2'
+down_revision = 'b9d2f6a8c4e1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('order_items', sa.Column('product_name', sa.String(length=200), nullable=False, server_default=''))
+    op.add_column('order_items', sa.Column('product_image_url', sa.String(length=500), nullable=True))
+
+    # Backfill existing items from their products as they are now
+    op.execute("""
+        UPDATE order_items SET
+            product_name = COALESCE((SELECT name FROM products WHERE products.id = order_items.product_id), ''),
+            product_image_url = (SELECT image_url FROM products WHERE products.id = order_items.product_id)
+    """)
+
+
+def downgrade():
+    op.drop_column('order_items', 'product_image_url')
+    op.drop_column('order_items', 'product_name')
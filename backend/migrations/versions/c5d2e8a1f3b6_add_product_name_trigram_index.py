@@ -0,0 +1,31 @@
+"""Add trigram index on product names for fuzzy search
+
+Revision ID: c5d2e8a1f3b6
+Revises: a3c1f7e2d9b4
+Create Date: 2026-10-17 11:03:27.540918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d2e8a1f3b6'
+down_revision = 'a3c1f7e2d9b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # SQLite has no trigram support; the app keeps an in-process trigram index instead
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        op.execute(
+            'CREATE INDEX IF NOT EXISTS ix_products_name_trgm '
+            'ON products USING GIN (name gin_trgm_ops)'
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS ix_products_name_trgm')
@@ -0,0 +1,25 @@
+"""Index suborders by master order and status
+
+Revision ID: d6b3f8a2e4c7
+Revises: c1e7a3f9d5b2
+Create Date: 2026-10-17 20:31:05.917264
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6b3f8a2e4c7'
+down_revision = 'c1e7a3f9d5b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Admin order status filter: EXISTS (suborder of this order in this status)
+    op.create_index('ix_suborders_master_order_id_status', 'suborders', ['master_order_id', 'status'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_suborders_master_order_id_status', table_name='suborders')
@@ -0,0 +1,50 @@
+"""Add denormalized rating aggregates to products
+
+Revision ID: d8f1a4c7e2b5
+Revises: c5d2e8a1f3b6
+Create Date: 2026-10-17 13:26:51.207734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd8f1a4c7e2b5'
+down_revision = 'c5d2e8a1f3b6'
+branch_labels = None
+depends_on = None
+
+STAR_COLUMNS = [f'rating_{stars}_count' for stars in range(1, 6)]
+
+
+def upgrade():
+    # Plain ADD COLUMN (not batch mode) so SQLite keeps the products_fts triggers
+    op.add_column('products', sa.Column('rating_avg', sa.Numeric(precision=3, scale=2), nullable=False, server_default='0'))
+    op.add_column('products', sa.Column('rating_count', sa.Integer(), nullable=False, server_default='0'))
+    for name in STAR_COLUMNS:
+        op.add_column('products', sa.Column(name, sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from existing reviews (same as `flask ratings rebuild`)
+    star_counts = ', '.join(
+        f'{name} = (SELECT COUNT(*) FROM reviews WHERE reviews.product_id = products.id AND reviews.rating = {stars})'
+        for stars, name in enumerate(STAR_COLUMNS, start=1)
+    )
+    op.execute(f"""
+        UPDATE products SET
+            rating_count = (SELECT COUNT(*) FROM reviews WHERE reviews.product_id = products.id),
+            {star_counts}
+    """)
+    op.execute("""
+        UPDATE products SET rating_avg = CASE WHEN rating_count > 0 THEN
+            (rating_1_count + 2 * rating_2_count + 3 * rating_3_count + 4 * rating_4_count + 5 * rating_5_count)
+            * 1.0 / rating_count
+        ELSE 0 END
+    """)
+
+
+def downgrade():
+    for name in reversed(STAR_COLUMNS):
+        op.drop_column('products', name)
+    op.drop_column('products', 'rating_count')
+    op.drop_column('products', 'rating_avg')
@@ -0,0 +1,53 @@
+"""Add units_sold and listing sort indexes to products
+
+Revision ID: e2a9b6d4c8f1
+Revises: d8f1a4c7e2b5
+Create Date: 2026-10-17 14:52:09.663180
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9b6d4c8f1'
+down_revision = 'd8f1a4c7e2b5'
+branch_labels = None
+depends_on = None
+
+# One index per sort mode, with and without a category filter
+SORT_INDEXES = {
+    'ix_products_active_price': ['is_active', 'price', 'id'],
+    'ix_products_active_category_price': ['is_active', 'category_id', 'price', 'id'],
+    'ix_products_active_units_sold': ['is_active', 'units_sold', 'id'],
+    'ix_products_active_category_units_sold': ['is_active', 'category_id', 'units_sold', 'id'],
+    'ix_products_active_rating': ['is_active', 'rating_avg', 'rating_count', 'id'],
+    'ix_products_active_category_rating': ['is_active', 'category_id', 'rating_avg', 'rating_count', 'id'],
+    'ix_products_active_created': ['is_active', 'created_at', 'id'],
+    'ix_products_active_category_created': ['is_active', 'category_id', 'created_at', 'id'],
+}
+
+
+def upgrade():
+    # Plain ADD COLUMN (not batch mode) so SQLite keeps the products_fts triggers
+    op.add_column('products', sa.Column('units_sold', sa.Integer(), nullable=False, server_default='0'))
+
+    # Backfill from order history, ignoring cancelled suborders (their stock was restored)
+    op.execute("""
+        UPDATE products SET units_sold = COALESCE((
+            SELECT SUM(order_items.quantity)
+            FROM order_items
+            JOIN suborders ON suborders.id = order_items.suborder_id
+            WHERE order_items.product_id = products.id
+              AND suborders.status != 'CANCELLED'
+        ), 0)
+    """)
+
+    for name, columns in SORT_INDEXES.items():
+        op.create_index(name, 'products', columns, unique=False)
+
+
+def downgrade():
+    for name in reversed(list(SORT_INDEXES)):
+        op.drop_index(name, table_name='products')
+    op.drop_column('products', 'units_sold')
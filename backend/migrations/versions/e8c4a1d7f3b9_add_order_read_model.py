@@ -0,0 +1,106 @@
+"""Add order read model
+
+Revision ID: e8c4a1d7f3b9
+Revises: d6b3f8a2e4c7
+Create Date: 2026-10-17 21:14:38.402716
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c4a1d7f3b9'
+down_revision = 'd6b3f8a2e4c7'
+branch_labels = None
+depends_on = None
+
+
+PAYMENT_METHODS = ('MPESA_DELIVERY', 'COD')
+PAYMENT_STATUSES = ('PENDING', 'PAID', 'FAILED', 'REFUNDED')
+SUBORDER_STATUSES = (
+    'PENDING_PAYMENT', 'PAID_AWAITING_SHIPMENT', 'SHIPPED', 'IN_TRANSIT', 'DELIVERED',
+    'PENDING_MERCHANT_DELIVERY', 'AT_HUB_VERIFICATION_PENDING', 'AT_HUB_READY_FOR_PICKUP',
+    'PAYMENT_RECEIVED_READY_FOR_COLLECTION', 'COMPLETED', 'CANCELLED', 'EXPIRED'
+)
+
+
+def existing_enum(names, name):
+    """Enum column type reusing the order tables' PostgreSQL enum type"""
+    return sa.Enum(*names, name=name).with_variant(
+        postgresql.ENUM(*names, name=name, create_type=False), 'postgresql'
+    )
+
+
+def upgrade():
+    op.create_table('order_read_model',
+    sa.Column('suborder_id', sa.Integer(), nullable=False),
+    sa.Column('master_order_id', sa.Integer(), nullable=False),
+    sa.Column('order_total', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('payment_method', existing_enum(PAYMENT_METHODS, 'paymentmethod'), nullable=False),
+    sa.Column('payment_status', existing_enum(PAYMENT_STATUSES, 'paymentstatus'), nullable=False),
+    sa.Column('is_cancelled', sa.Boolean(), nullable=False),
+    sa.Column('order_created_at', sa.DateTime(), nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('customer_name', sa.String(length=100), nullable=True),
+    sa.Column('customer_email', sa.String(length=120), nullable=True),
+    sa.Column('merchant_id', sa.Integer(), nullable=False),
+    sa.Column('merchant_name', sa.String(length=100), nullable=True),
+    sa.Column('hub_id', sa.Integer(), nullable=True),
+    sa.Column('hub_name', sa.String(length=100), nullable=True),
+    sa.Column('status', existing_enum(SUBORDER_STATUSES, 'suborderstatus'), nullable=False),
+    sa.Column('subtotal_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('merchant_payout_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('pickup_deadline', sa.DateTime(), nullable=True),
+    sa.Column('item_count', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['suborder_id'], ['suborders.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('suborder_id')
+    )
+    with op.batch_alter_table('order_read_model', schema=None) as batch_op:
+        batch_op.create_index('ix_order_read_model_merchant', ['merchant_id', 'created_at', 'suborder_id'], unique=False)
+        batch_op.create_index('ix_order_read_model_hub', ['hub_id', 'created_at', 'suborder_id'], unique=False)
+        batch_op.create_index('ix_order_read_model_customer', ['customer_id', 'order_created_at', 'master_order_id'], unique=False)
+        batch_op.create_index('ix_order_read_model_order_created', ['order_created_at', 'master_order_id'], unique=False)
+        batch_op.create_index('ix_order_read_model_master_order_status', ['master_order_id', 'status'], unique=False)
+
+    # The admin status filter now probes the read model instead of suborders
+    op.drop_index('ix_suborders_master_order_id_status', table_name='suborders')
+
+    # Backfill one row per existing suborder
+    op.execute("""
+        INSERT INTO order_read_model (
+            suborder_id, master_order_id, order_total, payment_method, payment_status,
+            is_cancelled, order_created_at, customer_id, customer_name, customer_email,
+            merchant_id, merchant_name, hub_id, hub_name, status, subtotal_amount,
+            merchant_payout_amount, pickup_deadline, item_count, created_at, updated_at
+        )
+        SELECT
+            suborders.id, master_orders.id, master_orders.total_amount, master_orders.payment_method,
+            master_orders.payment_status, master_orders.is_cancelled, master_orders.created_at,
+            master_orders.customer_id, customers.name, customers.email,
+            suborders.merchant_id, merchants.name, suborders.hub_id, hubs.name, suborders.status,
+            suborders.subtotal_amount, suborders.merchant_payout_amount, suborders.pickup_deadline,
+            (SELECT COUNT(*) FROM order_items WHERE order_items.suborder_id = suborders.id),
+            suborders.created_at, suborders.updated_at
+        FROM suborders
+        JOIN master_orders ON master_orders.id = suborders.master_order_id
+        JOIN users AS customers ON customers.id = master_orders.customer_id
+        JOIN users AS merchants ON merchants.id = suborders.merchant_id
+        LEFT JOIN hubs ON hubs.id = suborders.hub_id
+    """)
+
+
+def downgrade():
+    op.create_index('ix_suborders_master_order_id_status', 'suborders', ['master_order_id', 'status'], unique=False)
+
+    with op.batch_alter_table('order_read_model', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_read_model_master_order_status')
+        batch_op.drop_index('ix_order_read_model_order_created')
+        batch_op.drop_index('ix_order_read_model_customer')
+        batch_op.drop_index('ix_order_read_model_hub')
+        batch_op.drop_index('ix_order_read_model_merchant')
+
+    op.drop_table('order_read_model')
@@ -0,0 +1,27 @@
+"""Add stock reservation expiry to master orders
+
+Revision ID: f3b8c1d5a7e9
+Revises: e2a9b6d4c8f1
+Create Date: 2026-10-17 16:08:41.372905
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b8c1d5a7e9'
+down_revision = 'e2a9b6d4c8f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing unpaid orders keep no expiry; only new M-Pesa checkouts are swept
+    op.add_column('master_orders', sa.Column('reservation_expires_at', sa.DateTime(), nullable=True))
+    op.create_index(op.f('ix_master_orders_reservation_expires_at'), 'master_orders', ['reservation_expires_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_master_orders_reservation_expires_at'), table_name='master_orders')
+    op.drop_column('master_orders', 'reservation_expires_at')
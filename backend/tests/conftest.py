@@ -0,0 +1,122 @@
+"""
+Shared Test Fixtures and Seeding
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+from app import create_app, db
+from app.models.user import User, UserRole
+from app.models.category import Category
+from app.models.product import Product
+from app.models.hub import Hub
+
+
+@pytest.fixture
+def app():
+    """Create test app"""
+    app = create_app('testing')
+    return app
+
+
+@pytest.fixture
+def file_app(tmp_path, monkeypatch):
+    """Create test app on a file database so threads get their own connections"""
+    from config import TestingConfig
+    monkeypatch.setattr(TestingConfig, 'SQLALCHEMY_DATABASE_URI', f"sqlite:///{tmp_path / 'test.db'}")
+    app = create_app('testing')
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """Create test client"""
+    return app.test_client()
+
+
+@pytest.fixture
+def database(app):
+    """Create the tables and keep an app context open for the test"""
+    with app.app_context():
+        db.create_all()
+
+        yield db
+
+        db.session.remove()
+        db.drop_all()
+
+
+def _users(role, label, count, password):
+    if count == 1:
+        names = [(f"{label.lower()}@test.com", "Test Merchant" if role == UserRole.MERCHANT else label)]
+    else:
+        names = [(f"{label.lower()}{number}@test.com", f"{label} {number}") for number in range(count)]
+
+    users = [User(email=email, name=name, role=role) for email, name in names]
+    if password:
+        for user in users:
+            user.set_password(password)
+    return users
+
+
+def seed_catalog(products=1, merchants=1, customers=1, categories=("Electronics",), hub=False,
+                 password=None, **product_fields):
+    """
+    Add a catalog and the people using it to the test database
+
+    Products rotate through the merchants and categories unless their fields
+    name one by index ('merchant', 'category'). A single merchant or customer
+    is merchant@test.com / customer@test.com; several are numbered.
+
+    Args:
+        products (int | list): Number of products, or the fields of each product
+        merchants (int): Number of merchants
+        customers (int): Number of customers
+        categories (tuple): Category names
+        hub (bool): Also add a pickup hub
+        password (str): Password for every user (hashing is slow, so none by default)
+        **product_fields: Fields shared by every product
+
+    Returns:
+        dict: The committed 'categories', 'category', 'merchants', 'merchant',
+        'customers', 'customer', 'products' and 'hub'
+    """
+    if isinstance(products, int):
+        products = [{} for _ in range(products)]
+
+    category_rows = [Category(name=name, description="Test category") for name in categories]
+    merchant_rows = _users(UserRole.MERCHANT, "Merchant", merchants, password)
+    customer_rows = _users(UserRole.CUSTOMER, "Customer", customers, password)
+    hub_row = Hub(name="CBD Hub", address="Moi Avenue", city="Nairobi", phone_number="254700000000") if hub else None
+    db.session.add_all(category_rows + merchant_rows + customer_rows + ([hub_row] if hub else []))
+    db.session.commit()
+
+    product_rows = []
+    for number, fields in enumerate(products):
+        fields = {
+            'name': f"Product {number}",
+            'description': "Test description",
+            'price': 100.00,
+            'stock_quantity': 10,
+            **product_fields,
+            **fields
+        }
+        merchant = merchant_rows[fields.pop('merchant', number % len(merchant_rows))]
+        category = category_rows[fields.pop('category', number % len(category_rows))]
+        product_rows.append(Product(merchant_id=merchant.id, category_id=category.id, **fields))
+    db.session.add_all(product_rows)
+    db.session.commit()
+
+    return {
+        'categories': category_rows,
+        'category': category_rows[0],
+        'merchants': merchant_rows,
+        'merchant': merchant_rows[0] if merchant_rows else None,
+        'customers': customer_rows,
+        'customer': customer_rows[0] if customer_rows else None,
+        'products': product_rows,
+        'hub': hub_row
+    }
+
+
+def auth_headers(user):
+    """Authorization header carrying an access token for a user"""
+    return {'Authorization': f"Bearer {create_access_token(identity=str(user.id))}"}
@@ -0,0 +1,340 @@
+"""
+Test Cart Routes
+"""
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.user import User
+from app.models.product import Product
+from app.models.cart import Cart, CartItem
+from tests.conftest import seed_catalog, auth_headers
+
+
+class TestCart:
+    """Test cart endpoints"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Products from several merchants and a customer"""
+        seeded = seed_catalog(
+            products=[{'price': 100.00 * (number + 1)} for number in range(10)],
+            merchants=3
+        )
+        return {
+            'product_ids': [product.id for product in seeded['products']],
+            'headers': auth_headers(seeded['customer'])
+        }
+
+    def _add(self, client, headers, product_id, quantity=1):
+        return client.post('/api/v1/cart/items', json={'product_id': product_id, 'quantity': quantity}, headers=headers)
+
+    def _count_queries(self, app, request):
+        statements = []
+        with app.app_context():
+            listener = lambda *args: statements.append(1)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            response = request()
+            event.remove(db.engine, 'before_cursor_execute', listener)
+        return response, len(statements)
+
+    def test_cart_totals(self, client, init_database):
+        """Totals and counts are computed over every line"""
+        headers = init_database['headers']
+        first, second = init_database['product_ids'][:2]
+        assert self._add(client, headers, first, 2).status_code == 201
+        assert self._add(client, headers, second, 1).status_code == 201
+        assert self._add(client, headers, first, 1).status_code == 200
+
+        cart = client.get('/api/v1/cart', headers=headers).get_json()['data']
+        assert cart['item_count'] == 4
+        assert cart['total'] == 3 * 100.00 + 200.00
+        assert [item['product']['id'] for item in cart['items']] == [first, second]
+        assert cart['items'][0]['product']['merchant']['name'] == "Merchant 0"
+
+    def test_query_count_does_not_grow_with_cart(self, app, client, init_database):
+        """Reading or changing the cart costs the same with 1 or 9 lines"""
+        headers = init_database['headers']
+        product_ids = init_database['product_ids']
+
+        self._add(client, headers, product_ids[0])
+        _, small_get = self._count_queries(app, lambda: client.get('/api/v1/cart', headers=headers))
+        _, small_add = self._count_queries(app, lambda: self._add(client, headers, product_ids[1]))
+
+        for product_id in product_ids[2:9]:
+            self._add(client, headers, product_id)
+        response, large_get = self._count_queries(app, lambda: client.get('/api/v1/cart', headers=headers))
+        assert len(response.get_json()['data']['items']) == 9
+        _, large_add = self._count_queries(app, lambda: self._add(client, headers, product_ids[9]))
+
+        assert large_get == small_get <= 3
+        assert large_add == small_add
+
+    def test_bulk_add_reports_line_errors(self, app, client, init_database):
+        """Valid lines are added together; bad lines are reported by index"""
+        headers = init_database['headers']
+        first, second, third = init_database['product_ids'][:3]
+        self._add(client, headers, second, 8)
+
+        with app.app_context():
+            product = db.session.get(Product, third)
+            product.is_active = False
+            db.session.commit()
+
+        response = client.post('/api/v1/cart/items/bulk', headers=headers, json={'items': [
+            {'product_id': first, 'quantity': 2},
+            {'product_id': second, 'quantity': 5},
+            {'product_id': third, 'quantity': 1},
+            {'product_id': 99999, 'quantity': 1},
+            {'product_id': first, 'quantity': 0},
+            {'product_id': first, 'quantity': 3},
+        ]})
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert data['added'] == 2
+        assert [(error['index'], error['code']) for error in data['errors']] == [
+            (1, 'INSUFFICIENT_STOCK'),
+            (2, 'PRODUCT_INACTIVE'),
+            (3, 'PRODUCT_NOT_FOUND'),
+            (4, 'VALIDATION_ERROR'),
+        ]
+        quantities = {item['product']['id']: item['quantity'] for item in data['cart']['items']}
+        assert quantities == {first: 5, second: 8}
+
+    def test_bulk_add_is_one_round_of_queries(self, app, client, init_database):
+        """The batch costs the same number of queries for 2 or 10 lines"""
+        headers = init_database['headers']
+        product_ids = init_database['product_ids']
+
+        def bulk(ids):
+            return lambda: client.post('/api/v1/cart/items/bulk', headers=headers, json={
+                'items': [{'product_id': product_id, 'quantity': 1} for product_id in ids]
+            })
+
+        _, small = self._count_queries(app, bulk(product_ids[:2]))
+        response, large = self._count_queries(app, bulk(product_ids))
+        assert response.get_json()['data']['added'] == 10
+        assert large - small <= 2  # one INSERT statement per batch, at most
+
+        response = client.post('/api/v1/cart/items/bulk', headers=headers, json={'items': []})
+        assert response.status_code == 400
+
+
+class TestConcurrentAddToCart:
+    """Test add-to-cart under parallel requests"""
+
+    @pytest.fixture
+    def app(self, file_app):
+        """Create test app on a file database so threads get their own connections"""
+        return file_app
+
+    @pytest.fixture
+    def init_database(self, database):
+        """A customer and one product with limited stock"""
+        seeded = seed_catalog(products=[{'name': "Test Product"}], stock_quantity=15)
+        return {
+            'product_id': seeded['products'][0].id,
+            'headers': auth_headers(seeded['customer'])
+        }
+
+    def _parallel_adds(self, app, init_database, requests):
+        from concurrent.futures import ThreadPoolExecutor
+
+        def add(_):
+            response = app.test_client().post(
+                '/api/v1/cart/items',
+                json={'product_id': init_database['product_id'], 'quantity': 1},
+                headers=init_database['headers']
+            )
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            return list(pool.map(add, range(requests)))
+
+    def _quantity(self, app, init_database):
+        with app.app_context():
+            return [item.quantity for item in CartItem.query.filter_by(product_id=init_database['product_id'])]
+
+    def test_parallel_adds_are_exact(self, app, init_database):
+        """Every parallel add lands once, with no database errors"""
+        statuses = self._parallel_adds(app, init_database, 12)
+        assert all(status in (200, 201) for status in statuses), statuses
+        assert statuses.count(201) == 1
+        assert self._quantity(app, init_database) == [12]
+
+    def test_created_does_not_depend_on_the_clock(self, app, init_database, monkeypatch):
+        """Adds within one clock tick still tell a new line from an update"""
+        import app.models.cart as cart_module
+        from datetime import datetime
+
+        class FrozenClock(datetime):
+            @classmethod
+            def utcnow(cls):
+                return datetime(2026, 1, 1)
+
+        monkeypatch.setattr(cart_module, 'datetime', FrozenClock)
+        with app.app_context():
+            customer = User.query.filter_by(email="customer@test.com").first()
+            cart = Cart.get_or_create_cart(customer.id)
+            assert CartItem.add_quantity(cart.id, init_database['product_id'], 2) == (2, True)
+            assert CartItem.add_quantity(cart.id, init_database['product_id'], 3) == (5, False)
+            assert CartItem.add_quantity(cart.id, init_database['product_id'], 30) == (15, False)
+            db.session.commit()
+
+    def test_parallel_adds_stop_at_stock(self, app, init_database):
+        """Adds beyond the stock are capped in the database"""
+        statuses = self._parallel_adds(app, init_database, 24)
+        assert all(status in (200, 201) for status in statuses), statuses
+        assert self._quantity(app, init_database) == [15]
+
+
+class TestGuestCart:
+    """Test guest carts and merge-on-login"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """A customer and a few products"""
+        seeded = seed_catalog(products=3, stock_quantity=5, password="testpass")
+        return [product.id for product in seeded['products']]
+
+    def _guest_add(self, client, token, product_id, quantity):
+        headers = {'X-Guest-Cart-Token': token} if token else {}
+        return client.post('/api/v1/cart/guest/items', headers=headers,
+                           json={'product_id': product_id, 'quantity': quantity})
+
+    def test_guest_cart_round_trip(self, client, init_database):
+        """A token is issued on the first add and keeps the cart"""
+        first, second, _ = init_database
+
+        response = self._guest_add(client, None, first, 2)
+        assert response.status_code == 201
+        token = response.get_json()['data']['token']
+        assert token
+
+        assert self._guest_add(client, token, second, 1).status_code == 200
+        assert self._guest_add(client, token, first, 10).status_code == 400  # More than stock
+
+        cart = client.get('/api/v1/cart/guest', headers={'X-Guest-Cart-Token': token}).get_json()['data']
+        assert {item['product']['id']: item['quantity'] for item in cart['items']} == {first: 2, second: 1}
+        assert cart['total'] == 300.00
+
+        response = client.delete(f'/api/v1/cart/guest/items/{second}', headers={'X-Guest-Cart-Token': token})
+        assert response.get_json()['data']['item_count'] == 2
+
+        cart = client.get('/api/v1/cart/guest', headers={'X-Guest-Cart-Token': 'unknown'}).get_json()['data']
+        assert cart['token'] is None and cart['items'] == []
+
+    def test_guest_cart_caps_its_products(self, client, init_database, monkeypatch):
+        """A guest cart can't grow past MAX_BULK_ITEMS different products"""
+        import app.routes.cart as cart_routes
+        monkeypatch.setattr(cart_routes, 'MAX_BULK_ITEMS', 2)
+        first, second, third = init_database
+
+        token = self._guest_add(client, None, first, 1).get_json()['data']['token']
+        assert self._guest_add(client, token, second, 1).status_code == 200
+
+        response = self._guest_add(client, token, third, 1)
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'CART_FULL'
+        assert self._guest_add(client, token, first, 1).status_code == 200  # Existing lines still change
+
+        items = client.get('/api/v1/cart/guest', headers={'X-Guest-Cart-Token': token}).get_json()['data']['items']
+        assert {item['product']['id'] for item in items} == {first, second}
+
+    def test_guest_cart_writes_are_rate_limited(self, client, init_database):
+        """Unauthenticated adds are throttled per client"""
+        first = init_database[0]
+        statuses = [self._guest_add(client, None, first, 1).status_code for _ in range(61)]
+        assert statuses[:60] == [201] * 60
+        assert statuses[60] == 429
+
+    def test_merge_on_login(self, app, client, init_database):
+        """Logging in with a guest token moves its lines into the account cart"""
+        first, second, third = init_database
+        token = self._guest_add(client, None, first, 2).get_json()['data']['token']
+        self._guest_add(client, token, second, 4)
+        self._guest_add(client, token, third, 1)
+
+        with app.app_context():
+            # Already in the account cart; the merge adds up to the stock
+            customer = User.query.filter_by(email="customer@test.com").first()
+            cart = Cart.get_or_create_cart(customer.id)
+            CartItem.add_quantity(cart.id, second, 3)
+            db.session.get(Product, third).is_active = False
+            db.session.commit()
+
+        response = client.post('/api/v1/auth/login', headers={'X-Guest-Cart-Token': token},
+                               json={'email': 'customer@test.com', 'password': 'testpass'})
+        assert response.status_code == 200
+        data = response.get_json()['data']
+        assert data['guest_cart_merged'] == 2
+
+        cart = client.get('/api/v1/cart', headers={'Authorization': f"Bearer {data['access_token']}"}).get_json()['data']
+        assert {item['product']['id']: item['quantity'] for item in cart['items']} == {first: 2, second: 5}
+
+        # The guest cart is gone once merged
+        cart = client.get('/api/v1/cart/guest', headers={'X-Guest-Cart-Token': token}).get_json()['data']
+        assert cart['items'] == []
+
+
+    def test_merge_takes_the_cart_once(self, app, client, init_database, monkeypatch):
+        """A token merges into one login only; a failed merge leaves the cart in place"""
+        from app.services.guest_cart import merge_guest_cart, get_guest_cart_store
+
+        first, second, _ = init_database
+        token = self._guest_add(client, None, first, 2).get_json()['data']['token']
+
+        with app.app_context():
+            customer = User.query.filter_by(email="customer@test.com").first()
+
+            def fail(cart_id, quantities):
+                raise RuntimeError('database went away')
+
+            monkeypatch.setattr(CartItem, 'add_quantities', fail)
+            with pytest.raises(RuntimeError):
+                merge_guest_cart(customer, token)
+            assert get_guest_cart_store().get(token) == {first: 2}
+            monkeypatch.undo()
+
+            assert merge_guest_cart(customer, token) == 1
+            assert merge_guest_cart(customer, token) == 0
+            cart = Cart.get_or_create_cart(customer.id)
+            assert {item.product_id: item.quantity for item in cart.items} == {first: 2}
+
+
+class TestGuestCartStores:
+    """Test the guest cart stores directly"""
+
+    def test_memory_store_lru_and_ttl(self):
+        """Least recently used carts are evicted and expired carts vanish"""
+        from app.services.guest_cart import MemoryGuestCartStore
+
+        store = MemoryGuestCartStore(ttl=60, max_entries=2)
+        store.update('a', lambda items: {1: 1})
+        store.update('b', lambda items: {2: 1})
+        store.get('a')
+        store.update('c', lambda items: {3: 1})
+        assert store.get('b') is None
+        assert store.get('a') == {1: 1}
+
+        expired = MemoryGuestCartStore(ttl=-1)
+        expired.update('a', lambda items: {1: 1})
+        assert expired.get('a') is None
+
+    def test_sqlite_store_is_shared(self, tmp_path):
+        """Two store instances on one file (two workers) see the same carts"""
+        from app.services.guest_cart import SQLiteGuestCartStore
+
+        path = str(tmp_path / 'carts.db')
+        worker_a = SQLiteGuestCartStore(path, ttl=60)
+        worker_b = SQLiteGuestCartStore(path, ttl=60)
+
+        worker_a.update('token', lambda items: {7: 2})
+        worker_b.update('token', lambda items: {**items, 8: 1})
+        assert worker_a.get('token') == {7: 2, 8: 1}
+
+        assert worker_b.pop('token') == {7: 2, 8: 1}
+        assert worker_a.get('token') is None
+
+        expired = SQLiteGuestCartStore(path, ttl=-1)
+        expired.update('old', lambda items: {1: 1})
+        assert worker_a.get('old') is None
@@ -0,0 +1,313 @@
+"""
+Test Checkout Quotes and Order Creation
+"""
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.product import Product
+from app.models.cart import CartItem
+from app.models.order import MasterOrder, SubOrder
+from tests.conftest import seed_catalog, auth_headers
+
+
+class TestCheckout:
+    """Test POST /checkout/quote and POST /orders with a quote token"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Products from two merchants, a hub, a customer and another customer"""
+        seeded = seed_catalog(
+            products=[{'price': 100.00 * (number + 1)} for number in range(4)],
+            merchants=2, customers=2, hub=True, stock_quantity=5
+        )
+        customer, other = seeded['customers']
+        return {
+            'hub_id': seeded['hub'].id,
+            'merchant_ids': [merchant.id for merchant in seeded['merchants']],
+            'product_ids': [product.id for product in seeded['products']],
+            'headers': auth_headers(customer),
+            'other_headers': auth_headers(other)
+        }
+
+    def _fill_cart(self, client, init_database):
+        # Products 0 and 2 belong to merchant 0, product 1 to merchant 1
+        for product_id, quantity in zip(init_database['product_ids'][:3], (2, 1, 1)):
+            response = client.post(
+                '/api/v1/cart/items',
+                json={'product_id': product_id, 'quantity': quantity},
+                headers=init_database['headers']
+            )
+            assert response.status_code == 201
+
+    def _order(self, client, init_database, quote_token=None, headers=None):
+        body = {'payment_method': 'cash_on_delivery', 'hub_id': init_database['hub_id']}
+        if quote_token:
+            body['quote_token'] = quote_token
+        return client.post('/api/v1/orders', json=body, headers=headers or init_database['headers'])
+
+    def test_quote_totals_per_merchant(self, client, init_database):
+        """Quote groups lines by merchant with commission and totals"""
+        self._fill_cart(client, init_database)
+
+        response = client.post('/api/v1/checkout/quote', headers=init_database['headers'])
+        assert response.status_code == 200
+        data = response.get_json()['data']
+
+        assert data['total'] == 2 * 100 + 200 + 300
+        assert data['item_count'] == 4
+        assert data['quote_token']
+        assert data['expires_in'] == 300
+
+        merchants = {merchant['merchant_id']: merchant for merchant in data['merchants']}
+        first = merchants[init_database['merchant_ids'][0]]
+        assert first['merchant_name'] == 'Merchant 0'
+        assert first['subtotal'] == 500
+        assert first['commission'] == 125
+        assert len(first['items']) == 2
+        assert merchants[init_database['merchant_ids'][1]]['subtotal'] == 200
+
+    def test_quote_empty_cart(self, client, init_database):
+        """An empty cart can't be quoted"""
+        response = client.post('/api/v1/checkout/quote', headers=init_database['headers'])
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'EMPTY_CART'
+
+    def test_order_with_quote_skips_repricing(self, app, client, init_database):
+        """An unchanged cart is ordered at the quoted prices without loading products
+
+        Product reads after the stock decrement come from serializing the
+        order and emails, not from pricing.
+        """
+        self._fill_cart(client, init_database)
+        token = client.post('/api/v1/checkout/quote', headers=init_database['headers']).get_json()['data']['quote_token']
+
+        # A price change after the quote doesn't affect the order
+        with app.app_context():
+            product = db.session.get(Product, init_database['product_ids'][0])
+            product.price = 999.00
+            db.session.commit()
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.lstrip().upper())
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            response = self._order(client, init_database, token)
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert response.status_code == 201
+        decrement = next(index for index, statement in enumerate(statements) if statement.startswith('UPDATE PRODUCTS'))
+        assert not [
+            statement for statement in statements[:decrement]
+            if statement.startswith('SELECT') and 'FROM PRODUCTS' in statement
+        ]
+
+        with app.app_context():
+            order = MasterOrder.query.one()
+            assert float(order.total_amount) == 700
+            assert SubOrder.query.count() == 2
+            assert CartItem.query.count() == 0
+
+            stock = {product.id: product.stock_quantity for product in Product.query.all()}
+            assert stock[init_database['product_ids'][0]] == 3
+            assert stock[init_database['product_ids'][1]] == 4
+            assert stock[init_database['product_ids'][3]] == 5
+
+    def test_order_written_in_fixed_statements(self, app, client, init_database):
+        """The order graph takes as many statements for one line as for many merchants"""
+        def place_order(items):
+            for product_id, quantity in items:
+                client.post(
+                    '/api/v1/cart/items',
+                    json={'product_id': product_id, 'quantity': quantity},
+                    headers=init_database['headers']
+                )
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                statements.append(statement.lstrip().split(None, 1)[0].upper())
+
+            with app.app_context():
+                event.listen(db.engine, 'before_cursor_execute', capture)
+                response = self._order(client, init_database)
+                event.remove(db.engine, 'before_cursor_execute', capture)
+
+            assert response.status_code == 201
+            return [statement for statement in statements if statement in ('INSERT', 'UPDATE', 'DELETE')]
+
+        product_ids = init_database['product_ids']
+        single = place_order([(product_ids[3], 1)])
+        several = place_order([(product_ids[0], 2), (product_ids[1], 1), (product_ids[2], 1)])
+        assert len(several) == len(single)
+
+        with app.app_context():
+            order = MasterOrder.query.order_by(MasterOrder.id.desc()).first()
+            suborders = {suborder.merchant_id: suborder for suborder in order.suborders}
+            assert set(suborders) == set(init_database['merchant_ids'])
+            items = {
+                item.product_id: (suborder.merchant_id, item.quantity)
+                for suborder in suborders.values() for item in suborder.items
+            }
+            merchant_ids = init_database['merchant_ids']
+            assert items == {
+                product_ids[0]: (merchant_ids[0], 2),
+                product_ids[1]: (merchant_ids[1], 1),
+                product_ids[2]: (merchant_ids[0], 1)
+            }
+
+    def test_items_snapshot_product(self, app, client, init_database):
+        """Order items keep the product as ordered and render without reading products"""
+        self._fill_cart(client, init_database)
+        token = client.post('/api/v1/checkout/quote', headers=init_database['headers']).get_json()['data']['quote_token']
+        order_id = self._order(client, init_database, token).get_json()['data']['id']
+
+        with app.app_context():
+            product = db.session.get(Product, init_database['product_ids'][0])
+            product.name = "Renamed"
+            product.image_url = "https://cdn.test/renamed.png"
+            db.session.commit()
+
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.upper())
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            response = client.get(f'/api/v1/orders/{order_id}', headers=init_database['headers'])
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert response.status_code == 200
+        assert not [statement for statement in statements if 'FROM PRODUCTS' in statement]
+        names = [
+            item['product']['name']
+            for suborder in response.get_json()['data']['suborders'] for item in suborder['items']
+        ]
+        assert sorted(names) == ['Product 0', 'Product 1', 'Product 2']
+
+    def test_changed_cart_is_repriced(self, app, client, init_database):
+        """Adding to the cart after the quote prices the cart again"""
+        self._fill_cart(client, init_database)
+        token = client.post('/api/v1/checkout/quote', headers=init_database['headers']).get_json()['data']['quote_token']
+
+        client.post(
+            '/api/v1/cart/items',
+            json={'product_id': init_database['product_ids'][3], 'quantity': 1},
+            headers=init_database['headers']
+        )
+
+        response = self._order(client, init_database, token)
+        assert response.status_code == 201
+
+        with app.app_context():
+            assert float(MasterOrder.query.one().total_amount) == 700 + 400
+
+    def test_order_without_quote(self, app, client, init_database):
+        """Orders can still be placed without a quote"""
+        self._fill_cart(client, init_database)
+
+        response = self._order(client, init_database)
+        assert response.status_code == 201
+
+        with app.app_context():
+            assert float(MasterOrder.query.one().total_amount) == 700
+
+    def test_invalid_quote_token(self, client, init_database):
+        """Forged tokens and tokens issued to another customer are rejected"""
+        self._fill_cart(client, init_database)
+        token = client.post('/api/v1/checkout/quote', headers=init_database['headers']).get_json()['data']['quote_token']
+
+        response = self._order(client, init_database, token + 'x')
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'INVALID_QUOTE'
+
+        response = self._order(client, init_database, token, headers=init_database['other_headers'])
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'INVALID_QUOTE'
+
+    def test_stock_taken_after_quote(self, app, client, init_database):
+        """The final stock decrement fails cleanly if stock ran out since the quote"""
+        self._fill_cart(client, init_database)
+        token = client.post('/api/v1/checkout/quote', headers=init_database['headers']).get_json()['data']['quote_token']
+
+        with app.app_context():
+            product = db.session.get(Product, init_database['product_ids'][0])
+            product.stock_quantity = 1
+            db.session.commit()
+
+        response = self._order(client, init_database, token)
+        assert response.status_code == 409
+        assert response.get_json()['error']['code'] == 'INSUFFICIENT_STOCK'
+
+        with app.app_context():
+            assert MasterOrder.query.count() == 0
+            assert CartItem.query.count() == 3
+            assert db.session.get(Product, init_database['product_ids'][1]).stock_quantity == 5
+
+
+class TestConcurrentCheckout:
+    """Stress test parallel checkouts competing for the same stock"""
+
+    CUSTOMERS = 24
+    STOCK = 10
+
+    @pytest.fixture
+    def app(self, file_app):
+        """Create test app on a file database so threads get their own connections"""
+        return file_app
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Two products with limited stock in many customers' carts"""
+        from app.models.cart import Cart
+
+        seeded = seed_catalog(products=2, customers=self.CUSTOMERS, hub=True, stock_quantity=self.STOCK)
+        products = seeded['products']
+        for number, customer in enumerate(seeded['customers']):
+            cart = Cart(user_id=customer.id)
+            db.session.add(cart)
+            db.session.flush()
+            # Half the carts list the products in the opposite order
+            ordered = products if number % 2 else list(reversed(products))
+            db.session.add_all([CartItem(cart_id=cart.id, product_id=product.id, quantity=1) for product in ordered])
+        db.session.commit()
+
+        return {
+            'hub_id': seeded['hub'].id,
+            'product_ids': [product.id for product in products],
+            'headers': [auth_headers(customer) for customer in seeded['customers']]
+        }
+
+    def test_no_oversell_and_no_errors(self, app, init_database):
+        """Exactly the available stock is sold and every other checkout is refused cleanly
+
+        Checkouts that price the cart after the stock ran out get a 400;
+        those that lose the race at the stock decrement get a 409.
+        """
+        from concurrent.futures import ThreadPoolExecutor
+
+        def checkout(headers):
+            response = app.test_client().post(
+                '/api/v1/orders',
+                json={'payment_method': 'cash_on_delivery', 'hub_id': init_database['hub_id']},
+                headers=headers
+            )
+            return response.status_code, (response.get_json() or {}).get('error', {}).get('code')
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(checkout, init_database['headers']))
+
+        statuses = [status for status, _ in results]
+        assert set(statuses) <= {201, 400, 409}, results
+        assert statuses.count(201) == self.STOCK
+        assert {code for status, code in results if status != 201} == {'INSUFFICIENT_STOCK'}
+
+        with app.app_context():
+            assert MasterOrder.query.count() == self.STOCK
+            for product in Product.query.all():
+                assert product.stock_quantity == 0
+                assert product.units_sold == self.STOCK
+            # Losing customers keep their carts
+            assert CartItem.query.count() == 2 * (self.CUSTOMERS - self.STOCK)
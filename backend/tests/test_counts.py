@@ -0,0 +1,98 @@
+"""
+Test Listing Count Strategies
+"""
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.product import Product
+from app.services.count_service import CountCache
+from app.services.search_service import notify_product_changed
+from tests.conftest import seed_catalog
+
+
+class TestCountCache:
+    """Test the per-worker count cache"""
+
+    def test_expiry_and_invalidation(self):
+        """Entries expire after the TTL and are dropped per scope"""
+        cache = CountCache(ttl=60)
+        cache.set('products', ('a',), 10, False)
+        cache.set('users', ('a',), 3, False)
+        assert cache.get('products', ('a',)) == (10, False)
+
+        cache.invalidate('products')
+        assert cache.get('products', ('a',)) is None
+        assert cache.get('users', ('a',)) == (3, False)
+
+        expired = CountCache(ttl=-1)
+        expired.set('products', ('a',), 10, False)
+        assert expired.get('products', ('a',)) is None
+
+    def test_bounded(self):
+        """Distinct search terms can't grow the cache without limit"""
+        cache = CountCache(ttl=60, max_entries=3)
+        for term in ('a', 'b', 'c'):
+            cache.set('products', (term,), 1, False)
+        assert cache.get('products', ('a',)) == (1, False)
+
+        cache.set('products', ('d',), 1, False)
+        assert len(cache) == 3
+        assert cache.get('products', ('b',)) is None  # Least recently used
+        assert cache.get('products', ('a',)) == (1, False)
+
+        expired = CountCache(ttl=-1)
+        for term in range(100):
+            expired.set('products', (term,), 1, False)
+        assert len(expired) == 1
+
+
+class TestListingCounts:
+    """Test totals on GET /api/v1/products"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database with a page and a half of products"""
+        seed_catalog(products=30, customers=0, price=1000.00)
+
+    def _count_statements(self, app, client, params):
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if 'count(' in statement.lower():
+                statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            response = client.get('/api/v1/products', query_string=params)
+            event.remove(db.engine, 'before_cursor_execute', capture)
+        return response.get_json()['data']['pagination'], len(statements)
+
+    def test_total_is_cached_across_pages(self, app, client, init_database):
+        """Only the first page of a listing pays for the count"""
+        pagination, counts = self._count_statements(app, client, {'page': 1})
+        assert pagination['total_items'] == 30
+        assert pagination['total_approximate'] is False
+        assert counts == 1
+
+        pagination, counts = self._count_statements(app, client, {'page': 2})
+        assert pagination['total_items'] == 30
+        assert counts == 0
+
+        # A different filter combination has its own count
+        pagination, counts = self._count_statements(app, client, {'page': 1, 'in_stock': 'false'})
+        assert counts == 1
+
+    def test_product_writes_invalidate(self, app, client, init_database):
+        """Deactivating a product is reflected in the next total"""
+        self._count_statements(app, client, {})
+
+        with app.app_context():
+            product = Product.query.first()
+            product.is_active = False
+            db.session.commit()
+            notify_product_changed(product)
+
+        pagination, counts = self._count_statements(app, client, {})
+        assert pagination['total_items'] == 29
+        assert pagination['total_approximate'] is False
+        assert counts == 1
@@ -0,0 +1,82 @@
+"""
+Test Product Search Facets
+"""
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.product import Product
+from tests.conftest import seed_catalog
+
+
+class TestProductFacets:
+    """Test facet counts on GET /api/v1/products?facets=true"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database with products across categories and prices"""
+        # category (0 phones, 1 laptops), name, price, stock
+        catalog = [
+            (0, "Samsung Galaxy S23", 95000, 5),
+            (0, "Samsung Charger", 800, 20),
+            (0, "Tecno Spark 10", 14000, 0),
+            (1, "Dell Laptop", 60000, 3),
+            (1, "Laptop Sleeve", 900, 10),
+        ]
+        seed_catalog(
+            products=[
+                {'category': category, 'name': name, 'price': price, 'stock_quantity': stock}
+                for category, name, price, stock in catalog
+            ],
+            customers=0, categories=("Phones", "Laptops")
+        )
+
+    def _facets(self, client, **params):
+        params['facets'] = 'true'
+        response = client.get('/api/v1/products', query_string=params)
+        assert response.status_code == 200
+        return response.get_json()['data']['facets']
+
+    def test_facets_omitted_by_default(self, client, init_database):
+        """Facets are only computed when asked for"""
+        response = client.get('/api/v1/products')
+        assert 'facets' not in response.get_json()['data']
+
+    def test_facet_counts(self, client, init_database):
+        """Categories, price buckets and stock counts for the whole catalog"""
+        facets = self._facets(client)
+
+        assert [(c['name'], c['count']) for c in facets['categories']] == [("Laptops", 2), ("Phones", 2)]
+        buckets = {(b['min'], b['max']): b['count'] for b in facets['price_buckets']}
+        assert buckets[(500, 1000)] == 2
+        assert buckets[(50000, None)] == 2
+        assert buckets[(10000, 50000)] == 0  # Out-of-stock phone is hidden
+        assert facets['stock'] == {'in_stock': 4, 'out_of_stock': 1}
+
+    def test_facets_respect_filters(self, client, init_database):
+        """Query, price and stock filters narrow every facet"""
+        facets = self._facets(client, query='samsung', max_price=50000)
+        assert [(c['name'], c['count']) for c in facets['categories']] == [("Phones", 1)]
+        assert sum(b['count'] for b in facets['price_buckets']) == 1
+
+        facets = self._facets(client, in_stock='false')
+        assert [(c['name'], c['count']) for c in facets['categories']] == [("Phones", 3), ("Laptops", 2)]
+
+    def test_category_facet_ignores_selected_category(self, client, init_database):
+        """Selecting a category narrows prices and stock, not the category list"""
+        laptops_id = next(c['id'] for c in self._facets(client)['categories'] if c['name'] == "Laptops")
+        facets = self._facets(client, category=laptops_id)
+
+        assert len(facets['categories']) == 2
+        assert sum(b['count'] for b in facets['price_buckets']) == 2
+        assert facets['stock'] == {'in_stock': 2, 'out_of_stock': 0}
+
+    def test_facets_are_one_query(self, app, init_database):
+        """All facets come from a single grouped query"""
+        app.config['SEARCH_FUZZY_MIN_RESULTS'] = 0
+        with app.app_context():
+            statements = []
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(args[2]))
+            Product.search_products(query='laptop', with_facets=True)
+
+        assert len(statements) == 3  # page, count, facets
+        assert 'GROUP BY' in statements[-1]
@@ -0,0 +1,158 @@
+"""
+Test Idempotency Keys on Order Creation and Payment Initiation
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from app import db
+from app.models.product import Product
+from app.models.cart import Cart, CartItem
+from app.models.order import MasterOrder
+from app.models.idempotency_key import IdempotencyKey
+from app.routes import payments
+from tests.conftest import seed_catalog
+
+
+def _seed():
+    """A customer with one product in the cart and a pickup hub"""
+    seeded = seed_catalog(products=[{'name': "Test Product"}], hub=True)
+    product = seeded['products'][0]
+
+    cart = Cart.get_or_create_cart(seeded['customer'].id)
+    db.session.add(CartItem(cart_id=cart.id, product_id=product.id, quantity=2))
+    db.session.commit()
+
+    return {
+        'hub_id': seeded['hub'].id,
+        'product_id': product.id,
+        'token': create_access_token(identity=str(seeded['customer'].id))
+    }
+
+
+class TestIdempotency:
+    """Test Idempotency-Key replays"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database"""
+        return _seed()
+
+    def _order(self, client, init_database, key, **body):
+        return client.post(
+            '/api/v1/orders',
+            json={'payment_method': 'cash_on_delivery', 'hub_id': init_database['hub_id'], **body},
+            headers={'Authorization': f"Bearer {init_database['token']}", 'Idempotency-Key': key}
+        )
+
+    def test_retry_replays_order(self, app, client, init_database):
+        """A retried checkout returns the first order without creating another"""
+        first = self._order(client, init_database, 'checkout-1')
+        assert first.status_code == 201
+
+        statements = []
+        with app.app_context():
+            listener = lambda *args: statements.append(1)
+            event.listen(db.engine, 'before_cursor_execute', listener)
+            retry = self._order(client, init_database, 'checkout-1')
+            event.remove(db.engine, 'before_cursor_execute', listener)
+
+        assert retry.status_code == 201
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+        assert retry.get_json() == first.get_json()
+        assert len(statements) == 1
+
+        with app.app_context():
+            assert MasterOrder.query.count() == 1
+            assert db.session.get(Product, init_database['product_id']).stock_quantity == 8
+
+    def test_errors_are_replayed_too(self, app, client, init_database):
+        """Client errors are stored; a new key runs the request again"""
+        response = self._order(client, init_database, 'checkout-2', hub_id=999)
+        assert response.status_code == 404
+
+        retry = self._order(client, init_database, 'checkout-2', hub_id=999)
+        assert retry.status_code == 404
+        assert retry.headers['Idempotent-Replayed'] == 'true'
+
+        assert self._order(client, init_database, 'checkout-3').status_code == 201
+
+    def test_key_reused_for_other_request(self, client, init_database):
+        """A key can't be replayed for a different body"""
+        assert self._order(client, init_database, 'checkout-4').status_code == 201
+
+        response = self._order(client, init_database, 'checkout-4', hub_id=999)
+        assert response.status_code == 422
+        assert response.get_json()['error']['code'] == 'IDEMPOTENCY_KEY_REUSED'
+
+    def test_expired_keys_run_again(self, app, client, init_database):
+        """After the TTL the key is taken over by the next request"""
+        assert self._order(client, init_database, 'checkout-5').status_code == 201
+
+        with app.app_context():
+            IdempotencyKey.query.update({IdempotencyKey.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+            db.session.commit()
+
+        response = self._order(client, init_database, 'checkout-5')
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'EMPTY_CART'
+        assert 'Idempotent-Replayed' not in response.headers
+
+    def test_stk_push_is_not_repeated(self, app, client, init_database, monkeypatch):
+        """Retrying payment initiation doesn't send a second prompt"""
+        calls = []
+
+        def initiate_stk_push(**kwargs):
+            calls.append(kwargs)
+            return {'success': True, 'checkout_request_id': 'ws_CO_1'}
+
+        monkeypatch.setattr(payments, 'initiate_stk_push', initiate_stk_push)
+        order_id = self._order(client, init_database, 'checkout-6').get_json()['data']['id']
+
+        for _ in range(3):
+            response = client.post(
+                '/api/v1/payments/mpesa/stk-push',
+                json={'order_id': order_id, 'phone_number': '254712345678'},
+                headers={'Authorization': f"Bearer {init_database['token']}", 'Idempotency-Key': 'pay-1'}
+            )
+            assert response.status_code == 200
+            assert response.get_json()['checkout_request_id'] == 'ws_CO_1'
+
+        assert len(calls) == 1
+
+
+class TestConcurrentIdempotency:
+    """Test parallel requests with the same key"""
+
+    @pytest.fixture
+    def app(self, file_app):
+        """Create test app on a file database so threads get their own connections"""
+        return file_app
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database"""
+        return _seed()
+
+    def test_parallel_duplicates_create_one_order(self, app, init_database):
+        """Only one of several simultaneous retries runs; the rest wait or replay"""
+        from concurrent.futures import ThreadPoolExecutor
+
+        def checkout(_):
+            response = app.test_client().post(
+                '/api/v1/orders',
+                json={'payment_method': 'cash_on_delivery', 'hub_id': init_database['hub_id']},
+                headers={'Authorization': f"Bearer {init_database['token']}", 'Idempotency-Key': 'checkout-1'}
+            )
+            return response.status_code
+
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            statuses = list(pool.map(checkout, range(6)))
+
+        assert set(statuses) <= {201, 409}, statuses
+        assert 201 in statuses
+
+        with app.app_context():
+            assert MasterOrder.query.count() == 1
+            assert db.session.get(Product, init_database['product_id']).stock_quantity == 8
@@ -0,0 +1,122 @@
+"""
+Test the Order Read Model
+"""
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.hub import Hub
+from app.models.order import SubOrder, SubOrderStatus
+from app.models.order_read_model import OrderReadModel
+from app.services.order_read_model_service import rebuild_order_read_model
+from tests.conftest import seed_catalog, auth_headers
+
+
+class TestOrderReadModel:
+    """Order writes keep order_read_model current and lists read only it"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Products from two merchants, a hub and a customer"""
+        seeded = seed_catalog(products=3, merchants=2, hub=True, stock_quantity=5)
+        return {
+            'hub_id': seeded['hub'].id,
+            'merchant_ids': [merchant.id for merchant in seeded['merchants']],
+            'product_ids': [product.id for product in seeded['products']],
+            'headers': auth_headers(seeded['customer']),
+            'merchant_headers': auth_headers(seeded['merchants'][0])
+        }
+
+    def _order(self, client, init_database):
+        # Products 0 and 2 belong to merchant 0, product 1 to merchant 1
+        for product_id in init_database['product_ids']:
+            client.post('/api/v1/cart/items', json={'product_id': product_id, 'quantity': 1}, headers=init_database['headers'])
+        response = client.post(
+            '/api/v1/orders',
+            json={'payment_method': 'cash_on_delivery', 'hub_id': init_database['hub_id']},
+            headers=init_database['headers']
+        )
+        assert response.status_code == 201
+        return response.get_json()['data']['id']
+
+    def _rows(self, app, order_id):
+        with app.app_context():
+            return {
+                row.merchant_id: row
+                for row in OrderReadModel.query.filter_by(master_order_id=order_id).all()
+            }
+
+    def test_checkout_writes_rows(self, app, client, init_database):
+        """Each suborder gets a row with its order, people and item count"""
+        order_id = self._order(client, init_database)
+        rows = self._rows(app, order_id)
+        merchant_ids = init_database['merchant_ids']
+
+        assert set(rows) == set(merchant_ids)
+        row = rows[merchant_ids[0]]
+        assert row.customer_name == 'Customer'
+        assert row.merchant_name == 'Merchant 0'
+        assert row.hub_name == 'CBD Hub'
+        assert row.status == SubOrderStatus.PENDING_MERCHANT_DELIVERY
+        assert row.item_count == 2
+        assert float(row.order_total) == 300.0
+        assert rows[merchant_ids[1]].item_count == 1
+
+    def test_status_changes_update_rows(self, app, client, init_database):
+        """Merchant updates and cancellation change the rows with the orders"""
+        order_id = self._order(client, init_database)
+        merchant_ids = init_database['merchant_ids']
+        suborder_id = self._rows(app, order_id)[merchant_ids[0]].suborder_id
+
+        response = client.patch(
+            f'/api/v1/merchant/orders/{suborder_id}/status',
+            json={'status': 'at_hub_verification_pending'},
+            headers=init_database['merchant_headers']
+        )
+        assert response.status_code == 200
+        rows = self._rows(app, order_id)
+        assert rows[merchant_ids[0]].status == SubOrderStatus.AT_HUB_VERIFICATION_PENDING
+        assert rows[merchant_ids[1]].status == SubOrderStatus.PENDING_MERCHANT_DELIVERY
+
+        response = client.post(
+            f'/api/v1/orders/{order_id}/cancel',
+            json={'reason': 'Changed my mind about it'},
+            headers=init_database['headers']
+        )
+        assert response.status_code == 200
+        rows = self._rows(app, order_id)
+        assert all(row.is_cancelled for row in rows.values())
+        assert all(row.status == SubOrderStatus.CANCELLED for row in rows.values())
+
+    def test_rebuild(self, app, client, init_database):
+        """Rebuilding restores missing rows and picks up renamed hubs"""
+        order_id = self._order(client, init_database)
+        with app.app_context():
+            OrderReadModel.query.filter_by(merchant_id=init_database['merchant_ids'][1]).delete()
+            db.session.get(Hub, init_database['hub_id']).name = 'Westlands Hub'
+            db.session.commit()
+
+            assert rebuild_order_read_model(batch_size=1) == 2
+            assert SubOrder.query.count() == OrderReadModel.query.count() == 2
+
+        rows = self._rows(app, order_id)
+        assert {row.hub_name for row in rows.values()} == {'Westlands Hub'}
+
+    def test_summary_lists_read_only_the_read_model(self, app, client, init_database):
+        """Summary pages don't touch the order tables"""
+        self._order(client, init_database)
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            customer = client.get('/api/v1/orders', headers=init_database['headers'])
+            merchant = client.get('/api/v1/merchant/orders?view=summary', headers=init_database['merchant_headers'])
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert customer.get_json()['data'][0]['item_count'] == 3
+        assert merchant.get_json()['data'][0]['merchant_name'] == 'Merchant 0'
+        pages = [statement for statement in statements if 'order_read_model' in statement]
+        assert len(pages) == 2
+        assert not any('suborders' in statement or 'master_orders' in statement for statement in statements)
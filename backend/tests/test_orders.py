@@ -0,0 +1,241 @@
+"""
+Test Order History and Detail Endpoints
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, insert
+from app import db
+from app.models.user import User, UserRole
+from app.models.delivery_partner import DeliveryPartner
+from app.models.order import MasterOrder, SubOrder, OrderItem, PaymentMethod, SubOrderStatus
+from app.services.order_read_model_service import refresh_order_read_model, rebuild_order_read_model
+from tests.conftest import seed_catalog, auth_headers
+
+
+class TestOrderQueries:
+    """Order listings load the whole order graph in a fixed number of queries"""
+
+    ORDERS = 100
+
+    @pytest.fixture
+    def init_database(self, database):
+        """A customer with 100 orders, each split between two merchants"""
+        seeded = seed_catalog(products=6, merchants=2, hub=True)
+        customer, merchants, hub = seeded['customer'], seeded['merchants'], seeded['hub']
+        products = seeded['products']
+        partner = DeliveryPartner(name="Rider Co", contact_phone="254700000001", coverage_areas=["Nairobi"])
+        staff = User(email="staff@test.com", name="Staff", role=UserRole.HUB_STAFF, hub_id=hub.id)
+        admin = User(email="admin@test.com", name="Admin", role=UserRole.ADMIN)
+        db.session.add_all([partner, staff, admin])
+        db.session.commit()
+
+        created_at = datetime(2026, 1, 1)
+        order_ids = db.session.execute(
+            insert(MasterOrder).returning(MasterOrder.id),
+            [
+                {
+                    'customer_id': customer.id,
+                    'total_amount': 400,
+                    'payment_method': PaymentMethod.COD,
+                    'selected_hub_id': hub.id,
+                    'created_at': created_at + timedelta(minutes=number)
+                }
+                for number in range(self.ORDERS)
+            ]
+        ).scalars().all()
+        suborder_ids = db.session.execute(
+            insert(SubOrder).returning(SubOrder.id, SubOrder.merchant_id),
+            [
+                {
+                    'master_order_id': order_id,
+                    'merchant_id': merchant.id,
+                    'hub_id': hub.id,
+                    'delivery_partner_id': partner.id if number % 2 else None,
+                    'status': SubOrderStatus.AT_HUB_READY_FOR_PICKUP,
+                    'subtotal_amount': 200,
+                    'commission_amount': 50,
+                    'merchant_payout_amount': 150
+                }
+                for number, order_id in enumerate(order_ids)
+                for merchant in merchants
+            ]
+        ).all()
+        db.session.execute(insert(OrderItem), [
+            {
+                'suborder_id': suborder_id,
+                'product_id': product.id,
+                'quantity': 1,
+                'price_at_purchase': 100,
+                'product_name': product.name
+            }
+            for suborder_id, merchant_id in suborder_ids
+            for product in products if product.merchant_id == merchant_id
+        ])
+        db.session.commit()
+        rebuild_order_read_model()
+
+        return {
+            'order_id': order_ids[0],
+            'suborder_id': suborder_ids[0][0],
+            'customer_headers': auth_headers(customer),
+            'merchant_headers': auth_headers(merchants[0]),
+            'staff_headers': auth_headers(staff),
+            'admin_headers': auth_headers(admin)
+        }
+
+    def _get(self, app, client, url, headers, **params):
+        """GET a URL; returns (response body, number of SQL statements)"""
+        statements = []
+
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            response = client.get(url, query_string=params, headers=headers)
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+        assert response.status_code == 200
+        return response.get_json(), len(statements)
+
+    def test_customer_order_history(self, app, client, init_database):
+        """100 orders cost the same queries as one"""
+        headers = init_database['customer_headers']
+        body, queries = self._get(app, client, '/api/v1/orders', headers, view='full', limit=100)
+        _, single_queries = self._get(app, client, '/api/v1/orders', headers, view='full', limit=1)
+
+        assert len(body['data']) == self.ORDERS
+        assert queries == single_queries
+        # User and orders, then one query per relationship in to_dict_options()
+        assert queries == 9
+
+        order = body['data'][0]
+        assert order['selected_hub']['name'] == 'CBD Hub'
+        assert [suborder['merchant']['name'] for suborder in order['suborders']] == ['Merchant 0', 'Merchant 1']
+        assert all(len(suborder['items']) == 3 for suborder in order['suborders'])
+        assert order['suborders'][0]['items'][0]['product']['name'] == 'Product 0'
+
+    def test_order_detail(self, app, client, init_database):
+        """One order's detail doesn't fan out per suborder or item"""
+        _, queries = self._get(
+            app, client, f"/api/v1/orders/{init_database['order_id']}", init_database['customer_headers']
+        )
+        # User and order, then one query per relationship under it
+        assert queries == 8
+
+    def test_merchant_and_hub_listings(self, app, client, init_database):
+        """Suborder listings load items, hubs and merchants with the page"""
+        body, queries = self._get(
+            app, client, '/api/v1/merchant/orders', init_database['merchant_headers'], view='full', limit=100
+        )
+        _, single_queries = self._get(app, client, '/api/v1/merchant/orders', init_database['merchant_headers'], view='full', limit=1)
+        assert len(body['data']) == self.ORDERS
+        assert queries == single_queries
+
+        body, queries = self._get(app, client, '/api/v1/hub/orders', init_database['staff_headers'], view='full', limit=100)
+        _, single_queries = self._get(app, client, '/api/v1/hub/orders', init_database['staff_headers'], view='full', limit=1)
+        assert len(body['data']) == 100
+        assert queries == single_queries
+
+    def test_summary_is_default(self, app, client, init_database):
+        """Customer lists default to summaries; merchant and hub lists return them on request"""
+        headers = init_database['customer_headers']
+        body, queries = self._get(app, client, '/api/v1/orders', headers, limit=100)
+
+        # User lookup and the page
+        assert queries == 2
+        assert len(body['data']) == self.ORDERS
+        assert body['data'][0] == {
+            'id': body['data'][0]['id'],
+            'created_at': '2026-01-01T01:39:00',
+            'total_amount': 400.0,
+            'payment_method': 'cash_on_delivery',
+            'payment_status': 'pending',
+            'is_cancelled': False,
+            'status': 'at_hub_ready_for_pickup',
+            'suborder_count': 2,
+            'item_count': 6
+        }
+
+        body, queries = self._get(
+            app, client, '/api/v1/merchant/orders', init_database['merchant_headers'], view='summary', limit=100
+        )
+        assert queries == 2
+        assert body['data'][0]['item_count'] == 3
+        assert 'items' not in body['data'][0]
+
+        body, queries = self._get(
+            app, client, '/api/v1/hub/orders', init_database['staff_headers'], view='summary', limit=100
+        )
+        assert queries == 2
+        assert len(body['data']) == 100
+
+    def test_summary_pages_and_status_rollup(self, app, client, init_database):
+        """Cursors walk summary rows; suborders in different states read as mixed"""
+        with app.app_context():
+            suborder = db.session.get(SubOrder, init_database['suborder_id'])
+            suborder.status = SubOrderStatus.COMPLETED
+            refresh_order_read_model(suborder_ids=[suborder.id])
+            db.session.commit()
+
+        headers = init_database['customer_headers']
+        seen, cursor = [], None
+        while True:
+            params = {'limit': 30, **({'cursor': cursor} if cursor else {'include_total': 'true'})}
+            body, _ = self._get(app, client, '/api/v1/orders', headers, **params)
+            if not cursor:
+                assert body['pagination']['total_items'] == self.ORDERS
+            seen.extend(order['id'] for order in body['data'])
+            cursor = body['pagination']['next_cursor']
+            if not cursor:
+                break
+
+        assert len(seen) == len(set(seen)) == self.ORDERS
+        statuses = {order['id']: order['status'] for order in self._get(
+            app, client, '/api/v1/orders', headers, limit=100
+        )[0]['data']}
+        assert statuses[init_database['order_id']] == 'mixed'
+
+    def test_invalid_view(self, client, init_database):
+        """Unknown views are rejected"""
+        response = client.get('/api/v1/orders?view=everything', headers=init_database['customer_headers'])
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'INVALID_VIEW'
+
+    def test_admin_orders_single_query(self, app, client, init_database):
+        """Admin pages are one aggregated query whatever their size"""
+        headers = init_database['admin_headers']
+        body, queries = self._get(app, client, '/api/v1/admin/orders', headers, limit=100, include_total='false')
+        _, single_queries = self._get(app, client, '/api/v1/admin/orders', headers, limit=1, include_total='false')
+
+        # Admin lookup and the page
+        assert queries == single_queries == 2
+        assert len(body['data']) == self.ORDERS
+        order = body['data'][0]
+        assert order['customer']['name'] == 'Customer'
+        assert order['status'] == 'at_hub_ready_for_pickup'
+        assert order['suborder_count'] == 2
+        assert order['items'] == order['item_count'] == 6
+
+        body, _ = self._get(app, client, '/api/v1/admin/orders', headers, page=2, limit=30)
+        assert body['pagination']['total'] == self.ORDERS
+        assert len(body['data']) == 30
+
+    def test_admin_orders_status_filter(self, app, client, init_database):
+        """Orders with any suborder in the status match, with their status rolled up"""
+        with app.app_context():
+            suborder = db.session.get(SubOrder, init_database['suborder_id'])
+            suborder.status = SubOrderStatus.COMPLETED
+            refresh_order_read_model(suborder_ids=[suborder.id])
+            db.session.commit()
+
+        headers = init_database['admin_headers']
+        body, _ = self._get(app, client, '/api/v1/admin/orders', headers, status='completed')
+        assert [order['id'] for order in body['data']] == [init_database['order_id']]
+        assert body['data'][0]['status'] == 'mixed'
+        assert body['data'][0]['suborder_count'] == 2
+        assert body['pagination']['total_items'] == 1
+
+        response = client.get('/api/v1/admin/orders?status=bogus', headers=headers)
+        assert response.status_code == 400
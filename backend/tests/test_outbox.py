@@ -0,0 +1,161 @@
+"""
+Test the Checkout Outbox (STK push and emails after commit)
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.models.cart import Cart, CartItem
+from app.models.order import MasterOrder
+from app.models.outbox import OutboxMessage, OutboxStatus
+from app.services import mpesa_service
+from app.services.email_service import mail
+from app.services.outbox_service import process_outbox, _claim, _renew, _deliver, STK_PUSH, MERCHANT_NEW_ORDER_EMAIL
+from tests.conftest import seed_catalog, auth_headers
+
+
+class TestOutbox:
+    """Test that checkout enqueues side effects and the worker delivers them"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """A customer with products from two merchants in the cart"""
+        seeded = seed_catalog(products=2, merchants=2)
+        cart = Cart.get_or_create_cart(seeded['customer'].id)
+        db.session.add_all([
+            CartItem(cart_id=cart.id, product_id=product.id, quantity=1) for product in seeded['products']
+        ])
+        db.session.commit()
+
+        return {'headers': auth_headers(seeded['customer'])}
+
+    @pytest.fixture
+    def stk_calls(self, monkeypatch):
+        """Record STK pushes and answer with the queued responses (success by default)"""
+        calls = []
+        responses = []
+
+        def initiate_stk_push(**kwargs):
+            calls.append(kwargs)
+            return responses.pop(0) if responses else {'success': True, 'checkout_request_id': f'ws_CO_{len(calls)}'}
+
+        monkeypatch.setattr(mpesa_service, 'initiate_stk_push', initiate_stk_push)
+        return calls, responses
+
+    def _checkout(self, client, init_database):
+        response = client.post(
+            '/api/v1/orders',
+            json={'payment_method': 'mpesa_delivery', 'mpesa_phone_number': '254712345678'},
+            headers=init_database['headers']
+        )
+        assert response.status_code == 201
+        return response.get_json()['data']['id']
+
+    def _stk_status(self, client, init_database, order_id):
+        response = client.get(f'/api/v1/payments/status/{order_id}', headers=init_database['headers'])
+        return response.get_json()['stk_push']
+
+    def test_checkout_only_enqueues(self, app, client, init_database, stk_calls):
+        """The request commits the order with its messages and sends nothing itself"""
+        calls, _ = stk_calls
+        with app.app_context(), mail.record_messages() as outbox:
+            order_id = self._checkout(client, init_database)
+            assert calls == []
+            assert outbox == []
+
+            kinds = sorted(message.kind for message in OutboxMessage.query.filter_by(order_id=order_id))
+            assert kinds == ['merchant_new_order_email', 'merchant_new_order_email', 'order_confirmation_email', 'stk_push']
+
+        assert self._stk_status(client, init_database, order_id)['status'] == 'pending'
+
+    def test_worker_delivers(self, app, client, init_database, stk_calls):
+        """The worker sends the STK push and every email once"""
+        calls, _ = stk_calls
+        order_id = self._checkout(client, init_database)
+
+        with app.app_context(), mail.record_messages() as outbox:
+            assert process_outbox() == 4
+            assert len(calls) == 1
+            assert calls[0]['phone_number'] == '254712345678'
+            assert len(outbox) == 3
+            assert db.session.get(MasterOrder, order_id).mpesa_checkout_request_id == 'ws_CO_1'
+
+            # Nothing left to do
+            assert process_outbox(now=datetime.utcnow() + timedelta(hours=2)) == 0
+
+        status = self._stk_status(client, init_database, order_id)
+        assert status['status'] == 'sent'
+        assert status['checkout_request_id'] == 'ws_CO_1'
+
+    def test_failures_retry_with_backoff(self, app, client, init_database, stk_calls):
+        """Failed STK pushes are retried later and give up after the last attempt"""
+        calls, responses = stk_calls
+        app.config['OUTBOX_MAX_ATTEMPTS'] = 2
+        responses.extend([{'success': False, 'error': 'Read timed out'}] * 2)
+        order_id = self._checkout(client, init_database)
+        now = datetime.utcnow()
+
+        with app.app_context():
+            process_outbox(now=now)
+            message = OutboxMessage.query.filter_by(kind=STK_PUSH).one()
+            assert message.status == OutboxStatus.PENDING
+            assert message.attempts == 1
+            assert message.last_error == 'Read timed out'
+            assert message.next_attempt_at == now + timedelta(seconds=30)
+
+            # Not due yet
+            process_outbox(now=now + timedelta(seconds=10))
+            assert len(calls) == 1
+
+            process_outbox(now=now + timedelta(seconds=31))
+            assert len(calls) == 2
+            db.session.refresh(message)
+            assert message.status == OutboxStatus.FAILED
+
+        status = self._stk_status(client, init_database, order_id)
+        assert status['status'] == 'failed'
+        assert status['attempts'] == 2
+
+    def test_abandoned_claims_are_retried(self, app, client, init_database, stk_calls):
+        """Messages claimed by a worker that died are picked up after the lease"""
+        calls, _ = stk_calls
+        self._checkout(client, init_database)
+        now = datetime.utcnow()
+
+        with app.app_context():
+            message = OutboxMessage.query.filter_by(kind=MERCHANT_NEW_ORDER_EMAIL).first()
+            message.status = OutboxStatus.PROCESSING
+            message.attempts = 1
+            message.next_attempt_at = now + timedelta(seconds=60)
+            db.session.commit()
+
+            assert process_outbox(now=now) == 3
+            assert process_outbox(now=now + timedelta(seconds=61)) == 1
+            db.session.refresh(message)
+            assert message.status == OutboxStatus.SENT
+            assert message.attempts == 2
+
+    def test_lost_claims_are_not_delivered_twice(self, app, client, init_database, stk_calls):
+        """A worker whose lease ran out neither starts nor records the message"""
+        calls, _ = stk_calls
+        order_id = self._checkout(client, init_database)
+        now = datetime.utcnow()
+
+        with app.app_context():
+            stk = OutboxMessage.query.filter_by(order_id=order_id, kind=STK_PUSH).one()
+            first = dict(_claim(now, 50))
+            # The first worker stalls past the lease and a second one claims everything again
+            later = now + timedelta(seconds=61)
+            second = dict(_claim(later, 50))
+            assert second[stk.id] == first[stk.id] + 1
+
+            assert not _renew(stk.id, first[stk.id], later)
+            assert not _deliver(stk.id, first[stk.id], later)
+            db.session.refresh(stk)
+            assert stk.status == OutboxStatus.PROCESSING
+            assert stk.attempts == second[stk.id]
+
+            assert _renew(stk.id, second[stk.id], later)
+            assert _deliver(stk.id, second[stk.id], later)
+            db.session.refresh(stk)
+            assert stk.status == OutboxStatus.SENT
@@ -0,0 +1,228 @@
+"""
+Test Cursor (Keyset) Pagination
+"""
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.product import Product
+from app.models.review import Review
+from app.models.order import MasterOrder, SubOrder, OrderItem, PaymentMethod, SubOrderStatus
+from app.utils.pagination import encode_cursor, decode_cursor, InvalidCursorError
+from tests.conftest import seed_catalog
+
+
+class TestCursorEncoding:
+    """Test the opaque cursor format"""
+
+    def test_round_trip(self):
+        """Datetimes, decimals and ids survive encoding"""
+        values = [datetime(2026, 1, 2, 3, 4, 5, 6), Decimal('1999.50'), 42]
+        cursor = encode_cursor(values)
+        assert '=' not in cursor
+        assert decode_cursor(cursor, 3) == values
+
+    def test_rejects_garbage(self):
+        """Malformed cursors and cursors for another sort are rejected"""
+        with pytest.raises(InvalidCursorError):
+            decode_cursor('not-a-cursor', 2)
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(encode_cursor([1, 2, 3]), 2)
+
+    def test_rejects_values_of_the_wrong_type(self):
+        """Tampered values are rejected before they reach SQL"""
+        columns = [Product.created_at, Product.id]
+        cursor = encode_cursor([datetime(2026, 1, 1), 7])
+        assert decode_cursor(cursor, 2, columns) == [datetime(2026, 1, 1), 7]
+
+        for values in (
+            [{'dt': '2026-01-01T00:00:00', 'x': 1}, 7],
+            [{'evil': 1}, 7],
+            ['2026-01-01', 7],
+            [{'dt': '2026-01-01T00:00:00'}, 'seven'],
+            [{'dt': '2026-01-01T00:00:00'}, True],
+            [{'dt': '2026-01-01T00:00:00'}, None],
+            [{'dt': '2026-01-01T00:00:00'}, [7]],
+        ):
+            with pytest.raises(InvalidCursorError):
+                decode_cursor(encode_cursor(values), 2, columns)
+        with pytest.raises(InvalidCursorError):
+            decode_cursor(encode_cursor({'a': 1}), 2, columns)
+
+
+class TestCursorPagination:
+    """Test cursor pagination on list endpoints"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Products, orders and reviews that share sort values"""
+        # Two prices and one creation time: ids break the ties
+        created_at = datetime(2026, 1, 1)
+        seeded = seed_catalog(
+            products=[{'price': 1000.00 if number % 2 else 500.00} for number in range(25)],
+            created_at=created_at
+        )
+        merchant, customer, products = seeded['merchant'], seeded['customer'], seeded['products']
+
+        order = MasterOrder(
+            customer_id=customer.id, total_amount=1000,
+            payment_method=PaymentMethod.COD, created_at=created_at
+        )
+        db.session.add(order)
+        db.session.commit()
+        for number in range(11):
+            db.session.add(MasterOrder(
+                customer_id=customer.id, total_amount=1000,
+                payment_method=PaymentMethod.COD, created_at=created_at
+            ))
+
+        suborder = SubOrder(
+            master_order_id=order.id,
+            merchant_id=merchant.id,
+            status=SubOrderStatus.COMPLETED,
+            subtotal_amount=1000,
+            commission_amount=250,
+            merchant_payout_amount=750
+        )
+        db.session.add(suborder)
+        db.session.commit()
+
+        for number, product in enumerate(products[:9]):
+            item = OrderItem(suborder_id=suborder.id, product_id=product.id, quantity=1, price_at_purchase=1000)
+            db.session.add(item)
+            db.session.commit()
+            db.session.add(Review(
+                product_id=products[0].id,
+                customer_id=customer.id,
+                order_item_id=item.id,
+                rating=number % 3 + 1,
+                comment="A perfectly fine product",
+                created_at=created_at
+            ))
+        db.session.commit()
+
+        return {
+            'product_id': products[0].id,
+            'customer_token': create_access_token(identity=str(customer.id)),
+            'merchant_token': create_access_token(identity=str(merchant.id))
+        }
+
+    def _walk(self, client, url, params, items=lambda body: body['data'], pagination=lambda body: body['pagination'],
+              headers=None):
+        """Follow next_cursor to the end; returns the items of every page"""
+        collected, cursor, pages = [], None, 0
+        while True:
+            query = dict(params, **({'cursor': cursor} if cursor else {}))
+            response = client.get(url, query_string=query, headers=headers)
+            assert response.status_code == 200
+            body = response.get_json()
+            collected.extend(items(body))
+            pages += 1
+            cursor = pagination(body)['next_cursor']
+            if not cursor:
+                return collected, pages
+
+    def test_product_browse_walks_every_row_once(self, client, init_database):
+        """Pages follow the sort order with no gaps or repeats across ties"""
+        products, pages = self._walk(
+            client, '/api/v1/products', {'sort': 'price_asc', 'per_page': 10},
+            items=lambda body: body['data']['products'],
+            pagination=lambda body: body['data']['pagination']
+        )
+        ids = [product['id'] for product in products]
+        assert pages == 3
+        assert len(ids) == len(set(ids)) == 25
+        assert [product['price'] for product in products] == sorted(product['price'] for product in products)
+
+        response = client.get('/api/v1/products', query_string={'sort': 'price_asc', 'per_page': 10})
+        pagination = response.get_json()['data']['pagination']
+        assert pagination['total_items'] == 25
+        assert pagination['has_next'] is True
+
+    def test_product_page_param_keeps_offset_pagination(self, client, init_database):
+        """Clients sending `page` get the page-numbered response"""
+        response = client.get('/api/v1/products', query_string={'page': 2, 'per_page': 10})
+        pagination = response.get_json()['data']['pagination']
+        assert pagination['page'] == 2
+        assert pagination['total_pages'] == 3
+
+    def test_mixed_direction_sort(self, client, init_database):
+        """rating_low (rating asc, newest first) pages correctly"""
+        reviews, pages = self._walk(
+            client, f"/api/v1/products/{init_database['product_id']}/reviews", {'sort': 'rating_low', 'per_page': 4},
+            items=lambda body: body['data']['reviews'],
+            pagination=lambda body: body['data']['pagination']
+        )
+        assert pages == 3
+        assert len({review['id'] for review in reviews}) == 9
+        ratings = [review['rating'] for review in reviews]
+        assert ratings == sorted(ratings)
+
+    def test_customer_orders(self, client, init_database):
+        """Order history is cursor-paginated and only counted on request"""
+        headers = {'Authorization': f"Bearer {init_database['customer_token']}"}
+        orders, pages = self._walk(client, '/api/v1/orders', {'limit': 5, 'view': 'full'}, headers=headers)
+        ids = [order['id'] for order in orders]
+        assert pages == 3
+        assert ids == sorted(ids, reverse=True)
+        assert len(set(ids)) == 12
+
+        response = client.get('/api/v1/orders', query_string={'include_total': 'true', 'view': 'full'}, headers=headers)
+        assert response.get_json()['pagination']['total_items'] == 12
+
+    def test_unpaged_requests_get_every_row(self, client, init_database):
+        """Clients that send neither limit nor cursor keep the full list"""
+        headers = {'Authorization': f"Bearer {init_database['merchant_token']}"}
+        body = client.get('/api/v1/merchant/products', headers=headers).get_json()
+        assert len(body['data']) == 25
+        assert body['pagination']['next_cursor'] is None
+
+        body = client.get('/api/v1/merchant/products', query_string={'limit': 20}, headers=headers).get_json()
+        assert len(body['data']) == 20
+        assert body['pagination']['next_cursor']
+
+    def test_unpaged_review_lists_get_every_review(self, app, client, init_database):
+        """Merchant review lists without limit or cursor aren't cut at a page"""
+        with app.app_context():
+            suborder = SubOrder.query.one()
+            for product in Product.query.order_by(Product.id).offset(9):
+                item = OrderItem(suborder_id=suborder.id, product_id=product.id, quantity=1, price_at_purchase=1000)
+                db.session.add(item)
+                db.session.flush()
+                db.session.add(Review(
+                    product_id=product.id,
+                    customer_id=suborder.master_order.customer_id,
+                    order_item_id=item.id,
+                    rating=5,
+                    comment="A perfectly fine product"
+                ))
+            db.session.commit()
+            merchant_id = suborder.merchant_id
+
+        headers = {'Authorization': f"Bearer {init_database['merchant_token']}"}
+        body = client.get('/api/v1/merchant/reviews', headers=headers).get_json()
+        assert len(body['data']) == 25
+        assert body['pagination']['next_cursor'] is None
+
+        body = client.get(f'/api/v1/merchants/{merchant_id}/reviews').get_json()['data']
+        assert len(body['reviews']) == 25
+        assert body['pagination']['next_cursor'] is None
+
+        body = client.get('/api/v1/merchant/reviews', query_string={'limit': 20}, headers=headers).get_json()
+        assert len(body['data']) == 20
+        assert body['pagination']['next_cursor']
+
+    def test_invalid_cursor(self, client, init_database):
+        """A tampered cursor is a 400, not a server error"""
+        response = client.get('/api/v1/products', query_string={'cursor': 'bogus'})
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'INVALID_CURSOR'
+
+        headers = {'Authorization': f"Bearer {init_database['customer_token']}"}
+        for values in ([{'evil': 1}, 1], ['yesterday', 1], [{'dt': '2026-01-01T00:00:00'}, 'x']):
+            response = client.get(
+                '/api/v1/orders', query_string={'cursor': encode_cursor(values), 'view': 'full'}, headers=headers
+            )
+            assert response.status_code == 400
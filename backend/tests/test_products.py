@@ -1,60 +1,21 @@
 """
 Test Product Routes
 """
+from datetime import datetime, timedelta
+
 import pytest
-from app import create_app, db
-from app.models.user import User, UserRole
-from app.models.category import Category
+from app import db
 from app.models.product import Product
+from tests.conftest import seed_catalog, auth_headers
 
 
 class TestProducts:
     """Test product endpoints"""
 
     @pytest.fixture
-    def app(self):
-        """Create test app"""
-        app = create_app('testing')
-        return app
-
-    @pytest.fixture
-    def client(self, app):
-        """Create test client"""
-        return app.test_client()
-
-    @pytest.fixture
-    def init_database(self, app):
+    def init_database(self, database):
         """Initialize database"""
-        with app.app_context():
-            db.create_all()
-
-            # Create test data
-            category = Category(name="Electronics", description="Test category")
-            db.session.add(category)
-
-            merchant = User(
-                email="merchant@test.com",
-                name="Test Merchant",
-                role=UserRole.MERCHANT
-            )
-            merchant.set_password("testpass")
-            db.session.add(merchant)
-            db.session.commit()  # Commit to get IDs
-
-            product = Product(
-                merchant_id=merchant.id,
-                category_id=category.id,
-                name="Test Product",
-                description="Test description",
-                price=100.00,
-                stock_quantity=10
-            )
-            db.session.add(product)
-            db.session.commit()
-
-            yield
-
-            db.drop_all()
+        seed_catalog(products=[{'name': "Test Product"}], customers=0)
 
     def test_get_products(self, client, init_database):
         """Test getting products list"""
@@ -80,3 +41,125 @@ class TestProducts:
         data = response.get_json()
         assert data['success'] is True
         assert data['data']['name'] == "Test Product"
+
+
+class TestProductSorting:
+    """Test sort modes on GET /api/v1/products"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database with products that sort differently per mode"""
+        # name, price, rating_avg, rating_count, units_sold
+        catalog = [
+            ("Cheap", 100, 3.0, 4, 50),
+            ("Pricey", 9000, 4.5, 2, 5),
+            ("Popular", 2500, 4.5, 10, 300),
+        ]
+        seeded = seed_catalog(products=[
+            {
+                'name': name,
+                'price': price,
+                'rating_avg': rating_avg,
+                'rating_count': rating_count,
+                'units_sold': units_sold,
+                'created_at': datetime(2026, 1, 1) + timedelta(minutes=number)
+            }
+            for number, (name, price, rating_avg, rating_count, units_sold) in enumerate(catalog)
+        ], customers=0)
+        return seeded['category'].id
+
+    def _names(self, client, sort):
+        response = client.get('/api/v1/products', query_string={'sort': sort})
+        assert response.status_code == 200
+        return [p['name'] for p in response.get_json()['data']['products']]
+
+    def test_sort_modes(self, client, init_database):
+        """Each sort mode orders the listing as expected"""
+        assert self._names(client, 'newest') == ["Popular", "Pricey", "Cheap"]
+        assert self._names(client, 'price_asc') == ["Cheap", "Popular", "Pricey"]
+        assert self._names(client, 'price_desc') == ["Pricey", "Popular", "Cheap"]
+        assert self._names(client, 'rating') == ["Popular", "Pricey", "Cheap"]
+        assert self._names(client, 'best_selling') == ["Popular", "Cheap", "Pricey"]
+        assert self._names(client, 'bogus') == self._names(client, 'newest')
+
+    @pytest.mark.parametrize('sort', ['newest', 'price_asc', 'price_desc', 'rating', 'best_selling'])
+    def test_sorts_use_index_order(self, app, init_database, sort):
+        """No sort mode needs a temporary B-tree to order the page"""
+        from sqlalchemy import event
+
+        category_id = init_database
+        listings = [
+            {},
+            {'category_id': category_id},
+            {'in_stock_only': False},
+        ]
+        if sort.startswith('price'):
+            # A price range is only index-ordered when sorting by price; for other
+            # sorts the planner may rightly prefer the range scan plus a small sort
+            listings.append({'category_id': category_id, 'min_price': 500, 'max_price': 5000})
+
+        with app.app_context():
+            statements = []
+
+            def capture(conn, cursor, statement, parameters, context, executemany):
+                if 'LIMIT' in statement:
+                    statements.append((statement, parameters))
+
+            event.listen(db.engine, 'before_cursor_execute', capture)
+            for filters in listings:
+                Product.search_products(sort=sort, **filters).items
+            event.remove(db.engine, 'before_cursor_execute', capture)
+
+            assert len(statements) == len(listings)
+            for statement, parameters in statements:
+                plan = db.session.connection().exec_driver_sql(
+                    f'EXPLAIN QUERY PLAN {statement}', parameters
+                ).fetchall()
+                details = ' | '.join(row[-1] for row in plan)
+                assert 'TEMP B-TREE' not in details, details
+                assert 'ix_products_active' in details, details
+
+
+class TestProductListQueries:
+    """Test that listing pages run a fixed number of SQL statements"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Products spread over several categories and merchants"""
+        seeded = seed_catalog(
+            products=60, merchants=5, customers=0,
+            categories=[f"Category {i}" for i in range(5)]
+        )
+        return auth_headers(seeded['merchants'][0])
+
+    def _count_statements(self, app, client, url, **kwargs):
+        from sqlalchemy import event
+
+        statements = []
+
+        def capture(*args):
+            statements.append(args[2])
+
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', capture)
+        try:
+            response = client.get(url, **kwargs)
+        finally:
+            with app.app_context():
+                event.remove(db.engine, 'before_cursor_execute', capture)
+        assert response.status_code == 200
+        return len(statements)
+
+    @pytest.mark.parametrize('per_page', [1, 10, 50])
+    def test_product_list_query_count(self, app, client, init_database, per_page):
+        """Page + count, whatever the page size"""
+        count = self._count_statements(app, client, f'/api/v1/products?per_page={per_page}')
+        assert count <= 2
+
+    def test_merchant_product_list_query_count(self, app, client, init_database):
+        """User lookup + products, however many products the merchant has"""
+        count = self._count_statements(
+            app, client, '/api/v1/merchant/products',
+            headers=init_database
+        )
+        assert count <= 2
@@ -0,0 +1,198 @@
+"""
+Test Stock Reservations for Unpaid M-Pesa Orders
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models.product import Product
+from app.models.cart import Cart, CartItem
+from app.models.order import MasterOrder, SubOrder, SubOrderStatus, PaymentStatus
+from app.services.reservation_service import release_expired_reservations, EXPIRED_REASON
+from tests.conftest import seed_catalog, auth_headers
+
+
+class TestReservations:
+    """Test reservation expiry and the sweeper"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Two merchants' products, a hub and a customer"""
+        seeded = seed_catalog(products=2, merchants=2, hub=True)
+        return {
+            'customer_id': seeded['customer'].id,
+            'hub_id': seeded['hub'].id,
+            'product_ids': [product.id for product in seeded['products']],
+            'headers': auth_headers(seeded['customer'])
+        }
+
+    def _checkout(self, app, client, init_database, payment_method='mpesa_delivery'):
+        with app.app_context():
+            cart = Cart.get_or_create_cart(init_database['customer_id'])
+            db.session.add_all([
+                CartItem(cart_id=cart.id, product_id=product_id, quantity=3)
+                for product_id in init_database['product_ids']
+            ])
+            db.session.commit()
+
+        body = {'payment_method': payment_method}
+        if payment_method == 'mpesa_delivery':
+            body['mpesa_phone_number'] = '254712345678'
+        else:
+            body['hub_id'] = init_database['hub_id']
+        response = client.post('/api/v1/orders', json=body, headers=init_database['headers'])
+        assert response.status_code == 201
+        return response.get_json()['data']
+
+    def _stock(self, init_database):
+        return [db.session.get(Product, product_id).stock_quantity for product_id in init_database['product_ids']]
+
+    def test_mpesa_checkout_holds_stock(self, app, client, init_database):
+        """M-Pesa orders record when their hold expires; COD orders don't"""
+        order = self._checkout(app, client, init_database)
+        expires_at = datetime.fromisoformat(order['reservation_expires_at'])
+        assert timedelta(minutes=14) < expires_at - datetime.utcnow() <= timedelta(minutes=15)
+
+        order = self._checkout(app, client, init_database, payment_method='cash_on_delivery')
+        assert order['reservation_expires_at'] is None
+
+    def test_sweeper_releases_expired_orders(self, app, client, init_database):
+        """Expired unpaid orders are cancelled and their stock restored"""
+        order = self._checkout(app, client, init_database)
+
+        with app.app_context():
+            assert self._stock(init_database) == [7, 7]
+
+            # Not expired yet
+            assert release_expired_reservations() == 0
+
+            later = datetime.utcnow() + timedelta(minutes=16)
+            assert release_expired_reservations(now=later) == 1
+            assert self._stock(init_database) == [10, 10]
+            assert [product.units_sold for product in Product.query.all()] == [0, 0]
+
+            master_order = db.session.get(MasterOrder, order['id'])
+            assert master_order.is_cancelled is True
+            assert master_order.reservation_expires_at is None
+            assert {suborder.status for suborder in master_order.suborders} == {SubOrderStatus.CANCELLED}
+
+            # Released once only
+            assert release_expired_reservations(now=later) == 0
+            assert self._stock(init_database) == [10, 10]
+
+    def test_sweeper_skips_paid_and_cod_orders(self, app, client, init_database):
+        """Paid M-Pesa orders and COD orders keep their stock"""
+        paid = self._checkout(app, client, init_database)
+        self._checkout(app, client, init_database, payment_method='cash_on_delivery')
+
+        with app.app_context():
+            order = db.session.get(MasterOrder, paid['id'])
+            order.mpesa_checkout_request_id = 'ws_CO_1'
+            db.session.commit()
+
+        response = client.post('/api/v1/payments/mpesa/callback', json={'Body': {'stkCallback': {
+            'ResultCode': 0,
+            'CheckoutRequestID': 'ws_CO_1',
+            'CallbackMetadata': {'Item': [{'Name': 'MpesaReceiptNumber', 'Value': 'QKX1'}]}
+        }}})
+        assert response.status_code == 200
+
+        with app.app_context():
+            assert db.session.get(MasterOrder, paid['id']).reservation_expires_at is None
+            assert release_expired_reservations(now=datetime.utcnow() + timedelta(days=1)) == 0
+            assert self._stock(init_database) == [4, 4]
+
+    def test_batches_and_late_payment(self, app, client, init_database):
+        """Several expired orders release in batches; paying afterwards flags a refund"""
+        orders = [self._checkout(app, client, init_database) for _ in range(3)]
+
+        with app.app_context():
+            db.session.get(MasterOrder, orders[0]['id']).mpesa_checkout_request_id = 'ws_CO_2'
+            db.session.commit()
+
+            assert self._stock(init_database) == [1, 1]
+            assert release_expired_reservations(now=datetime.utcnow() + timedelta(minutes=16), batch_size=2) == 3
+            assert self._stock(init_database) == [10, 10]
+            assert SubOrder.query.filter_by(status=SubOrderStatus.CANCELLED).count() == 6
+
+        client.post('/api/v1/payments/mpesa/callback', json={'Body': {'stkCallback': {
+            'ResultCode': 0,
+            'CheckoutRequestID': 'ws_CO_2',
+            'CallbackMetadata': {'Item': [{'Name': 'MpesaReceiptNumber', 'Value': 'QKX2'}]}
+        }}})
+
+        with app.app_context():
+            order = db.session.get(MasterOrder, orders[0]['id'])
+            assert order.payment_status == PaymentStatus.PAID
+            assert order.refund_status == 'pending'
+            assert {suborder.status for suborder in order.suborders} == {SubOrderStatus.CANCELLED}
+
+    def test_payment_racing_the_sweeper(self, app, client, init_database):
+        """A sweep landing between the callback's read and its write turns the payment into a refund"""
+        paid = self._checkout(app, client, init_database)
+        with app.app_context():
+            db.session.get(MasterOrder, paid['id']).mpesa_checkout_request_id = 'ws_CO_3'
+            db.session.commit()
+
+        swept = []
+
+        def sweep(order, context):
+            if swept:
+                return
+            swept.append(order.id)
+            with app.app_context():
+                assert release_expired_reservations(now=datetime.utcnow() + timedelta(minutes=16)) == 1
+
+        event.listen(MasterOrder, 'load', sweep)
+        response = client.post('/api/v1/payments/mpesa/callback', json={'Body': {'stkCallback': {
+            'ResultCode': 0,
+            'CheckoutRequestID': 'ws_CO_3',
+            'CallbackMetadata': {'Item': [{'Name': 'MpesaReceiptNumber', 'Value': 'QKX3'}]}
+        }}})
+        event.remove(MasterOrder, 'load', sweep)
+        assert response.status_code == 200
+
+        with app.app_context():
+            order = db.session.get(MasterOrder, paid['id'])
+            assert order.is_cancelled
+            assert order.payment_status == PaymentStatus.PAID
+            assert order.refund_status == 'pending'
+            assert {suborder.status for suborder in order.suborders} == {SubOrderStatus.CANCELLED}
+            assert self._stock(init_database) == [10, 10]
+
+    def test_cancel_racing_the_sweeper(self, app, client, init_database):
+        """A sweep landing between a cancel's read and its write restores the stock once"""
+        order = self._checkout(app, client, init_database)
+        loaded = []
+
+        def sweep(suborder, context):
+            # Sweep once the cancel has read both suborders as cancellable
+            loaded.append(suborder.id)
+            if len(loaded) == 2:
+                with app.app_context():
+                    assert release_expired_reservations(now=datetime.utcnow() + timedelta(minutes=16)) == 1
+
+        event.listen(SubOrder, 'load', sweep)
+        response = client.post(
+            f"/api/v1/orders/{order['id']}/cancel",
+            json={'reason': 'Changed my mind about it'},
+            headers=init_database['headers']
+        )
+        event.remove(SubOrder, 'load', sweep)
+        assert len(loaded) >= 2
+        assert response.status_code == 400
+        assert response.get_json()['error']['code'] == 'ALREADY_CANCELLED'
+
+        with app.app_context():
+            assert self._stock(init_database) == [10, 10]
+            assert [product.units_sold for product in Product.query.all()] == [0, 0]
+            master_order = db.session.get(MasterOrder, order['id'])
+            assert master_order.cancellation_reason == EXPIRED_REASON
+
+        response = client.post(
+            f"/api/v1/orders/{order['id']}/cancel",
+            json={'reason': 'Changed my mind about it'},
+            headers=init_database['headers']
+        )
+        assert response.status_code == 400
@@ -0,0 +1,102 @@
+"""
+Test Review Routes and Rating Aggregates
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+from app import db
+from app.models.product import Product
+from app.models.review import Review
+from app.models.order import MasterOrder, SubOrder, OrderItem, PaymentMethod, SubOrderStatus
+from tests.conftest import seed_catalog
+
+
+class TestRatingAggregates:
+    """Test rating_avg / rating_count / histogram maintenance"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Two customers who both bought the same product"""
+        seeded = seed_catalog(products=[{'name': "Test Product"}], customers=2, price=1000.00)
+        merchant, product = seeded['merchant'], seeded['products'][0]
+
+        tokens = []
+        for customer in seeded['customers']:
+            order = MasterOrder(customer_id=customer.id, total_amount=1000, payment_method=PaymentMethod.COD)
+            db.session.add(order)
+            db.session.commit()
+            suborder = SubOrder(
+                master_order_id=order.id,
+                merchant_id=merchant.id,
+                status=SubOrderStatus.COMPLETED,
+                subtotal_amount=1000,
+                commission_amount=250,
+                merchant_payout_amount=750
+            )
+            db.session.add(suborder)
+            db.session.commit()
+            db.session.add(OrderItem(
+                suborder_id=suborder.id, product_id=product.id, quantity=1, price_at_purchase=1000
+            ))
+            db.session.commit()
+            tokens.append(create_access_token(identity=str(customer.id)))
+
+        return {'product_id': product.id, 'tokens': tokens}
+
+    def _review(self, client, token, product_id, rating):
+        response = client.post('/api/v1', headers={'Authorization': f'Bearer {token}'}, data={
+            'product_id': product_id,
+            'rating': rating,
+            'title': 'Good product',
+            'comment': 'Works as described, fast delivery'
+        })
+        assert response.status_code == 201
+        return response.get_json()['data']['id']
+
+    def _stats(self, client, product_id):
+        response = client.get(f'/api/v1/products/{product_id}/reviews')
+        return response.get_json()['data']['statistics']
+
+    def test_aggregates_follow_review_writes(self, app, client, init_database):
+        """Create, update and delete keep average, count and histogram in step"""
+        product_id = init_database['product_id']
+        first, second = init_database['tokens']
+
+        review_id = self._review(client, first, product_id, 5)
+        self._review(client, second, product_id, 2)
+
+        stats = self._stats(client, product_id)
+        assert stats['average_rating'] == 3.5
+        assert stats['rating_distribution'] == {'1': 0, '2': 1, '3': 0, '4': 0, '5': 1}
+
+        response = client.put(f'/api/v1/{review_id}',
+                              headers={'Authorization': f'Bearer {first}'}, json={'rating': 4})
+        assert response.status_code == 200
+        stats = self._stats(client, product_id)
+        assert stats['average_rating'] == 3.0
+        assert stats['rating_distribution']['4'] == 1
+        assert stats['rating_distribution']['5'] == 0
+
+        response = client.delete(f'/api/v1/{review_id}', headers={'Authorization': f'Bearer {first}'})
+        assert response.status_code == 200
+
+        product = client.get(f'/api/v1/products/{product_id}').get_json()['data']
+        assert product['rating'] == {'average': 2.0, 'count': 1}
+
+    def test_rebuild_command(self, app, client, init_database):
+        """`flask ratings rebuild` recomputes aggregates from the reviews table"""
+        product_id = init_database['product_id']
+        self._review(client, init_database['tokens'][0], product_id, 4)
+
+        with app.app_context():
+            # Simulate drift, e.g. reviews imported directly into the table
+            db.session.execute(db.update(Product).values(rating_count=0, rating_avg=0, rating_4_count=0))
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=['ratings', 'rebuild'])
+        assert result.exit_code == 0
+
+        with app.app_context():
+            product = db.session.get(Product, product_id)
+            assert product.get_review_count() == Review.query.filter_by(product_id=product_id).count() == 1
+            assert product.get_average_rating() == 4.0
+            assert product.get_rating_distribution()['4'] == 1
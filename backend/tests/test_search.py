@@ -0,0 +1,136 @@
+"""
+Test Product Search
+"""
+import pytest
+from app import db
+from app.models.product import Product
+from tests.conftest import seed_catalog
+
+
+class TestProductSearch:
+    """Test full-text product search"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database with a small catalog"""
+        products = [
+            ("Dell Laptop 15 inch", "Business notebook with long battery life"),
+            ("Laptop Sleeve", "Padded sleeve that fits most 15 inch laptops"),
+            ("Samsung Galaxy S23", "Flagship smartphone with a great camera"),
+            ("Wireless Mouse Pad", "Smooth surface that works with any laptop"),
+        ]
+        seed_catalog(
+            products=[{'name': name, 'description': description} for name, description in products],
+            customers=0, price=1000.00
+        )
+
+    def _search(self, client, query):
+        response = client.get('/api/v1/products', query_string={'query': query})
+        assert response.status_code == 200
+        return [p['name'] for p in response.get_json()['data']['products']]
+
+    def test_search_ranks_name_matches(self, client, init_database):
+        """Products matching in name and description rank above description-only hits"""
+        names = self._search(client, 'laptop')
+        assert set(names[:2]) == {"Dell Laptop 15 inch", "Laptop Sleeve"}
+        assert names[2:] == ["Wireless Mouse Pad"]
+
+    def test_search_matches_prefix_and_stems(self, client, init_database):
+        """Partial words and plural forms still match"""
+        assert self._search(client, 'galax') == ["Samsung Galaxy S23"]
+        assert "Laptop Sleeve" in self._search(client, 'laptops')
+
+    def test_search_index_follows_updates(self, app, client, init_database):
+        """Renamed and deleted products are reflected immediately"""
+        with app.app_context():
+            product = Product.query.filter_by(name="Samsung Galaxy S23").first()
+            product.name = "Tecno Camon 20"
+            db.session.commit()
+
+            sleeve = Product.query.filter_by(name="Laptop Sleeve").first()
+            db.session.delete(sleeve)
+            db.session.commit()
+
+        assert self._search(client, 'galaxy') == []
+        assert self._search(client, 'camon') == ["Tecno Camon 20"]
+        assert self._search(client, 'laptop') == ["Dell Laptop 15 inch", "Wireless Mouse Pad"]
+
+    def test_ilike_backend_still_available(self, app, client, init_database):
+        """The legacy substring backend can be selected via config"""
+        app.config['SEARCH_BACKEND'] = 'ilike'
+        assert self._search(client, 'aptop Slee') == ["Laptop Sleeve"]
+
+
+class TestFuzzySearch:
+    """Test the trigram fallback for misspelled searches"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database with a few thousand products"""
+        seeded = seed_catalog(products=0, customers=0)
+
+        names = ["Samsung Galaxy S23", "Infinix Hot 30", "Dell Laptop 15 inch", "Tecno Spark 10"]
+        rows = [
+            {'name': name, 'description': "Test description"} for name in names
+        ] + [
+            {'name': f"Laptop Sleeve {i}", 'description': f"Padded sleeve model {i}"} for i in range(2000)
+        ]
+        db.session.execute(Product.__table__.insert(), [
+            dict(row, merchant_id=seeded['merchant'].id, category_id=seeded['category'].id,
+                 price=1000.00, stock_quantity=10)
+            for row in rows
+        ])
+        db.session.commit()
+
+    def _search(self, client, query):
+        response = client.get('/api/v1/products', query_string={'query': query, 'per_page': 5})
+        assert response.status_code == 200
+        return [p['name'] for p in response.get_json()['data']['products']]
+
+    def test_misspelled_brand_falls_back_to_fuzzy(self, client, init_database):
+        """Typos that match nothing exactly still find the product"""
+        assert self._search(client, 'samsng')[0] == "Samsung Galaxy S23"
+        assert self._search(client, 'infinx hot')[0] == "Infinix Hot 30"
+        assert self._search(client, 'zzqx') == []
+
+    def test_exact_hits_stay_first(self, client, init_database):
+        """When a few exact hits exist they are listed before fuzzy ones"""
+        assert self._search(client, 'dell')[0] == "Dell Laptop 15 inch"
+
+    def test_fuzzy_disabled(self, app, client, init_database):
+        """SEARCH_FUZZY_MIN_RESULTS=0 turns the fallback off"""
+        app.config['SEARCH_FUZZY_MIN_RESULTS'] = 0
+        assert self._search(client, 'samsng') == []
+
+    def test_latency_budget(self, app, client, init_database):
+        """Fuzzy mode adds no work to searches with enough exact hits"""
+        import statistics
+        import time
+        from sqlalchemy import event
+
+        def timed(query, fuzzy_min_results, runs=15):
+            app.config['SEARCH_FUZZY_MIN_RESULTS'] = fuzzy_min_results
+            timings = []
+            with app.app_context():
+                for _ in range(runs):
+                    started = time.perf_counter()
+                    pagination = Product.search_products(query=query, per_page=20)
+                    list(pagination.items)
+                    timings.append((time.perf_counter() - started) * 1000)
+            return statistics.median(timings)
+
+        statements = []
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', lambda *args: statements.append(1))
+            app.config['SEARCH_FUZZY_MIN_RESULTS'] = 3
+            Product.search_products(query='laptop sleeve', per_page=20)
+        assert len(statements) == 2  # page + count, nothing else
+        assert 'trigram_index' not in app.extensions
+
+        # Common case: within noise of running with fuzzy matching off
+        baseline_ms = timed('laptop sleeve', 0)
+        assert timed('laptop sleeve', 3) < baseline_ms * 1.5 + 5
+
+        # Fallback case (index already warm) stays inside an absolute budget
+        timed('samsng', 3, runs=1)
+        assert timed('samsng', 3) < 50
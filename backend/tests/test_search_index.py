@@ -0,0 +1,121 @@
+"""
+Test In-process BM25 Search Index
+"""
+from types import SimpleNamespace
+import pytest
+from app import create_app
+from app.services.search_index import SearchIndex, rebuild_search_index
+from tests.conftest import seed_catalog
+
+
+CATALOG = [
+    (1, "Dell Laptop 15 inch", "Business notebook with long battery life"),
+    (2, "Laptop Sleeve", "Padded sleeve that fits most laptops"),
+    (3, "Samsung Galaxy S23", "Flagship smartphone with a great camera"),
+    (4, "Wireless Mouse", "Works with any laptop or desktop"),
+]
+
+
+def _product(product_id, name, description='', is_active=True):
+    return SimpleNamespace(id=product_id, name=name, description=description, is_active=is_active)
+
+
+class TestSearchIndex:
+    """Test the snapshot + delta segment engine"""
+
+    @pytest.fixture
+    def index(self, tmp_path):
+        """Index with a freshly built snapshot"""
+        index = SearchIndex(str(tmp_path / 'products.idx'), merge_threshold=1000)
+        index.rebuild(CATALOG)
+        return index
+
+    def test_bm25_ranks_name_matches_first(self, index):
+        """Name hits outrank description-only hits"""
+        ids = [product_id for product_id, _ in index.search('laptop')]
+        assert set(ids[:2]) == {1, 2}
+        assert ids[2:] == [4]
+
+    def test_all_tokens_required_and_prefix_on_last(self, index):
+        """Multi-word queries are conjunctive; the last word may be partial"""
+        assert [pid for pid, _ in index.search('laptop slee')] == [2]
+        assert index.search('laptop galaxy') == []
+
+    def test_delta_updates_visible_to_other_workers(self, index):
+        """A second process mapping the same files sees delta log entries"""
+        other_worker = SearchIndex(index.path)
+
+        index.apply_update(_product(3, "Tecno Camon 20", "Budget smartphone"))
+        index.apply_update(_product(2, "Laptop Sleeve", is_active=False))
+        index.apply_update(_product(5, "Gaming Laptop", "RTX graphics"))
+
+        assert other_worker.search('galaxy') == []
+        assert [pid for pid, _ in other_worker.search('camon')] == [3]
+        assert 2 not in [pid for pid, _ in other_worker.search('laptop')]
+        assert 5 in [pid for pid, _ in other_worker.search('laptop')]
+
+    def test_merge_folds_delta_into_snapshot(self, index):
+        """Merging produces the same results with an empty delta log"""
+        index.apply_update(_product(5, "Gaming Laptop", "RTX graphics"))
+        index.apply_update(_product(1, "Dell Laptop 15 inch", is_active=False))
+        before = index.search('laptop')
+
+        index.merge()
+
+        with open(index.delta_path, 'rb') as f:
+            assert f.read() == b''
+        assert index.search('laptop') == before
+        assert SearchIndex(index.path).search('laptop') == before
+
+
+    def test_merge_seen_by_other_workers_once(self, index):
+        """A worker that read the old log picks up the merged snapshot without replaying it"""
+        other_worker = SearchIndex(index.path)
+        index.apply_update(_product(5, "Gaming Laptop", "RTX graphics"))
+        assert 5 in [pid for pid, _ in other_worker.search('laptop')]
+
+        index.merge()
+        index.apply_update(_product(6, "Laptop Stand", "Aluminium"))
+
+        ids = [pid for pid, _ in other_worker.search('laptop')]
+        assert len(ids) == len(set(ids))
+        assert {5, 6} <= set(ids)
+
+    def test_malformed_log_line_is_skipped(self, index):
+        """A damaged delta entry doesn't break searching"""
+        with open(index.delta_path, 'ab') as f:
+            f.write(b'{"op": "upsert", "id"\n')
+        index.apply_update(_product(5, "Gaming Laptop", "RTX graphics"))
+
+        assert 5 in [pid for pid, _ in SearchIndex(index.path).search('laptop')]
+
+
+class TestBM25Backend:
+    """Test /products with SEARCH_BACKEND=bm25"""
+
+    @pytest.fixture
+    def app(self, tmp_path):
+        """Create test app using the BM25 backend"""
+        app = create_app('testing')
+        app.config['SEARCH_BACKEND'] = 'bm25'
+        app.config['SEARCH_INDEX_PATH'] = str(tmp_path / 'products.idx')
+        return app
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database and build the index"""
+        seed_catalog(
+            products=[{'name': name, 'description': description} for _, name, description in CATALOG],
+            customers=0, price=1000.00
+        )
+        rebuild_search_index()
+
+    def test_products_endpoint_uses_index_ranking(self, client, init_database):
+        """Results come back in BM25 order and respect DB filters"""
+        response = client.get('/api/v1/products', query_string={'query': 'laptop', 'max_price': 5000})
+        assert response.status_code == 200
+
+        data = response.get_json()['data']
+        names = [p['name'] for p in data['products']]
+        assert names[-1] == "Wireless Mouse"
+        assert data['pagination']['total_items'] == 3
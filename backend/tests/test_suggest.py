@@ -0,0 +1,138 @@
+"""
+Test Search-as-you-type Suggestions
+"""
+import time
+import pytest
+from app import db
+from app.models.user import User, UserRole
+from app.models.category import Category
+from app.models.product import Product
+from app.services.search_service import notify_product_changed
+from app.services.suggest_index import PrefixIndex
+from tests.conftest import seed_catalog
+
+
+class TestPrefixIndex:
+    """Test the in-memory prefix index"""
+
+    @pytest.fixture
+    def index(self):
+        """Small index with known popularity"""
+        index = PrefixIndex()
+        index.upsert('product', 1, "Samsung Galaxy S23", 40)
+        index.upsert('product', 2, "Samsung Charger", 5)
+        index.upsert('product', 3, "Sandals", 12)
+        index.upsert('category', 1, "Shoes", 0)
+        return index
+
+    def _texts(self, index, prefix, limit=10):
+        return [s['text'] for s in index.suggest(prefix, limit=limit)]
+
+    def test_ranked_by_popularity(self, index):
+        """Short and long prefixes both rank most popular first"""
+        assert self._texts(index, 's') == ["Samsung Galaxy S23", "Sandals", "Samsung Charger", "Shoes"]
+        assert self._texts(index, 'samsu') == ["Samsung Galaxy S23", "Samsung Charger"]
+        assert self._texts(index, 's', limit=2) == ["Samsung Galaxy S23", "Sandals"]
+
+    def test_matches_any_word(self, index):
+        """Typing a later word of a name still completes it"""
+        assert self._texts(index, 'galaxy') == ["Samsung Galaxy S23"]
+        assert self._texts(index, 'CHARG') == ["Samsung Charger"]
+
+    def test_incremental_updates(self, index):
+        """Renames, popularity changes and removals update cached prefixes"""
+        index.upsert('product', 2, "Samsung Charger", 100)
+        assert self._texts(index, 'sa')[0] == "Samsung Charger"
+
+        index.upsert('product', 1, "Tecno Camon 20", 40)
+        assert "Samsung Galaxy S23" not in self._texts(index, 's')
+        assert self._texts(index, 'te') == ["Tecno Camon 20"]
+
+        index.remove('product', 3)
+        assert self._texts(index, 'san') == []
+
+    def test_lookup_is_sub_millisecond(self):
+        """Top-k lookups stay well under a millisecond on a large catalog"""
+        index = PrefixIndex()
+        words = ['samsung', 'tecno', 'laptop', 'sleeve', 'shoes', 'kitenge', 'maize', 'phone']
+        for product_id in range(20000):
+            name = f"{words[product_id % 8]} {words[(product_id // 8) % 8]} model {product_id}"
+            index.upsert('product', product_id, name, product_id % 97)
+
+        prefixes = ['s', 'la', 'kit', 'samsung t', 'phone m']
+        started = time.perf_counter()
+        for _ in range(200):
+            for prefix in prefixes:
+                assert index.suggest(prefix, limit=8)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / (200 * len(prefixes))
+        assert elapsed_ms < 1.0
+
+
+class TestSuggestEndpoint:
+    """Test GET /api/v1/products/suggest"""
+
+    @pytest.fixture
+    def init_database(self, database):
+        """Initialize database with products and some sales"""
+        seed_catalog(
+            products=[
+                {'name': "Samsung Galaxy S23"},
+                {'name': "Samsung Charger", 'units_sold': 5},
+                {'name': "Sony Headphones"},
+            ],
+            customers=0, categories=("Smartphones",), price=1000.00
+        )
+
+    def _suggest(self, client, prefix):
+        response = client.get('/api/v1/products/suggest', query_string={'prefix': prefix})
+        assert response.status_code == 200
+        return [(s['type'], s['text']) for s in response.get_json()['data']['suggestions']]
+
+    def test_suggest_products_and_categories(self, client, init_database):
+        """Best sellers come first; category names are completed too"""
+        assert self._suggest(client, 'sam') == [
+            ('product', "Samsung Charger"),
+            ('product', "Samsung Galaxy S23"),
+        ]
+        assert ('category', "Smartphones") in self._suggest(client, 's')
+        assert self._suggest(client, '') == []
+
+    def test_suggest_follows_product_changes(self, app, client, init_database):
+        """Products deactivated or renamed in this worker drop out immediately"""
+        assert self._suggest(client, 'sony') == [('product', "Sony Headphones")]
+
+        with app.app_context():
+            product = Product.query.filter_by(name="Sony Headphones").first()
+            product.is_active = False
+            db.session.commit()
+            notify_product_changed(product)
+
+            galaxy = Product.query.filter_by(name="Samsung Galaxy S23").first()
+            galaxy.name = "Galaxy S23 Ultra"
+            db.session.commit()
+            notify_product_changed(galaxy)
+
+        assert self._suggest(client, 'sony') == []
+        assert self._suggest(client, 'sam') == [('product', "Samsung Charger")]
+        assert self._suggest(client, 'ultra') == [('product', "Galaxy S23 Ultra")]
+
+    def test_suggest_syncs_writes_from_other_workers(self, app, client, init_database):
+        """Changes made elsewhere are picked up by the periodic sync"""
+        assert self._suggest(client, 'tec') == []
+
+        with app.app_context():
+            category = Category.query.first()
+            merchant = User.query.filter_by(role=UserRole.MERCHANT).first()
+            db.session.add(Product(
+                merchant_id=merchant.id,
+                category_id=category.id,
+                name="Tecno Camon 20",
+                description="Test description",
+                price=1000.00,
+                stock_quantity=10
+            ))
+            db.session.commit()
+
+            app.extensions['suggest_index'].sync(force=True)
+
+        assert self._suggest(client, 'tec') == [('product', "Tecno Camon 20")]
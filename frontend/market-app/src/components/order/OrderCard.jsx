@@ -12,13 +12,13 @@ const OrderCard = ({ order }) => {
             <h3 className="font-semibold text-lg">Order #{order.id}</h3>
             <p className="text-sm text-gray-600">{formatDate(order.created_at)}</p>
           </div>
-          <OrderStatus status={order.suborders?.[0]?.status} />
+          <OrderStatus status={order.status ?? order.suborders?.[0]?.status} />
         </div>
 
         {/* Items */}
         <div className="mb-4">
           <p className="text-sm text-gray-600">
-            {order.suborders?.[0]?.items?.length || 0} item(s)
+            {order.item_count ?? order.suborders?.[0]?.items?.length ?? 0} item(s)
           </p>
         </div>
 